@@ -0,0 +1,238 @@
+"""
+Asynchronous Checkpoint Writer
+==============================
+Trainer bawaan menulis model, optimizer, scheduler dan state di thread
+training: setiap save_steps, step berhenti sampai semua file selesai
+ditulis (dan checkpoint lama dihapus).
+
+Dengan AsyncCheckpointMixin:
+    1. Critical path hanya snapshot: state_dict model & optimizer disalin
+       ke memory CPU (tied weight tetap satu tensor), scheduler/RNG/
+       trainer_state (kecil) langsung ditulis
+    2. Thread background menulis safetensors (lewat Trainer._save, jadi
+       PEFT/tokenizer/training_args sama seperti biasa) + optimizer.pt +
+       scheduler.pt ke folder sementara .tmp-checkpoint-N
+    3. Selesai -> os.replace ke checkpoint-N (atomic; folder setengah jadi
+       tidak pernah terlihat oleh resume / eval worker)
+    4. Rotasi save_total_limit juga di background
+
+Maksimal satu checkpoint in-flight: jika save berikutnya datang sebelum
+tulis sebelumnya selesai, baru di situ training menunggu. Error dari
+background dilempar ulang di save berikutnya / akhir training.
+
+Penggunaan:
+    class MyTrainer(AsyncCheckpointMixin, Trainer):
+        pass
+
+    trainer = MyTrainer(..., async_checkpoint=True)
+"""
+
+import os
+import time
+import shutil
+import threading
+
+import torch
+import torch.distributed as dist
+from transformers import Trainer
+from transformers.trainer import OPTIMIZER_NAME, SCHEDULER_NAME, TRAINER_STATE_NAME
+from transformers.trainer_utils import PREFIX_CHECKPOINT_DIR
+
+try:
+    from transformers.trainer_callback import ExportableState
+except ImportError:
+    ExportableState = None
+
+TMP_PREFIX = ".tmp-"
+
+
+def snapshot_to_cpu(obj, memo=None):
+    """
+    Salinan CPU dari nested dict/list/tuple berisi tensor
+
+    Tensor yang berbagi storage (tied embedding / LM head) disalin sekali
+    dan tetap berbagi di snapshot.
+    """
+    if memo is None:
+        memo = {}
+    if torch.is_tensor(obj):
+        key = (obj.untyped_storage().data_ptr(), obj.storage_offset(),
+               tuple(obj.shape), tuple(obj.stride()), obj.dtype)
+        if key not in memo:
+            memo[key] = obj.detach().to("cpu", copy=True)
+        return memo[key]
+    if isinstance(obj, dict):
+        return {k: snapshot_to_cpu(v, memo) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot_to_cpu(v, memo) for v in obj)
+    return obj
+
+
+def _is_peft_model(model):
+    return hasattr(model, "peft_config") and hasattr(model, "get_base_model")
+
+
+class AsyncCheckpointMixin:
+    """
+    Mixin Trainer: _save_checkpoint non-blocking (lihat docstring modul).
+    Jika async_checkpoint False (atau DeepSpeed/FSDP/push_to_hub),
+    perilaku Trainer tidak berubah.
+    """
+
+    def __init__(self, *args, async_checkpoint=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.async_checkpoint = async_checkpoint
+        self._checkpoint_thread = None
+        self._checkpoint_error = None
+        self._checkpoint_stats = []
+
+    # ── Background writer ───────────────────────────────────
+
+    def wait_for_checkpoint(self):
+        """Tunggu tulis checkpoint in-flight; lempar ulang error-nya"""
+        if self._checkpoint_thread is not None:
+            self._checkpoint_thread.join()
+            self._checkpoint_thread = None
+        if self._checkpoint_error is not None:
+            error, self._checkpoint_error = self._checkpoint_error, None
+            raise RuntimeError("Async checkpoint gagal ditulis") from error
+
+    def _use_async_checkpoint(self):
+        return (
+            self.async_checkpoint
+            and not self.args.push_to_hub
+            and not getattr(self, "is_deepspeed_enabled", False)
+            and not getattr(self, "is_fsdp_enabled", False)
+        )
+
+    def _model_snapshot(self):
+        state_dict = self.accelerator.unwrap_model(self.model).state_dict()
+        if _is_peft_model(self.model):
+            # Hanya adapter yang disimpan PEFT; jangan salin base model
+            state_dict = {
+                k: v for k, v in state_dict.items()
+                if "lora_" in k or "modules_to_save" in k
+            }
+        return snapshot_to_cpu(state_dict)
+
+    def _rotate_checkpoints_async(self, run_dir):
+        if hasattr(self, "_rotate_checkpoints"):
+            self._rotate_checkpoints(use_mtime=False, output_dir=run_dir)
+        else:
+            from transformers.trainer_utils import rotate_checkpoints
+            rotate_checkpoints(
+                output_dir=run_dir,
+                save_total_limit=self.args.save_total_limit,
+                best_model_checkpoint=self.state.best_model_checkpoint,
+                use_mtime=False,
+            )
+
+    def _write_checkpoint(self, tmp_dir, output_dir, run_dir, model_state, optimizer_state):
+        start = time.perf_counter()
+        try:
+            if self.args.should_save:
+                self._save(tmp_dir, state_dict=model_state)
+                if optimizer_state is not None:
+                    torch.save(optimizer_state, os.path.join(tmp_dir, OPTIMIZER_NAME))
+                if os.path.exists(output_dir):
+                    shutil.rmtree(output_dir)
+                os.replace(tmp_dir, output_dir)
+                self._rotate_checkpoints_async(run_dir)
+        except BaseException as e:
+            self._checkpoint_error = e
+        self._checkpoint_stats[-1]["write_sec"] = time.perf_counter() - start
+
+    def _barrier(self):
+        if self.args.world_size > 1 and dist.is_available() and dist.is_initialized():
+            dist.barrier()
+
+    # ── Trainer overrides ───────────────────────────────────
+
+    def _save_checkpoint(self, model, trial, *args, **kwargs):
+        if not self._use_async_checkpoint():
+            return super()._save_checkpoint(model, trial, *args, **kwargs)
+
+        # Maksimal satu checkpoint in-flight (memory snapshot terbatas)
+        self.wait_for_checkpoint()
+        start = time.perf_counter()
+
+        checkpoint_folder = f"{PREFIX_CHECKPOINT_DIR}-{self.state.global_step}"
+        if self.hp_search_backend is None and trial is None:
+            self.store_flos()
+        run_dir = self._get_output_dir(trial=trial)
+        output_dir = os.path.join(run_dir, checkpoint_folder)
+        tmp_dir = os.path.join(run_dir, TMP_PREFIX + checkpoint_folder)
+        if self.args.should_save:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+            os.makedirs(tmp_dir)
+        # Rank lain baru boleh menulis (RNG) setelah rank 0 selesai menyiapkan tmp_dir
+        self._barrier()
+
+        # Best checkpoint: folder step ini mungkin belum ada (masih ditulis)
+        best_step = getattr(self.state, "best_global_step", None)
+        if best_step:
+            best_dir = os.path.join(run_dir, f"{PREFIX_CHECKPOINT_DIR}-{best_step}")
+            if best_step == self.state.global_step or os.path.exists(best_dir):
+                self.state.best_model_checkpoint = best_dir
+
+        model_state = self._model_snapshot()
+        optimizer_state = None
+        if not self.args.save_only_model:
+            if self.args.should_save:
+                optimizer_state = snapshot_to_cpu(self.optimizer.state_dict())
+                with open(os.path.join(tmp_dir, SCHEDULER_NAME), 'wb') as f:
+                    torch.save(self.lr_scheduler.state_dict(), f)
+            if hasattr(self, "_save_scaler"):
+                self._save_scaler(tmp_dir)
+            # RNG per rank ditulis tiap rank ke folder sementara rank 0
+            self._save_rng_state(tmp_dir)
+            self._barrier()
+
+        if self.args.should_save:
+            if ExportableState is not None and hasattr(self.state, "stateful_callbacks"):
+                for cb in self.callback_handler.callbacks + [self.control]:
+                    if isinstance(cb, ExportableState):
+                        name = cb.__class__.__name__
+                        if isinstance(self.state.stateful_callbacks.get(name), list):
+                            self.state.stateful_callbacks[name].append(cb.state())
+                        else:
+                            self.state.stateful_callbacks[name] = cb.state()
+            self.state.save_to_json(os.path.join(tmp_dir, TRAINER_STATE_NAME))
+
+        self._checkpoint_stats.append({
+            "step": self.state.global_step,
+            "blocking_sec": time.perf_counter() - start,
+        })
+        self._checkpoint_thread = threading.Thread(
+            target=self._write_checkpoint,
+            args=(tmp_dir, output_dir, run_dir, model_state, optimizer_state),
+            name=f"checkpoint-writer-{self.state.global_step}",
+            daemon=False,
+        )
+        self._checkpoint_thread.start()
+
+    def _load_best_model(self, *args, **kwargs):
+        self.wait_for_checkpoint()
+        return super()._load_best_model(*args, **kwargs)
+
+    def train(self, *args, **kwargs):
+        try:
+            return super().train(*args, **kwargs)
+        finally:
+            self.wait_for_checkpoint()
+            if self._checkpoint_stats and self.is_world_process_zero():
+                self.print_checkpoint_stats()
+
+    def print_checkpoint_stats(self):
+        stats = self._checkpoint_stats
+        blocking = sum(s["blocking_sec"] for s in stats) / len(stats)
+        written = [s["write_sec"] for s in stats if "write_sec" in s]
+        write = sum(written) / max(1, len(written))
+        print(f"\n💾 Async checkpoint: {len(stats)} saves, blocking avg {blocking*1000:.0f} ms, "
+              f"background write avg {write:.2f} s")
+
+
+class AsyncCheckpointTrainer(AsyncCheckpointMixin, Trainer):
+    """Trainer dengan checkpoint asynchronous"""
+    pass
@@ -0,0 +1,359 @@
+"""
+Asynchronous Evaluation on Checkpoint Snapshots
+===============================================
+eval_steps di Trainer menghentikan training dan menjalankan seluruh
+eval_dataset di proses & device yang sama. Di sini evaluasi dipindah ke
+proses terpisah:
+
+    1. AsyncEvalCallback menjalankan worker (multiprocessing spawn) saat
+       training mulai, dengan eval set (opsional subsample acak tetap)
+    2. Worker memantau output_dir: setiap checkpoint-N baru (lengkap,
+       trainer_state.json sudah ada; dengan async_checkpoint.py folder
+       muncul lewat atomic rename) di-load dan dievaluasi -> eval_loss,
+       eval_perplexity. Hasil -> queue + <output_dir>/async_eval.jsonl.
+       Checkpoint terbaru dievaluasi lebih dulu: jika eval lebih lambat
+       dari save_steps, checkpoint lama yang keburu dirotasi
+       save_total_limit dilewati, bukan checkpoint terbaru yang tertunda
+    3. Callback membaca hasil tanpa blocking di tiap step:
+       state.best_metric / best_model_checkpoint (juga melindungi
+       checkpoint terbaik dari rotasi save_total_limit), early stopping,
+       dan di akhir training menunggu checkpoint terakhir lalu load bobot
+       checkpoint terbaik (pengganti load_best_model_at_end)
+
+Throughput training jadi tidak bergantung pada ukuran eval set; worker
+dibatasi num_threads supaya tidak merebut core training.
+
+Trainer harus dijalankan dengan eval_strategy="no" dan
+load_best_model_at_end=False (keduanya diambil alih callback ini).
+
+Penggunaan:
+    from async_eval import AsyncEvalCallback
+
+    callback = AsyncEvalCallback(eval_dataset, data_collator, subsample=2000,
+                                 early_stopping_patience=5)
+    trainer = Trainer(..., callbacks=[callback])
+"""
+
+import os
+import re
+import json
+import math
+import time
+import queue
+import random
+import itertools
+import multiprocessing as mp
+
+import torch
+import torch.distributed as dist
+from torch.utils.data import IterableDataset
+from transformers import TrainerCallback
+
+ASYNC_EVAL_DEFAULTS = {
+    "subsample": None,                  # None = seluruh eval set
+    "seed": 42,
+    "batch_size": 32,
+    "num_threads": 2,                   # Thread torch di worker
+    "device": "cpu",                    # GPU biasanya dipakai training
+    "loss_chunk_size": None,            # Sama dengan training (chunked_loss.py)
+    "poll_interval": 2.0,               # Detik antar scan output_dir
+}
+
+CHECKPOINT_RE = re.compile(r"^checkpoint-(\d+)$")
+RESULTS_FILE = "async_eval.jsonl"
+
+
+# ============================================================
+# CHECKPOINT & DATA
+# ============================================================
+
+def list_ready_checkpoints(run_dir):
+    """[(step, path)] checkpoint lengkap di run_dir, urut step"""
+    if not os.path.isdir(run_dir):
+        return []
+    checkpoints = []
+    for name in os.listdir(run_dir):
+        match = CHECKPOINT_RE.match(name)
+        path = os.path.join(run_dir, name)
+        if match and os.path.exists(os.path.join(path, "trainer_state.json")):
+            checkpoints.append((int(match.group(1)), path))
+    return sorted(checkpoints)
+
+
+def subsample_dataset(dataset, size=None, seed=42):
+    """
+    Subsample acak tetap (seed) sebagai list example
+
+    List kecil murah dikirim ke proses worker (tanpa pickle seluruh
+    dataset / memmap). IterableDataset: ambil `size` example pertama.
+    """
+    if size is None:
+        return dataset
+    if isinstance(dataset, IterableDataset):
+        return list(itertools.islice(iter(dataset), size))
+    if size >= len(dataset):
+        indices = range(len(dataset))
+    else:
+        indices = sorted(random.Random(seed).sample(range(len(dataset)), size))
+    return [dataset[i] for i in indices]
+
+
+def load_checkpoint_model(checkpoint_dir, device="cpu"):
+    """Model dari checkpoint (full model atau adapter PEFT)"""
+    if os.path.exists(os.path.join(checkpoint_dir, "adapter_config.json")):
+        from peft import AutoPeftModelForCausalLM
+        model = AutoPeftModelForCausalLM.from_pretrained(checkpoint_dir)
+    else:
+        from transformers import AutoModelForCausalLM
+        model = AutoModelForCausalLM.from_pretrained(checkpoint_dir)
+    return model.to(device).eval()
+
+
+def load_checkpoint_weights(model, checkpoint_dir):
+    """Load bobot checkpoint ke model yang sedang training (in-place)"""
+    adapter_path = os.path.join(checkpoint_dir, "adapter_model.safetensors")
+    model_path = os.path.join(checkpoint_dir, "model.safetensors")
+    if os.path.exists(adapter_path):
+        from peft import set_peft_model_state_dict
+        from safetensors.torch import load_file
+        set_peft_model_state_dict(model, load_file(adapter_path))
+    elif os.path.exists(model_path):
+        from safetensors.torch import load_file
+        # strict=False: tied LM head tidak disimpan terpisah
+        model.load_state_dict(load_file(model_path), strict=False)
+    else:
+        from transformers.modeling_utils import load_sharded_checkpoint
+        load_sharded_checkpoint(model, checkpoint_dir, strict=False)
+
+
+def evaluate_checkpoint(checkpoint_dir, eval_dataset, data_collator, settings):
+    """eval_loss & eval_perplexity satu checkpoint (Trainer.evaluate, sama seperti in-process)"""
+    import tempfile
+    from transformers import Trainer, TrainingArguments
+    from chunked_loss import ChunkedLossTrainer
+
+    model = load_checkpoint_model(checkpoint_dir, settings["device"])
+    with tempfile.TemporaryDirectory() as tmp:
+        args = TrainingArguments(
+            output_dir=tmp,
+            per_device_eval_batch_size=settings["batch_size"],
+            use_cpu=settings["device"] == "cpu",
+            dataloader_num_workers=0,
+            report_to="none",
+        )
+        kwargs = {}
+        trainer_cls = Trainer
+        if settings["loss_chunk_size"]:
+            trainer_cls = ChunkedLossTrainer
+            kwargs["loss_chunk_size"] = settings["loss_chunk_size"]
+        trainer = trainer_cls(model=model, args=args, eval_dataset=eval_dataset,
+                              data_collator=data_collator, **kwargs)
+        metrics = trainer.evaluate()
+    metrics["eval_perplexity"] = math.exp(min(metrics["eval_loss"], 20))
+    return metrics
+
+
+# ============================================================
+# WORKER PROCESS
+# ============================================================
+
+def eval_worker(run_dir, eval_dataset, data_collator, results_queue, stop_event,
+                min_step, settings):
+    """
+    Loop proses worker: evaluasi setiap checkpoint baru (step > min_step),
+    terbaru dulu, sampai stop_event di-set dan tidak ada checkpoint tersisa
+    """
+    torch.set_num_threads(settings["num_threads"])
+    results_path = os.path.join(run_dir, RESULTS_FILE)
+    done = set()
+
+    while True:
+        pending = [
+            (step, path) for step, path in list_ready_checkpoints(run_dir)
+            if step > min_step and step not in done
+        ]
+        if not pending:
+            if stop_event.is_set():
+                break
+            time.sleep(settings["poll_interval"])
+            continue
+
+        # Terbaru dulu: yang lama mungkin sudah/akan dirotasi save_total_limit
+        step, path = pending[-1]
+        done.add(step)
+        start = time.perf_counter()
+        record = {"step": step, "checkpoint": path}
+        try:
+            record.update(evaluate_checkpoint(path, eval_dataset, data_collator, settings))
+        except Exception as e:
+            # Mis. checkpoint sudah dirotasi saat sedang di-load
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["eval_sec"] = time.perf_counter() - start
+
+        with open(results_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+        results_queue.put(record)
+
+
+# ============================================================
+# CALLBACK
+# ============================================================
+
+class AsyncEvalCallback(TrainerCallback):
+    """
+    Jalankan eval_worker di proses terpisah dan umpankan hasilnya ke
+    best model + early stopping (lihat docstring modul)
+    """
+
+    def __init__(self, eval_dataset, data_collator, load_best_model_at_end=True,
+                 early_stopping_patience=None, early_stopping_threshold=0.0,
+                 final_timeout=600, **settings):
+        unknown = set(settings) - set(ASYNC_EVAL_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Setting async eval tidak dikenal: {sorted(unknown)}")
+        self.settings = {**ASYNC_EVAL_DEFAULTS, **settings}
+        self.eval_dataset = subsample_dataset(
+            eval_dataset, self.settings["subsample"], self.settings["seed"]
+        )
+        self.data_collator = data_collator
+        self.load_best_model_at_end = load_best_model_at_end
+        self.early_stopping_patience = early_stopping_patience
+        self.early_stopping_threshold = early_stopping_threshold
+        self.final_timeout = final_timeout
+
+        self.process = None
+        self.results_queue = None
+        self.stop_event = None
+        self.run_dir = None
+        self.pending_steps = set()
+        self.patience_counter = 0
+        self.patience_step = -1     # Step terakhir yang dihitung untuk patience
+        self.results = []
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        if args.eval_strategy != "no" or args.load_best_model_at_end:
+            print("⚠️  AsyncEvalCallback: set eval_strategy='no' dan "
+                  "load_best_model_at_end=False, eval in-process masih jalan")
+        if not state.is_world_process_zero:
+            return
+        self.run_dir = args.output_dir
+        ctx = mp.get_context("spawn")
+        self.results_queue = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.process = ctx.Process(
+            target=eval_worker,
+            args=(self.run_dir, self.eval_dataset, self.data_collator, self.results_queue,
+                  self.stop_event, state.global_step, self.settings),
+            name="async-eval",
+            daemon=True,
+        )
+        self.process.start()
+        size = len(self.eval_dataset) if hasattr(self.eval_dataset, "__len__") else "?"
+        print(f"🔎 Async eval worker: {size} samples, "
+              f"{self.settings['num_threads']} thread ({self.settings['device']})")
+
+    # ── Hasil dari worker ───────────────────────────────────
+
+    def _poll(self, args, state):
+        if self.results_queue is None:
+            return
+        while True:
+            try:
+                record = self.results_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._handle_result(args, state, record)
+
+    def _handle_result(self, args, state, record):
+        step = record["step"]
+        self.pending_steps.discard(step)
+        if "error" in record:
+            print(f"\n⚠️  Async eval checkpoint-{step} gagal: {record['error']}")
+            return
+        self.results.append(record)
+        metrics = {k: v for k, v in record.items() if k.startswith("eval_")}
+        state.log_history.append({**metrics, "step": step})
+        print(f"\n📊 Async eval step {step}: loss {record['eval_loss']:.4f}, "
+              f"ppl {record['eval_perplexity']:.2f} ({record['eval_sec']:.1f}s)")
+
+        metric_name = args.metric_for_best_model or "loss"
+        if not metric_name.startswith("eval_"):
+            metric_name = f"eval_{metric_name}"
+        value = record.get(metric_name)
+        if value is None:
+            return
+        greater_is_better = bool(args.greater_is_better)
+
+        def is_better(a, b):
+            return a > b if greater_is_better else a < b
+
+        best = state.best_metric
+        if step > self.patience_step:
+            # Hasil checkpoint lebih lama (dievaluasi belakangan) hanya ikut
+            # best model, tidak menghitung ulang patience
+            self.patience_step = step
+            if best is None or (is_better(value, best)
+                                and abs(value - best) > self.early_stopping_threshold):
+                self.patience_counter = 0
+            else:
+                self.patience_counter += 1
+        if best is None or is_better(value, best):
+            state.best_metric = value
+            state.best_model_checkpoint = record["checkpoint"]
+            state.best_global_step = step
+
+    def _should_stop(self):
+        return bool(self.early_stopping_patience) and \
+            self.patience_counter >= self.early_stopping_patience
+
+    def _broadcast(self, obj, args):
+        """Keputusan rank 0 -> semua rank (torchrun)"""
+        if args.world_size > 1 and dist.is_available() and dist.is_initialized():
+            objects = [obj]
+            dist.broadcast_object_list(objects, src=0)
+            return objects[0]
+        return obj
+
+    # ── Training events ─────────────────────────────────────
+
+    def on_step_end(self, args, state, control, **kwargs):
+        self._poll(args, state)
+        # Multi-proses: keputusan stop disinkronkan di on_save
+        if args.world_size == 1 and self._should_stop():
+            print(f"\n🛑 Early stopping (async eval, patience {self.early_stopping_patience})")
+            control.should_training_stop = True
+
+    def on_save(self, args, state, control, **kwargs):
+        if state.is_world_process_zero:
+            self.pending_steps.add(state.global_step)
+        if args.world_size > 1 and self._broadcast(self._should_stop(), args):
+            control.should_training_stop = True
+
+    def _wait_for_pending(self, args, state):
+        """Tunggu hasil untuk semua checkpoint yang disimpan selama training"""
+        deadline = time.time() + self.final_timeout
+        while self.pending_steps and self.process.is_alive() and time.time() < deadline:
+            self._poll(args, state)
+            for step in list(self.pending_steps):
+                name = f"checkpoint-{step}"
+                if not (os.path.isdir(os.path.join(self.run_dir, name))
+                        or os.path.isdir(os.path.join(self.run_dir, ".tmp-" + name))):
+                    self.pending_steps.discard(step)  # Sudah dirotasi
+            time.sleep(0.2)
+        self._poll(args, state)
+        if self.pending_steps:
+            print(f"⚠️  Async eval belum selesai untuk step {sorted(self.pending_steps)}")
+
+    def on_train_end(self, args, state, control, model=None, **kwargs):
+        if self.process is not None:
+            print("\n⏳ Menunggu async eval checkpoint terakhir...")
+            self._wait_for_pending(args, state)
+            self.stop_event.set()
+            self.process.join(timeout=self.settings["poll_interval"] * 5)
+            if self.process.is_alive():
+                self.process.terminate()
+
+        best = self._broadcast(state.best_model_checkpoint, args)
+        if self.load_best_model_at_end and best and model is not None and os.path.isdir(best):
+            print(f"🏆 Load best model: {best} (score: {state.best_metric})")
+            load_checkpoint_weights(model, best)
@@ -0,0 +1,240 @@
+"""
+Chunked Cross-Entropy untuk LM Head
+===================================
+Hitung proyeksi LM head + cross-entropy per potongan (chunk) posisi,
+tanpa pernah membuat tensor logits penuh [batch, seq, vocab].
+
+Dengan tokenizer cahya (~50k vocab), batch 32 x 512 posisi menghasilkan
+logits fp32 beberapa GB, jauh lebih besar dari model 13M itu sendiri.
+Di sini hanya [chunk_size, vocab] yang hidup pada satu waktu. Gradien
+hidden state & bobot LM head dihitung langsung saat forward (per chunk),
+sehingga backward hanya tinggal mengalikan dengan grad_output.
+
+Di bawah autocast (bf16 CPU aktif default lewat cpu_perf.py) forward &
+backward dijalankan fp32 (custom_fwd / custom_bwd per device), supaya
+logits & logsumexp tidak turun ke bf16.
+
+Penggunaan:
+    from chunked_loss import ChunkedLossTrainer
+
+    trainer = ChunkedLossTrainer(model=model, args=args, ...,
+                                 loss_chunk_size=1024)
+
+Cek correctness (train & eval tanpa buffer gradient): python scripts/check_chunked_loss.py
+"""
+
+import math
+
+import torch
+from transformers import Trainer
+
+
+class ChunkedLMHeadCrossEntropy(torch.autograd.Function):
+    """
+    loss = sum_i CE(hidden_i @ weight.T, label_i) / normalizer
+
+    hidden: [N, H], weight: [V, H], labels: [N] (ignore_index di-skip)
+    grad_enabled: torch.is_grad_enabled() pemanggil (di dalam forward
+        grad mode selalu mati)
+    """
+
+    @staticmethod
+    def forward(ctx, hidden, weight, labels, chunk_size, ignore_index, normalizer, grad_enabled=True):
+        # needs_input_grad tetap True di torch.no_grad() (eval, AsyncEval)
+        # selama parameter requires_grad -> cek juga grad mode pemanggil
+        needs_grad = grad_enabled and (ctx.needs_input_grad[0] or ctx.needs_input_grad[1])
+
+        weight_f = weight.float()
+        loss_sum = torch.zeros((), dtype=torch.float32, device=hidden.device)
+        grad_hidden = torch.zeros_like(hidden) if needs_grad else None
+        grad_weight = torch.zeros_like(weight_f) if needs_grad else None
+
+        for start in range(0, hidden.shape[0], chunk_size):
+            end = min(start + chunk_size, hidden.shape[0])
+            chunk_labels = labels[start:end]
+            valid = chunk_labels != ignore_index
+            if not valid.any():
+                continue
+
+            chunk_hidden = hidden[start:end].float()
+            logits = chunk_hidden @ weight_f.t()  # [chunk, V]
+            safe_labels = chunk_labels.masked_fill(~valid, 0)
+
+            lse = torch.logsumexp(logits, dim=-1)
+            target_logits = logits.gather(1, safe_labels.unsqueeze(1)).squeeze(1)
+            loss_sum += ((lse - target_logits) * valid).sum()
+
+            if needs_grad:
+                # d(CE)/d(logits) = softmax - onehot, hanya untuk posisi valid
+                grad_logits = torch.exp(logits - lse.unsqueeze(1))
+                grad_logits.scatter_add_(
+                    1, safe_labels.unsqueeze(1),
+                    -torch.ones_like(target_logits).unsqueeze(1),
+                )
+                grad_logits *= valid.unsqueeze(1)
+                grad_hidden[start:end] = (grad_logits @ weight_f).to(hidden.dtype)
+                grad_weight += grad_logits.t() @ chunk_hidden
+            del logits
+
+        if needs_grad:
+            ctx.save_for_backward(grad_hidden, grad_weight)
+            ctx.weight_dtype = weight.dtype
+            ctx.normalizer = normalizer
+        return loss_sum / normalizer
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        grad_hidden, grad_weight = ctx.saved_tensors
+        scale = grad_output / ctx.normalizer
+        grad_hidden = grad_hidden * scale.to(grad_hidden.dtype)
+        grad_weight = (grad_weight * scale).to(ctx.weight_dtype)
+        return grad_hidden, grad_weight, None, None, None, None, None
+
+
+_AUTOCAST_FUNCTIONS = {}
+
+
+def _autocast_function(device_type):
+    """
+    ChunkedLMHeadCrossEntropy dengan custom_fwd(cast_inputs=float32) /
+    custom_bwd untuk device_type ("cpu", "cuda", ...); decorator torch.amp
+    butuh device_type tetap, jadi satu subclass per device
+    """
+    if device_type not in _AUTOCAST_FUNCTIONS:
+        base = ChunkedLMHeadCrossEntropy
+        _AUTOCAST_FUNCTIONS[device_type] = type(f"{base.__name__}_{device_type}", (base,), {
+            "forward": staticmethod(torch.amp.custom_fwd(
+                base.forward, device_type=device_type, cast_inputs=torch.float32
+            )),
+            "backward": staticmethod(torch.amp.custom_bwd(base.backward, device_type=device_type)),
+        })
+    return _AUTOCAST_FUNCTIONS[device_type]
+
+
+def chunked_cross_entropy(hidden, weight, labels, chunk_size=1024,
+                          ignore_index=-100, num_items_in_batch=None):
+    """
+    Cross-entropy LM head tanpa materialisasi logits penuh
+
+    Args:
+        hidden: Hidden state terakhir [N, H] (sudah di-shift)
+        weight: Bobot LM head [V, H]
+        labels: Target [N]
+        chunk_size: Jumlah posisi per chunk
+        num_items_in_batch: Normalizer total (gradient accumulation);
+            default = jumlah label valid di batch ini
+    """
+    if num_items_in_batch is None:
+        normalizer = int((labels != ignore_index).sum().item())
+    elif torch.is_tensor(num_items_in_batch):
+        normalizer = int(num_items_in_batch.item())
+    else:
+        normalizer = int(num_items_in_batch)
+    normalizer = max(normalizer, 1)
+
+    return _autocast_function(hidden.device.type).apply(
+        hidden, weight, labels, chunk_size, ignore_index, normalizer, torch.is_grad_enabled()
+    )
+
+
+def _ddp_hidden_states(ddp_model, inputs):
+    """
+    Forward lewat wrapper DistributedDataParallel (wajib, supaya reducer
+    DDP meng-all-reduce gradient) dengan LM head sementara diganti
+    Identity: "logits" yang keluar = hidden state terakhir
+    """
+    model = ddp_model.module
+    if hasattr(model, "get_base_model"):
+        model = model.get_base_model()
+    lm_head = model.get_output_embeddings()
+    model.set_output_embeddings(torch.nn.Identity())
+    try:
+        outputs = ddp_model(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs.get("attention_mask"),
+            position_ids=inputs.get("position_ids"),
+            use_cache=False,
+        )
+    finally:
+        model.set_output_embeddings(lm_head)
+    return model, outputs[0]
+
+
+def causal_lm_chunked_loss(model, inputs, chunk_size=1024, num_items_in_batch=None):
+    """
+    Forward transformer (tanpa LM head) lalu chunked CE
+
+    Mendukung GPT2LMHeadModel biasa, yang dibungkus PEFT/LoRA, dan yang
+    dibungkus DistributedDataParallel (torchrun).
+    """
+    labels = inputs["labels"]
+    if isinstance(model, torch.nn.parallel.DistributedDataParallel):
+        model, hidden = _ddp_hidden_states(model, inputs)
+    else:
+        if hasattr(model, "get_base_model"):
+            model = model.get_base_model()
+        outputs = model.base_model(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs.get("attention_mask"),
+            position_ids=inputs.get("position_ids"),
+            use_cache=False,
+        )
+        hidden = outputs[0]
+
+    # Shift: posisi t memprediksi token t+1
+    hidden = hidden[:, :-1, :].reshape(-1, hidden.shape[-1])
+    labels = labels[:, 1:].reshape(-1).to(hidden.device)
+
+    weight = model.get_output_embeddings().weight
+    return chunked_cross_entropy(
+        hidden, weight, labels,
+        chunk_size=chunk_size,
+        num_items_in_batch=num_items_in_batch,
+    )
+
+
+class ChunkedLossMixin:
+    """
+    Mixin Trainer: ganti loss bawaan (logits penuh) dengan chunked CE,
+    untuk training maupun evaluasi. Eval juga melaporkan eval_perplexity.
+    """
+
+    def __init__(self, *args, loss_chunk_size=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loss_chunk_size = loss_chunk_size
+        if loss_chunk_size:
+            # Eval cukup loss; logits memang tidak pernah dibuat
+            self.args.prediction_loss_only = True
+
+    def compute_loss(self, model, inputs, return_outputs=False, num_items_in_batch=None):
+        if not self.loss_chunk_size or "labels" not in inputs:
+            # Versi transformers lama tidak mengenal num_items_in_batch
+            extra = {} if num_items_in_batch is None else {"num_items_in_batch": num_items_in_batch}
+            return super().compute_loss(model, inputs, return_outputs=return_outputs, **extra)
+
+        loss = causal_lm_chunked_loss(
+            model, inputs,
+            chunk_size=self.loss_chunk_size,
+            num_items_in_batch=num_items_in_batch,
+        )
+        if getattr(self.args, "average_tokens_across_devices", False) and num_items_in_batch is not None:
+            # Sama dengan Trainer.compute_loss: num_items_in_batch dijumlah
+            # lintas rank, sedangkan DDP me-rata-rata gradient -> kalikan
+            # jumlah proses supaya gradient tidak 1/world_size lebih kecil
+            loss = loss * self.accelerator.num_processes if self.args.n_gpu <= 1 else loss * self.args.n_gpu
+        return (loss, {"loss": loss}) if return_outputs else loss
+
+    def log(self, logs, *args, **kwargs):
+        # Tambahkan perplexity ke setiap hasil evaluasi (log & return evaluate())
+        for key in [k for k in logs if k.endswith("_loss") and k not in ("loss", "train_loss")]:
+            prefix = key[:-len("_loss")]
+            try:
+                logs[f"{prefix}_perplexity"] = math.exp(logs[key])
+            except OverflowError:
+                logs[f"{prefix}_perplexity"] = float("inf")
+        return super().log(logs, *args, **kwargs)
+
+
+class ChunkedLossTrainer(ChunkedLossMixin, Trainer):
+    """Trainer dengan chunked cross-entropy"""
+    pass
@@ -7,6 +7,11 @@ Script untuk membandingkan kualitas jawaban dengan temperature berbeda
 import torch
 from transformers import GPT2LMHeadModel, AutoTokenizer
 
+from stopping_criteria import answer_stopping_criteria
+
+STOP_MARKER = "\n### Instruksi:"
+MAX_SENTENCES = 2
+
 
 def load_model(model_path):
     """Load model dan tokenizer"""
@@ -32,6 +37,15 @@ def generate_with_temp(model, tokenizer, prompt, device, temperature):
     inputs = tokenizer(prompt, return_tensors="pt").to(device)
     prompt_length = inputs.input_ids.shape[1]
     
+    # Berhenti di stop marker / kalimat ke-2, sisa token toh dibuang
+    stopping_criteria = answer_stopping_criteria(
+        tokenizer, prompt_length,
+        stop_strings=[STOP_MARKER],
+        max_sentences=MAX_SENTENCES,
+        max_open_chars=None,
+        require_balanced=False,
+    )
+    
     with torch.no_grad():
         outputs = model.generate(
             inputs.input_ids,
@@ -45,11 +59,13 @@ def generate_with_temp(model, tokenizer, prompt, device, temperature):
             repetition_penalty=1.3,
             no_repeat_ngram_size=3,
             length_penalty=1.0,
+            stopping_criteria=stopping_criteria,
         )
     
     # Decode hanya jawaban (skip prompt)
     answer_tokens = outputs[0][prompt_length:]
-    answer = tokenizer.decode(answer_tokens, skip_special_tokens=True).strip()
+    answer = tokenizer.decode(answer_tokens, skip_special_tokens=True)
+    answer = answer.split(STOP_MARKER)[0].strip()
     
     # Clean up - ambil max 2 kalimat
     sentences = []
@@ -59,7 +75,7 @@ def generate_with_temp(model, tokenizer, prompt, device, temperature):
         if char in '.!?':
             sentences.append(current.strip())
             current = ""
-            if len(sentences) >= 2:
+            if len(sentences) >= MAX_SENTENCES:
                 break
     
     if sentences:
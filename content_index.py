@@ -0,0 +1,148 @@
+"""
+Persistent Content-Hash Index
+=============================
+Index exact-dedup yang bertahan antar run: fingerprint 64-bit dari teks
+yang sudah dinormalisasi (lowercase + whitespace dirapikan).
+
+Layout di disk (<path> adalah prefix):
+    <path>.npy   fingerprint uint64 terurut (base, dibaca via mmap)
+    <path>.log   fingerprint baru, di-append mentah (8 byte per teks)
+
+Cek membership = binary search di base + set kecil untuk isi log.
+Append hanya menulis 8 byte per teks baru (O(new)); log digabung ke base
+(compact) jika sudah lebih besar dari base, jadi biaya rata-rata tetap
+O(new) per teks.
+
+Penggunaan:
+    from content_index import ContentHashIndex
+
+    with ContentHashIndex("./dataset/content_index") as index:
+        new_texts = [t for t in texts if index.add(t)]
+"""
+
+import os
+import re
+import hashlib
+
+import numpy as np
+
+RE_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Normalisasi untuk dedup exact: lowercase, whitespace tunggal"""
+    return RE_WHITESPACE.sub(' ', text).strip().lower()
+
+
+def fingerprint(text):
+    """Fingerprint 64-bit (blake2b) dari teks yang sudah dinormalisasi"""
+    digest = hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class ContentHashIndex:
+    """
+    Set fingerprint teks yang persisten di disk
+
+    Args:
+        path: Prefix file index (tanpa ekstensi)
+        compact_ratio: Compact jika isi log > compact_ratio x base
+    """
+
+    def __init__(self, path, compact_ratio=1.0):
+        self.path = path
+        self.base_path = path + ".npy"
+        self.log_path = path + ".log"
+        self.compact_ratio = compact_ratio
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        if os.path.exists(self.base_path):
+            self._base = np.load(self.base_path, mmap_mode='r')
+        else:
+            self._base = np.zeros(0, dtype=np.uint64)
+
+        self._recent = set()
+        if os.path.exists(self.log_path):
+            # Buang ekor yang tidak utuh (crash di tengah write)
+            size = os.path.getsize(self.log_path)
+            if size % 8:
+                os.truncate(self.log_path, size - size % 8)
+            logged = np.fromfile(self.log_path, dtype='<u8')
+            self._recent.update(logged.tolist())
+        self._pending = []
+
+    def __len__(self):
+        return len(self._base) + len(self._recent)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def contains_fingerprint(self, fp):
+        if fp in self._recent:
+            return True
+        pos = np.searchsorted(self._base, np.uint64(fp))
+        return bool(pos < len(self._base) and self._base[pos] == fp)
+
+    def __contains__(self, text):
+        return self.contains_fingerprint(fingerprint(text))
+
+    def add_fingerprint(self, fp):
+        """Tambah fingerprint; True jika belum pernah ada"""
+        if self.contains_fingerprint(fp):
+            return False
+        self._recent.add(fp)
+        self._pending.append(fp)
+        return True
+
+    def add(self, text):
+        """Tambah teks; True jika teks (setelah normalisasi) belum pernah ada"""
+        return self.add_fingerprint(fingerprint(text))
+
+    def filter_new(self, texts):
+        """Yield hanya teks yang belum ada di index (sekaligus ditambahkan)"""
+        for text in texts:
+            if self.add(text):
+                yield text
+
+    def flush(self):
+        """Append fingerprint baru ke log (fsync)"""
+        if not self._pending:
+            return
+        with open(self.log_path, 'ab') as f:
+            f.write(np.asarray(self._pending, dtype='<u8').tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
+        if len(self._recent) > max(1, len(self._base)) * self.compact_ratio:
+            self.compact()
+
+    def discard(self, fingerprints):
+        """Hapus fingerprint (mis. teks dari sumber yang berubah); tulis ulang base, O(index)"""
+        drop = set(fingerprints)
+        if not drop:
+            return
+        self._recent -= drop
+        self._pending = [fp for fp in self._pending if fp not in drop]
+        self.compact(exclude=drop)
+
+    def compact(self, exclude=None):
+        """Gabung log (+ pending) ke base terurut (tulis atomik, lalu hapus log)"""
+        merged = np.union1d(np.asarray(self._base), np.fromiter(
+            self._recent, dtype=np.uint64, count=len(self._recent)))
+        if exclude:
+            merged = np.setdiff1d(merged, np.fromiter(
+                exclude, dtype=np.uint64, count=len(exclude)), assume_unique=True)
+        tmp_path = self.path + ".tmp.npy"
+        np.save(tmp_path, merged)
+        os.replace(tmp_path, self.base_path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._base = np.load(self.base_path, mmap_mode='r')
+        self._recent = set()
+        self._pending = []
+
+    def close(self):
+        self.flush()
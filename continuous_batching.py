@@ -0,0 +1,447 @@
+"""
+Continuous (Iteration-level) Batching
+=====================================
+model.generate dengan batch berjalan sampai anggota terpanjangnya selesai:
+sapaan "Halo" menunggu di belakang jawaban chain-of-thought 256 token.
+Scheduler ini menjalankan decode loop sendiri:
+
+    - Setiap step: request baru di-admit (prefill, padding kiri, KV cache
+      digabung ke batch), SEMUA sequence aktif maju satu token dalam satu
+      forward, sequence yang selesai (EOS / max_new_tokens / stop) langsung
+      dikeluarkan dan baris KV cache-nya dibuang
+    - KV cache per sequence = satu baris cache batch; kolom padding kiri
+      yang tidak dipakai siapa pun dipangkas setiap ada yang keluar
+    - Opsional prefix_cache (prefix_cache.py): KV system prompt /
+      template disalin dari cache, prefill hanya token pertanyaan
+    - Parameter sampling per request (temperature, top_k, top_p,
+      repetition_penalty, no_repeat_ngram_size, min/max_new_tokens);
+      dict parameter sama dengan model.generate (key lain diabaikan),
+      jadi qa_generation_params / chat_generation_params bisa dipakai
+      langsung. Beam search tidak didukung (pakai model.generate)
+
+Penggunaan:
+    from continuous_batching import ContinuousBatchScheduler
+
+    scheduler = ContinuousBatchScheduler(model, tokenizer, max_batch_size=32)
+    seq = scheduler.add_request(prompt_ids, {"max_new_tokens": 60, "temperature": 0.7})
+    while scheduler.has_work():
+        for done in scheduler.step():
+            print(done.text)
+
+Server: python inference_server.py ./model --scheduler continuous
+Benchmark tail latency: python scripts/bench_continuous.py ./model
+"""
+
+import itertools
+import math
+import numbers
+import threading
+from collections import deque
+
+import torch
+from transformers import DynamicCache
+
+SAMPLING_DEFAULTS = {
+    "max_new_tokens": 128,
+    "min_new_tokens": 0,
+    "do_sample": True,
+    "temperature": 1.0,
+    "top_k": 0,                     # 0 = nonaktif
+    "top_p": 1.0,
+    "repetition_penalty": 1.0,
+    "no_repeat_ngram_size": 0,
+    "eos_token_id": None,           # None = EOS model/tokenizer
+}
+
+# key -> (tipe, batas bawah, batas bawah inklusif, batas atas)
+_PARAM_RANGES = {
+    "max_new_tokens": (int, 1, True, None),
+    "min_new_tokens": (int, 0, True, None),
+    "top_k": (int, 0, True, None),
+    "no_repeat_ngram_size": (int, 0, True, None),
+    "temperature": (float, 0.0, True, None),   # <= 0 = greedy
+    "top_p": (float, 0.0, False, 1.0),
+    "repetition_penalty": (float, 0.0, False, None),
+}
+
+
+def normalize_params(params=None):
+    """
+    SAMPLING_DEFAULTS + params (key lain diabaikan, None = default), tipe
+    & rentang dicek. Nilai salah -> ValueError di thread pemanggil
+    add_request, bukan di step() (fail_all menggagalkan semua request)
+    """
+    params = {**SAMPLING_DEFAULTS, **{
+        k: v for k, v in (params or {}).items() if k in SAMPLING_DEFAULTS and v is not None
+    }}
+    for key, (kind, low, inclusive, high) in _PARAM_RANGES.items():
+        value = params[key]
+        if isinstance(value, bool) or not isinstance(value, numbers.Real) or not math.isfinite(value):
+            raise ValueError(f"{key} harus angka, bukan {value!r}")
+        if kind is int:
+            if value != int(value):
+                raise ValueError(f"{key} harus bilangan bulat, bukan {value!r}")
+            value = int(value)
+        else:
+            value = float(value)
+        if value < low or (value == low and not inclusive) or (high is not None and value > high):
+            raise ValueError(f"{key} di luar rentang: {value!r}")
+        params[key] = value
+    if not isinstance(params["do_sample"], bool):
+        raise ValueError(f"do_sample harus bool, bukan {params['do_sample']!r}")
+    eos = params["eos_token_id"]
+    eos_list = eos if isinstance(eos, (list, tuple)) else [eos]
+    if eos is not None and not all(isinstance(e, numbers.Integral) and not isinstance(e, bool) for e in eos_list):
+        raise ValueError(f"eos_token_id harus int / list int, bukan {eos!r}")
+    return params
+
+
+# ============================================================
+# KV CACHE HELPERS (Cache object <-> list (key, value) per layer)
+# ============================================================
+
+def cache_to_kv(cache):
+    """[(key, value)] per layer, tensor [batch, heads, seq, head_dim]"""
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    if hasattr(cache, "key_cache"):
+        return list(zip(cache.key_cache, cache.value_cache))
+    return [tuple(layer[:2]) for layer in cache]
+
+
+def kv_to_cache(kv):
+    """Kebalikan cache_to_kv (DynamicCache baru)"""
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(tuple(kv))
+    return DynamicCache(kv)
+
+
+def _left_pad(tensor, length, dim, value=0):
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_full(shape, value), tensor], dim=dim)
+
+
+# ============================================================
+# SEQUENCE
+# ============================================================
+
+class Sequence:
+    """Satu request di scheduler (prompt, token hasil, parameter, status)"""
+
+    _ids = itertools.count()
+
+    def __init__(self, prompt_ids, params, eos_token_ids, on_token=None, on_finish=None):
+        self.request_id = next(self._ids)
+        self.prompt_ids = list(prompt_ids)
+        self.output_ids = []
+        self.params = params
+        self.eos_token_ids = eos_token_ids
+        self.on_token = on_token
+        self.on_finish = on_finish
+        self.finished = False
+        self.cancelled = False
+        self.finish_reason = None
+        self.error = None
+        self.text = None
+        self.max_batch_size = 0     # Baris batch terbanyak selama decode
+        self.prefix_length = 0      # Token awal prompt dari prefix cache
+        # no_repeat_ngram_size: (n-1)-gram -> token berikutnya yang pernah muncul
+        self.ngram_size = params["no_repeat_ngram_size"]
+        self.ngrams = {}
+        ids = self.prompt_ids
+        for i in range(len(ids) - self.ngram_size + 1 if self.ngram_size > 0 else 0):
+            self._add_ngram(ids, i)
+
+    @property
+    def all_ids(self):
+        return self.prompt_ids + self.output_ids
+
+    def _add_ngram(self, ids, start):
+        n = self.ngram_size
+        self.ngrams.setdefault(tuple(ids[start:start + n - 1]), set()).add(ids[start + n - 1])
+
+    def append(self, token):
+        self.output_ids.append(token)
+        if self.ngram_size > 0:
+            ids = self.all_ids
+            if len(ids) >= self.ngram_size:
+                self._add_ngram(ids, len(ids) - self.ngram_size)
+
+    def banned_tokens(self):
+        """Token yang akan mengulang n-gram yang sudah ada"""
+        n = self.ngram_size
+        if n <= 0 or len(self.prompt_ids) + len(self.output_ids) < n - 1:
+            return []
+        prefix = tuple(self.all_ids[-(n - 1):]) if n > 1 else ()
+        return list(self.ngrams.get(prefix, ()))
+
+    def cancel(self):
+        """Hentikan dari thread lain (mis. client putus); berlaku di step berikutnya"""
+        self.cancelled = True
+
+    def finish(self, reason, tokenizer=None, error=None):
+        self.finished = True
+        self.finish_reason = reason
+        self.error = error
+        if tokenizer is not None:
+            self.text = tokenizer.decode(self.output_ids, skip_special_tokens=True)
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+
+# ============================================================
+# SCHEDULER
+# ============================================================
+
+class ContinuousBatchScheduler:
+    """
+    Decode loop iteration-level. add_request aman dipanggil dari thread
+    lain; step() dipanggil dari satu thread (loop generate).
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=32, prefix_cache=None):
+        self.model = model
+        self.prefix_cache = prefix_cache
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.device = next(model.parameters()).device
+        config = model.config
+        self.max_positions = getattr(config, "n_positions", None) or getattr(config, "max_position_embeddings", None)
+
+        eos = getattr(getattr(model, "generation_config", None), "eos_token_id", None)
+        eos = eos if isinstance(eos, (list, tuple)) else [eos]
+        self.eos_token_ids = {e for e in list(eos) + [tokenizer.eos_token_id] if e is not None}
+
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.active = []        # Sequence per baris batch
+        self.cache = None       # DynamicCache [len(active), heads, T, dim]
+        self.mask = None        # [len(active), T] 1 = token asli, 0 = padding kiri
+        self.stats = {"steps": 0, "tokens": 0, "admitted": 0, "finished": 0}
+
+    # ── Request ─────────────────────────────────────────────
+
+    def add_request(self, prompt_ids, params=None, on_token=None, on_finish=None, template_ids=None):
+        """
+        Args:
+            prompt_ids: Token prompt (list int)
+            params: Parameter sampling (key model.generate, lihat SAMPLING_DEFAULTS);
+                tipe / rentang salah -> ValueError di sini
+            template_ids: Token template dengan pertanyaan kosong; prefix yang
+                sama diambil dari prefix_cache
+            on_token: Callback(seq, token_id) setiap token baru
+            on_finish: Callback(seq) saat selesai (dari thread loop)
+        """
+        params = normalize_params(params)
+        eos = params["eos_token_id"]
+        eos_ids = set(eos if isinstance(eos, (list, tuple)) else [eos]) if eos is not None else self.eos_token_ids
+        prompt_ids = list(prompt_ids)
+        if self.max_positions and len(prompt_ids) > self.max_positions - params["max_new_tokens"]:
+            # Sisakan ruang untuk jawaban: potong prompt dari kiri (prefix ikut terpotong)
+            prompt_ids = prompt_ids[-max(1, self.max_positions - params["max_new_tokens"]):]
+            template_ids = None
+        seq = Sequence(prompt_ids, params, eos_ids, on_token=on_token, on_finish=on_finish)
+        if self.prefix_cache is not None and template_ids is not None:
+            seq.prefix_length = self.prefix_cache.prefix_length(prompt_ids, template_ids)
+        with self.lock:
+            self.pending.append(seq)
+        return seq
+
+    def has_work(self):
+        return bool(self.active) or bool(self.pending)
+
+    def num_waiting(self):
+        return len(self.pending) + len(self.active)
+
+    def fail_all(self, error):
+        """Error di forward: semua request aktif & antri gagal"""
+        with self.lock:
+            sequences = self.active + list(self.pending)
+            self.pending.clear()
+        self.active, self.cache, self.mask = [], None, None
+        for seq in sequences:
+            if not seq.finished:
+                seq.finish("error", error=error)
+
+    # ── Sampling per baris ──────────────────────────────────
+
+    def _next_tokens(self, logits, sequences):
+        logits = logits.float()
+        vocab_size = logits.shape[-1]
+        for row, seq in enumerate(sequences):
+            p = seq.params
+            if p["repetition_penalty"] != 1.0:
+                seen = torch.tensor(sorted(set(seq.all_ids)), device=logits.device)
+                score = logits[row, seen]
+                logits[row, seen] = torch.where(
+                    score < 0, score * p["repetition_penalty"], score / p["repetition_penalty"]
+                )
+            banned = seq.banned_tokens()
+            if banned:
+                logits[row, banned] = float("-inf")
+            if len(seq.output_ids) < p["min_new_tokens"]:
+                logits[row, list(seq.eos_token_ids)] = float("-inf")
+
+        greedy_rows = [not s.params["do_sample"] or s.params["temperature"] <= 0 for s in sequences]
+        if all(greedy_rows):
+            return logits.argmax(dim=-1)
+        greedy = torch.tensor(greedy_rows, device=logits.device)
+        temperature = torch.tensor([max(s.params["temperature"], 1e-5) for s in sequences], device=logits.device)
+        top_k = torch.tensor([s.params["top_k"] or vocab_size for s in sequences], device=logits.device)
+        top_p = torch.tensor([s.params["top_p"] for s in sequences], device=logits.device)
+
+        # Cukup k terbesar (topk jauh lebih murah dari sort seluruh vocab)
+        k = min(vocab_size, int(top_k.max()))
+        sorted_logits, sorted_idx = (logits / temperature[:, None]).topk(k, dim=-1)
+        ranks = torch.arange(k, device=logits.device)
+        remove = ranks[None, :] >= top_k[:, None]
+        probs = sorted_logits.masked_fill(remove, float("-inf")).softmax(dim=-1)
+        remove |= (probs.cumsum(dim=-1) - probs) > top_p[:, None]
+        probs = sorted_logits.masked_fill(remove, float("-inf")).softmax(dim=-1)
+        sampled = sorted_idx.gather(1, torch.multinomial(probs, 1)).squeeze(1)
+        return torch.where(greedy, logits.argmax(dim=-1), sampled)
+
+    def _append(self, sequences, tokens):
+        for seq, token in zip(sequences, tokens.tolist()):
+            seq.append(token)
+            seq.max_batch_size = max(seq.max_batch_size, len(self.active))
+            self.stats["tokens"] += 1
+            if seq.on_token is not None:
+                seq.on_token(seq, token)
+            if seq.finished:
+                continue  # Dihentikan callback (mis. stop string)
+            if seq.cancelled:
+                seq.finish("cancelled", self.tokenizer)
+            elif token in seq.eos_token_ids:
+                seq.finish("eos", self.tokenizer)
+            elif len(seq.output_ids) >= seq.params["max_new_tokens"]:
+                seq.finish("length", self.tokenizer)
+            elif self.max_positions and len(seq.all_ids) >= self.max_positions:
+                seq.finish("length", self.tokenizer)
+
+    # ── Forward ─────────────────────────────────────────────
+
+    def _forward(self, input_ids, attention_mask, position_ids, cache):
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=cache,
+            use_cache=True,
+        )
+        return outputs.logits[:, -1, :], outputs.past_key_values
+
+    def _prefill(self, sequences):
+        """
+        Prefill request baru bersama -> token pertama. Semua sequence
+        berbagi prefix yang sama (dari prefix cache, bisa kosong); sisa
+        prompt di-padding kiri: [prefix][padding][pertanyaan]
+        """
+        prefix = sequences[0].prompt_ids[:sequences[0].prefix_length]
+        rests = [s.prompt_ids[len(prefix):] for s in sequences]
+        length = max(len(r) for r in rests)
+        input_ids = torch.tensor([[0] * (length - len(r)) + r for r in rests], device=self.device)
+        mask = torch.tensor(
+            [[1] * len(prefix) + [0] * (length - len(r)) + [1] * len(r) for r in rests], device=self.device
+        )
+        position_ids = (mask.cumsum(-1) - 1).clamp(min=0)[:, len(prefix):]
+        cache = self.prefix_cache.make_cache(prefix, len(sequences)) if prefix else DynamicCache()
+        logits, cache = self._forward(input_ids, mask, position_ids, cache)
+        return logits, cache, mask
+
+    def _merge(self, cache, mask):
+        """Gabungkan cache request baru ke batch aktif (padding kiri ke T sama)"""
+        if self.cache is None:
+            self.cache, self.mask = cache, mask
+            return
+        length = max(self.mask.shape[1], mask.shape[1])
+        kv = [
+            (torch.cat([_left_pad(k0, length, 2), _left_pad(k1, length, 2)]),
+             torch.cat([_left_pad(v0, length, 2), _left_pad(v1, length, 2)]))
+            for (k0, v0), (k1, v1) in zip(cache_to_kv(self.cache), cache_to_kv(cache))
+        ]
+        self.cache = kv_to_cache(kv)
+        self.mask = torch.cat([_left_pad(self.mask, length, 1), _left_pad(mask, length, 1)])
+
+    def _retire(self):
+        """Keluarkan sequence selesai + pangkas kolom padding yang tidak terpakai"""
+        keep = [i for i, s in enumerate(self.active) if not s.finished]
+        if len(keep) == len(self.active):
+            return
+        self.stats["finished"] += len(self.active) - len(keep)
+        self.active = [self.active[i] for i in keep]
+        if not keep:
+            self.cache, self.mask = None, None
+            return
+        index = torch.tensor(keep, device=self.device)
+        mask = self.mask.index_select(0, index)
+        start = int(mask.any(dim=0).nonzero()[0])
+        self.mask = mask[:, start:]
+        self.cache = kv_to_cache([
+            (k.index_select(0, index)[:, :, start:], v.index_select(0, index)[:, :, start:])
+            for k, v in cache_to_kv(self.cache)
+        ])
+
+    def _admit(self):
+        with self.lock:
+            free = self.max_batch_size - len(self.active)
+            new = [self.pending.popleft() for _ in range(min(free, len(self.pending)))]
+        groups = {}
+        for seq in new:
+            if seq.cancelled:  # Dibatalkan sebelum mulai
+                seq.finish("cancelled")
+            elif not seq.finished:
+                groups.setdefault(tuple(seq.prompt_ids[:seq.prefix_length]), []).append(seq)
+        try:
+            for group in groups.values():
+                logits, cache, mask = self._prefill(group)
+                self._merge(cache, mask)
+                self.active += group
+                self.stats["admitted"] += len(group)
+                self._append(group, self._next_tokens(logits, group))
+        except Exception as e:
+            # Sudah keluar dari pending tapi belum aktif: fail_all tidak
+            # melihatnya, jadi gagalkan di sini (future/stream tidak menggantung)
+            for seq in new:
+                if not seq.finished and seq not in self.active:
+                    seq.finish("error", error=e)
+            raise
+        return new
+
+    def _decode(self):
+        input_ids = torch.tensor([[s.output_ids[-1]] for s in self.active], device=self.device)
+        position_ids = self.mask.sum(dim=-1, keepdim=True)
+        attention_mask = torch.cat([self.mask, self.mask.new_ones(len(self.active), 1)], dim=1)
+        logits, self.cache = self._forward(input_ids, attention_mask, position_ids, self.cache)
+        self.mask = attention_mask
+        self._append(self.active, self._next_tokens(logits, self.active))
+
+    @torch.inference_mode()
+    def step(self):
+        """
+        Satu iterasi: admit request baru, decode satu token untuk semua
+        sequence aktif, keluarkan yang selesai
+
+        Returns:
+            List Sequence yang selesai di step ini
+        """
+        # Termasuk yang selesai di token pertama (prefill) / dibatalkan sebelum mulai
+        finished = [s for s in self._admit() if s.finished]
+        self._retire()
+        if self.active:
+            self._decode()
+            self.stats["steps"] += 1
+        finished += [s for s in self.active if s.finished]
+        self._retire()
+        return finished
+
+    def generate(self, prompts, params=None):
+        """Offline: jalankan sampai semua prompt (list token ids) selesai"""
+        sequences = [self.add_request(ids, params) for ids in prompts]
+        while self.has_work():
+            self.step()
+        return sequences
@@ -0,0 +1,199 @@
+"""
+CPU Performance Mode
+====================
+Sebagian besar eksperimen model 13M jalan di CPU, tapi TRAINING_CONFIG
+hanya mengatur GPU (fp16). Mode ini menyalakan optimasi khusus CPU:
+
+    - bf16 autocast (Trainer bf16=True + use_cpu) jika CPU mendukung
+      (AVX512-BF16 / AMX via oneDNN); CPU lama tetap fp32
+    - torch.compile per GPT-2 block (module.compile() in-place, jadi
+      nama parameter & checkpoint tidak berubah); jika compiler/inductor
+      gagal, block dikembalikan ke eager
+    - Thread intra-op = core yang tersedia (dibagi rata jika torchrun),
+      inter-op kecil (graph GPT-2 hampir sepenuhnya sekuensial)
+    - Contiguity: parameter & buffer dibuat contiguous (bobot hasil
+      slice/transpose/load membuat kernel oneDNN menyalin ulang tiap
+      step) dan attention memakai SDPA. channels_last tidak relevan
+      (tidak ada konvolusi 4D di GPT-2)
+
+Setiap langkah melapor apa yang aktif / di-skip (fallback graceful).
+
+Penggunaan:
+    from cpu_perf import apply_cpu_perf_mode
+
+    model, config, report = apply_cpu_perf_mode(model, TRAINING_CONFIG)
+    training_args = TrainingArguments(**config)
+
+Benchmark sebelum/sesudah: python scripts/bench_cpu_mode.py
+"""
+
+import os
+
+import torch
+
+CPU_PERF_DEFAULTS = {
+    "bf16": "auto",             # "auto" = jika CPU mendukung, True/False = paksa
+    "compile": True,            # torch.compile per GPT-2 block
+    "intra_op_threads": None,   # None = core tersedia / proses per node
+    "inter_op_threads": 1,
+    "contiguous": True,
+}
+
+
+# ============================================================
+# DETEKSI HARDWARE
+# ============================================================
+
+def available_cores():
+    """Core yang boleh dipakai proses ini (menghormati taskset / cgroup)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _cpu_flags():
+    try:
+        with open("/proc/cpuinfo", 'r') as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def cpu_supports_bf16():
+    """True jika oneDNN punya kernel bf16 native (AVX512-BF16 / AMX)"""
+    try:
+        if not torch.backends.mkldnn.is_available():
+            return False
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        # torch lama: cek flag CPU langsung
+        return bool(_cpu_flags() & {"avx512_bf16", "amx_bf16"})
+
+
+# ============================================================
+# OPTIMASI
+# ============================================================
+
+def configure_threads(intra_op_threads=None, inter_op_threads=1):
+    """
+    Atur thread intra-op & inter-op
+
+    set_num_interop_threads hanya bisa sekali dan sebelum ada kerja
+    paralel; jika sudah terlambat, nilai lama dipertahankan.
+    """
+    if intra_op_threads is None:
+        local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+        intra_op_threads = max(1, available_cores() // local_world_size)
+    torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            pass
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def make_contiguous(model):
+    """Parameter & buffer non-contiguous -> contiguous (in-place, tie tetap)"""
+    fixed = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        if not tensor.is_contiguous():
+            tensor.data = tensor.data.contiguous()
+            fixed += 1
+    config = getattr(model, "config", None)
+    if config is not None and getattr(config, "_attn_implementation", None) == "eager":
+        try:
+            config._attn_implementation = "sdpa"
+        except (AttributeError, ValueError):
+            pass
+    return fixed
+
+
+def _gpt2_blocks(model):
+    if hasattr(model, "get_base_model"):
+        model = model.get_base_model()
+    transformer = getattr(model, "transformer", None)
+    return list(getattr(transformer, "h", []))
+
+
+def _smoke_test(model, seq_len=16):
+    """Satu forward + backward kecil supaya error compile muncul sekarang"""
+    vocab_size = model.get_input_embeddings().weight.shape[0]
+    input_ids = torch.randint(0, vocab_size, (1, seq_len))
+    was_training = model.training
+    model.train()
+    loss = model(input_ids=input_ids, labels=input_ids).loss
+    loss.backward()
+    model.zero_grad(set_to_none=True)
+    model.train(was_training)
+
+
+def compile_gpt2_blocks(model, **compile_kwargs):
+    """
+    torch.compile setiap GPT-2 block in-place
+
+    Returns:
+        Jumlah block yang ter-compile (0 = fallback eager)
+    """
+    blocks = _gpt2_blocks(model)
+    if not blocks or not hasattr(torch, "compile") or not hasattr(blocks[0], "compile"):
+        return 0
+    # Semua block berbagi code object forward yang sama; tiap block (x shape,
+    # x autocast) butuh entry cache sendiri, jangan sampai limit default
+    # membuat sebagian block diam-diam kembali ke eager
+    dynamo_config = torch._dynamo.config
+    for name in ("recompile_limit", "cache_size_limit"):
+        if hasattr(dynamo_config, name):
+            setattr(dynamo_config, name, max(getattr(dynamo_config, name), 8 * len(blocks)))
+    try:
+        for block in blocks:
+            block.compile(**compile_kwargs)
+        _smoke_test(model)
+    except Exception as e:
+        for block in blocks:
+            block._compiled_call_impl = None
+        print(f"⚠️  torch.compile gagal, kembali ke eager: {type(e).__name__}: {str(e)[:200]}")
+        return 0
+    return len(blocks)
+
+
+def apply_cpu_perf_mode(model, training_config, settings=None):
+    """
+    Terapkan semua optimasi CPU
+
+    Args:
+        model: GPT2LMHeadModel (boleh dibungkus PEFT)
+        training_config: Dict TrainingArguments
+        settings: Override CPU_PERF_DEFAULTS
+
+    Returns:
+        (model, training_config baru, report dict)
+    """
+    settings = {**CPU_PERF_DEFAULTS, **(settings or {})}
+    config = dict(training_config)
+    report = {}
+
+    intra, inter = configure_threads(settings["intra_op_threads"], settings["inter_op_threads"])
+    report["threads"] = f"{intra} intra-op / {inter} inter-op"
+
+    if settings["contiguous"]:
+        report["contiguous_fixed"] = make_contiguous(model)
+
+    bf16 = cpu_supports_bf16() if settings["bf16"] == "auto" else bool(settings["bf16"])
+    if settings["bf16"] == "auto" and not bf16:
+        print("ℹ️  CPU tanpa bf16 native (AVX512-BF16/AMX) -> tetap fp32")
+    config["bf16"] = bf16
+    config["fp16"] = False
+    config["use_cpu"] = True
+    report["bf16_autocast"] = bf16
+
+    report["compiled_blocks"] = compile_gpt2_blocks(model) if settings["compile"] else 0
+
+    print("⚙️  CPU performance mode:")
+    for key, value in report.items():
+        print(f"   {key}: {value}")
+    return model, config, report
@@ -0,0 +1,113 @@
+"""
+Content-Addressed Tokenized Dataset Cache
+=========================================
+Simpan hasil tokenize (+ packing / chat template) sebagai Arrow di disk,
+dengan key = hash isi file JSON input + hash file tokenizer + setting
+template/format. Launch ulang dengan data & tokenizer yang sama (mis.
+hanya learning rate yang berubah) langsung load_from_disk (mmap),
+tanpa json.load, tokenize, atau packing lagi.
+
+Penggunaan:
+    from dataset_cache import load_or_build
+
+    def build():
+        ds = load_dataset_from_json(path)
+        return ds.map(tokenize, batched=True, remove_columns=["text"])
+
+    train_dataset = load_or_build(
+        "finetune_qa-train", [path], tokenizer,
+        settings={"max_length": 512, "packing": PACKING_CONFIG},
+        build_fn=build,
+    )
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+from datasets import load_from_disk
+
+DEFAULT_CACHE_DIR = "./cache/tokenized"
+
+
+def hash_files(paths, chunk_size=1 << 20):
+    """SHA-256 dari isi file (berurutan)"""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def tokenizer_hash(tokenizer):
+    """
+    Hash file tokenizer persis seperti yang akan disimpan save_pretrained
+    (vocab, merges, special tokens, chat template, pad token yang di-set
+    setelah load, dst.)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        tokenizer.save_pretrained(tmp)
+        # State truncation/padding di backend berubah setelah tokenizer
+        # dipanggil; bukan bagian dari isi tokenizer
+        backend_path = os.path.join(tmp, "tokenizer.json")
+        if os.path.exists(backend_path):
+            with open(backend_path, 'r', encoding='utf-8') as f:
+                backend = json.load(f)
+            backend["truncation"] = backend["padding"] = None
+            with open(backend_path, 'w', encoding='utf-8') as f:
+                json.dump(backend, f, sort_keys=True)
+        files = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(tmp)
+            for name in names
+        )
+        return hash_files(files)
+
+
+def dataset_cache_key(data_paths, tokenizer, settings=None):
+    """Key cache: isi data + tokenizer + setting format (JSON terurut)"""
+    h = hashlib.sha256()
+    h.update(hash_files(data_paths).encode())
+    h.update(tokenizer_hash(tokenizer).encode())
+    h.update(json.dumps(settings or {}, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+def load_or_build(name, data_paths, tokenizer, settings, build_fn,
+                  cache_dir=DEFAULT_CACHE_DIR, enabled=True):
+    """
+    Load dataset dari cache, atau build lalu simpan
+
+    Args:
+        name: Prefix folder cache (mis. "finetune_qa-train")
+        data_paths: File input yang isinya menentukan hasil
+        tokenizer: Tokenizer yang dipakai build_fn
+        settings: Dict setting template/format/max_length/packing
+        build_fn: Callable tanpa argumen -> datasets.Dataset
+        enabled: False = selalu build (tanpa cache)
+
+    Returns:
+        datasets.Dataset (hasil load_from_disk, Arrow di-mmap)
+    """
+    if not enabled:
+        return build_fn()
+
+    key = dataset_cache_key(data_paths, tokenizer, settings)
+    path = os.path.join(cache_dir, f"{name}-{key}")
+    if os.path.isdir(path):
+        print(f"⚡ Tokenized cache hit: {path}")
+        return load_from_disk(path)
+
+    dataset = build_fn()
+    tmp_path = path + ".tmp"
+    if os.path.isdir(tmp_path):
+        shutil.rmtree(tmp_path)
+    dataset.save_to_disk(tmp_path)
+    os.replace(tmp_path, path)
+    print(f"💾 Tokenized cache saved: {path}")
+    # Reload supaya training membaca Arrow yang di-mmap, bukan salinan di RAM
+    return load_from_disk(path)
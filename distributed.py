@@ -0,0 +1,89 @@
+"""
+CPU Data-Parallel Training (torchrun + gloo)
+============================================
+Satu proses PyTorch tidak memakai semua core di server CPU besar
+(scaling intra-op berhenti jauh sebelum 64 core). Dengan torchrun,
+beberapa proses dijalankan sekaligus; masing-masing memegang replika
+model, membaca bagian data sendiri, dan gradient di-all-reduce lewat
+backend gloo.
+
+Yang diatur di sini:
+    - Info rank dari environment torchrun (RANK, LOCAL_RANK, WORLD_SIZE)
+    - TrainingArguments: ddp_backend="gloo", use_cpu jika tanpa GPU
+    - Thread per rank = core tersedia / proses per node (torchrun default
+      OMP_NUM_THREADS=1), hitungan sama dengan cpu_perf.configure_threads
+    - Output print hanya dari rank 0
+
+Sharding data per rank: dataset map-style lewat DistributedSampler
+Trainer (token-budget batch sampler lewat BatchSamplerShard accelerate);
+StreamingTextDataset lewat StreamingDataMixin (shard per rank x worker).
+Checkpoint & log Trainer sudah hanya dari rank 0 (args.should_save).
+
+Penggunaan:
+    torchrun --standalone --nproc_per_node 4 train_tiny_llm.py
+"""
+
+import os
+import sys
+
+import torch
+
+
+def get_dist_info():
+    """(rank, local_rank, world_size, local_world_size) dari env torchrun"""
+    rank = int(os.environ.get("RANK", 0))
+    local_rank = int(os.environ.get("LOCAL_RANK", 0))
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
+    local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", world_size))
+    return rank, local_rank, world_size, local_world_size
+
+
+def is_distributed():
+    return get_dist_info()[2] > 1
+
+
+def is_main_process():
+    return get_dist_info()[0] == 0
+
+
+def configure_cpu_threads(num_threads=None):
+    """
+    Bagi core yang boleh dipakai (affinity / cgroup, cpu_perf.available_cores)
+    rata ke proses di node ini. Inter-op tidak disentuh: diatur sekali oleh
+    apply_cpu_perf_mode
+    """
+    from cpu_perf import configure_threads
+
+    return configure_threads(num_threads, inter_op_threads=None)[0]
+
+
+def silence_non_main_ranks():
+    """Print hanya dari rank 0 (rank lain ke /dev/null, stderr tetap)"""
+    if not is_main_process():
+        sys.stdout = open(os.devnull, 'w')
+
+
+def distributed_training_config(config, backend="gloo", num_threads=None):
+    """
+    Sesuaikan TrainingArguments dict untuk torchrun
+
+    Tanpa GPU: gloo + use_cpu. Dengan GPU, backend tetap bisa dipaksa
+    lewat argumen backend (default gloo sesuai target server CPU).
+
+    Returns:
+        Dict config baru (config asli tidak diubah)
+    """
+    if not is_distributed():
+        return dict(config)
+
+    config = dict(config)
+    config["ddp_backend"] = backend
+    config["ddp_find_unused_parameters"] = False
+    if not torch.cuda.is_available():
+        config["use_cpu"] = True
+        config["dataloader_pin_memory"] = False
+        threads = configure_cpu_threads(num_threads)
+        rank, _, world_size, _ = get_dist_info()
+        if rank == 0:
+            print(f"🖧  DDP {backend}: {world_size} proses x {threads} thread")
+    return config
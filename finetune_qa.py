@@ -16,12 +16,17 @@ from datasets import Dataset
 from transformers import (
     GPT2LMHeadModel,
     AutoTokenizer,
-    Trainer,
     TrainingArguments,
     DataCollatorForLanguageModeling,
     EarlyStoppingCallback,
+    default_data_collator,
 )
 
+from packing import check_reset_position_ids, pack_dataset, print_packing_stats
+from length_batching import TokenBudgetTrainer
+from dataset_cache import load_or_build
+from throughput import ThroughputCallback
+
 # ============================================================
 # KONFIGURASI
 # ============================================================
@@ -38,6 +43,31 @@ OUTPUT_PATH = "./tiny-llm-indo-qa"
 TRAIN_DATA_PATH = "./dataset/train_qa.json"
 EVAL_DATA_PATH = "./dataset/eval_qa.json"
 
+# Sequence packing - sample Q&A pendek digabung jadi blok 512 token
+USE_PACKING = True
+
+PACKING_CONFIG = {
+    "block_size": 512,
+    # True = reset posisi per sample; hanya untuk flash_attention_2 (GPU),
+    # dengan eager/sdpa sample dalam blok tetap saling attend
+    "reset_position_ids": False,
+}
+
+# Cache hasil tokenize + packing (Arrow, key = isi JSON + tokenizer + setting)
+USE_DATASET_CACHE = True
+
+# Log throughput per logging window -> JSONL (None = nonaktif)
+THROUGHPUT_LOG = "./logs/throughput_finetune_qa.jsonl"
+THROUGHPUT_PEAK_TFLOPS = None  # Peak hardware untuk MFU; None = tabel GPU / estimasi CPU
+
+# Token-budget batching - alternatif packing (dipakai jika USE_PACKING = False)
+USE_TOKEN_BUDGET = False
+
+TOKEN_BUDGET_CONFIG = {
+    "max_tokens_per_batch": 8 * 512,           # Worst case = batch lama (8 x 512)
+    "max_batch_size": 128,
+}
+
 # Training config untuk fine-tuning Q&A
 FINETUNE_CONFIG = {
     "output_dir": "./tiny-llm-indo-qa-checkpoints",
@@ -77,14 +107,14 @@ def load_dataset_from_json(path):
     return Dataset.from_list(data)
 
 
-def tokenize_function(examples, tokenizer, max_length=512):
-    """Tokenize texts"""
+def tokenize_function(examples, tokenizer, max_length=512, padding="max_length"):
+    """Tokenize texts (padding=False untuk mode packing)"""
     return tokenizer(
         examples["text"],
         truncation=True,
         max_length=max_length,
-        padding="max_length",
-        return_special_tokens_mask=True,
+        padding=padding,
+        return_special_tokens_mask=bool(padding),
     )
 
 
@@ -132,40 +162,59 @@ def main():
     if tokenizer.pad_token is None:
         tokenizer.pad_token = tokenizer.eos_token
     
+    if USE_PACKING:
+        check_reset_position_ids(model, PACKING_CONFIG["reset_position_ids"])
+    
     # Count parameters
     total_params = sum(p.numel() for p in model.parameters())
     print(f"✓ Model loaded: {total_params/1e6:.1f}M parameters")
     
-    # Load datasets
+    # Load + tokenize (tanpa padding jika packing), lewat cache jika ada
     print(f"\n📂 Loading Q&A datasets...")
-    train_dataset = load_dataset_from_json(TRAIN_DATA_PATH)
-    eval_dataset = load_dataset_from_json(EVAL_DATA_PATH)
-    
-    print(f"✓ Train: {len(train_dataset)} samples")
-    print(f"✓ Eval: {len(eval_dataset)} samples")
-    
-    # Tokenize
-    print("\n🔤 Tokenizing...")
-    train_dataset = train_dataset.map(
-        lambda x: tokenize_function(x, tokenizer),
-        batched=True,
-        remove_columns=["text"],
-        desc="Tokenizing train"
-    )
+    padding = False if (USE_PACKING or USE_TOKEN_BUDGET) else "max_length"
+    cache_settings = {
+        "max_length": 512,
+        "padding": padding,
+        "packing": PACKING_CONFIG if USE_PACKING else None,
+    }
     
-    eval_dataset = eval_dataset.map(
-        lambda x: tokenize_function(x, tokenizer),
-        batched=True,
-        remove_columns=["text"],
-        desc="Tokenizing eval"
-    )
+    def build(path, split):
+        dataset = load_dataset_from_json(path)
+        print(f"🔤 Tokenizing {split}: {len(dataset)} samples")
+        dataset = dataset.map(
+            lambda x: tokenize_function(x, tokenizer, padding=padding),
+            batched=True,
+            remove_columns=["text"],
+            desc=f"Tokenizing {split}"
+        )
+        if USE_PACKING:
+            dataset, packing_stats = pack_dataset(
+                dataset, tokenizer, desc=f"Packing {split}", **PACKING_CONFIG
+            )
+            print_packing_stats(packing_stats)
+        return dataset
     
-    # Data collator
-    data_collator = DataCollatorForLanguageModeling(
-        tokenizer=tokenizer,
-        mlm=False,
+    train_dataset = load_or_build(
+        "finetune_qa-train", [TRAIN_DATA_PATH], tokenizer, cache_settings,
+        lambda: build(TRAIN_DATA_PATH, "train"), enabled=USE_DATASET_CACHE,
+    )
+    eval_dataset = load_or_build(
+        "finetune_qa-eval", [EVAL_DATA_PATH], tokenizer, cache_settings,
+        lambda: build(EVAL_DATA_PATH, "eval"), enabled=USE_DATASET_CACHE,
     )
     
+    print(f"✓ Train: {len(train_dataset)} {'blocks' if USE_PACKING else 'samples'}")
+    print(f"✓ Eval: {len(eval_dataset)} {'blocks' if USE_PACKING else 'samples'}")
+    
+    # Data collator (blok packed sudah punya labels & panjang sama)
+    if USE_PACKING:
+        data_collator = default_data_collator
+    else:
+        data_collator = DataCollatorForLanguageModeling(
+            tokenizer=tokenizer,
+            mlm=False,
+        )
+    
     # Training arguments
     training_args = TrainingArguments(**FINETUNE_CONFIG)
     
@@ -176,15 +225,24 @@ def main():
             early_stopping_threshold=0.001     # Threshold minimal improvement
         ),
     ]
+    if THROUGHPUT_LOG:
+        callbacks.append(ThroughputCallback(
+            THROUGHPUT_LOG,
+            peak_flops=THROUGHPUT_PEAK_TFLOPS * 1e12 if THROUGHPUT_PEAK_TFLOPS else None,
+        ))
+    
+    # Token-budget batching (packing lebih diutamakan jika keduanya aktif)
+    trainer_kwargs = TOKEN_BUDGET_CONFIG if (USE_TOKEN_BUDGET and not USE_PACKING) else {}
     
     # Trainer
-    trainer = Trainer(
+    trainer = TokenBudgetTrainer(
         model=model,
         args=training_args,
         train_dataset=train_dataset,
         eval_dataset=eval_dataset,
         data_collator=data_collator,
         callbacks=callbacks,
+        **trainer_kwargs,
     )
     
     # Fine-tune!
@@ -6,6 +6,7 @@ Menggunakan LoRA untuk efisiensi memory GPU
 
 Penggunaan:
     python finetune_qwen.py
+    python finetune_qwen.py --resume      # Lanjut dari checkpoint valid terakhir
 
 Requirements:
     pip install torch transformers datasets accelerate peft bitsandbytes trl
@@ -26,6 +27,12 @@ from transformers import (
 from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training, TaskType
 from trl import SFTTrainer, DataCollatorForCompletionOnlyLM
 
+from length_batching import TokenBudgetMixin
+from dataset_cache import load_or_build
+from throughput import ThroughputCallback
+from async_checkpoint import AsyncCheckpointMixin
+from preemption import PreemptionCallback, parse_resume_arg, resolve_resume_checkpoint
+
 # ============================================================
 # KONFIGURASI
 # ============================================================
@@ -57,6 +64,26 @@ LORA_CONFIG = {
 # Quantization - 4bit untuk hemat VRAM
 USE_4BIT = True  # Set False jika GPU VRAM >= 24GB
 
+# Token-budget batching: batch dibatasi jumlah token, bukan jumlah sample.
+# Sapaan pendek masuk batch besar, jawaban CoT panjang masuk batch kecil.
+USE_TOKEN_BUDGET = True
+
+TOKEN_BUDGET_CONFIG = {
+    "max_tokens_per_batch": 4 * 512,        # Worst case = batch lama (4 x 512)
+    "max_batch_size": 32,
+}
+
+# Cache chat template + tokenize (Arrow, key = isi JSON + tokenizer + setting).
+# SFTTrainer menerima dataset yang sudah di-tokenize, tanpa prepare ulang.
+USE_DATASET_CACHE = True
+
+# Log throughput per logging window -> JSONL (None = nonaktif)
+THROUGHPUT_LOG = "./logs/throughput_qwen.jsonl"
+THROUGHPUT_PEAK_TFLOPS = None  # Peak hardware untuk MFU; None = tabel GPU / estimasi CPU
+
+# Checkpoint adapter + optimizer ditulis di thread background (async_checkpoint.py)
+ASYNC_CHECKPOINT = True
+
 # Training config
 TRAINING_CONFIG = {
     "output_dir": CHECKPOINT_DIR,
@@ -90,6 +117,11 @@ TRAINING_CONFIG = {
 }
 
 
+class TokenBudgetSFTTrainer(AsyncCheckpointMixin, TokenBudgetMixin, SFTTrainer):
+    """SFTTrainer dengan token-budget batching dan async checkpoint"""
+    pass
+
+
 # ============================================================
 # CHAT TEMPLATE
 # ============================================================
@@ -120,7 +152,11 @@ def format_chat(q, a, cot=None):
 # MAIN
 # ============================================================
 
-def main():
+def main(resume=None):
+    """
+    Args:
+        resume: True = checkpoint valid terakhir di CHECKPOINT_DIR, path = checkpoint tertentu
+    """
     print("=" * 60)
     print("🚀 FINE-TUNE MODEL SENDIRI UNTUK Q&A INDONESIA")
     print("=" * 60)
@@ -201,16 +237,8 @@ def main():
     # ── Load & format dataset ───────────────────────────────
     print(f"\n📂 Loading datasets...")
     
-    with open(TRAIN_DATA_PATH, 'r', encoding='utf-8') as f:
-        train_raw = json.load(f)
-    with open(EVAL_DATA_PATH, 'r', encoding='utf-8') as f:
-        eval_raw = json.load(f)
-    
-    print(f"   Raw train: {len(train_raw)} samples")
-    print(f"   Raw eval: {len(eval_raw)} samples")
-    
-    # Format ke chat template
-    print(f"\n🔄 Formatting ke chat template...")
+    # Extract max_seq_length from config
+    max_seq_length = TRAINING_CONFIG.pop("max_seq_length", 512)
     
     def extract_qa_from_text(item):
         """Extract q/a from pre-formatted text or dict"""
@@ -263,45 +291,81 @@ def main():
             print(f"   ⚠️  Skipped {skipped} invalid entries")
         return formatted
     
-    train_formatted = format_dataset(train_raw)
-    eval_formatted = format_dataset(eval_raw)
-    
-    print(f"   ✓ Train: {len(train_formatted)} samples")
-    print(f"   ✓ Eval: {len(eval_formatted)} samples")
-    
-    if train_formatted:
-        print(f"\n📝 Sample formatted data:")
-        print("-" * 60)
-        sample = train_formatted[0]["text"]
-        print(sample[:500] + ("..." if len(sample) > 500 else ""))
-        print("-" * 60)
+    def build(path, split):
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        print(f"   Raw {split}: {len(raw)} samples")
+        
+        # Format ke chat template
+        print(f"\n🔄 Formatting {split} ke chat template...")
+        formatted = format_dataset(raw)
+        print(f"   ✓ {split}: {len(formatted)} samples")
+        
+        if formatted and split == "train":
+            print(f"\n📝 Sample formatted data:")
+            print("-" * 60)
+            sample = formatted[0]["text"]
+            print(sample[:500] + ("..." if len(sample) > 500 else ""))
+            print("-" * 60)
+        
+        # Tokenize sekali di sini (sama seperti SFTTrainer: truncation, tanpa padding)
+        return Dataset.from_list(formatted).map(
+            lambda x: tokenizer(x["text"], truncation=True, max_length=max_seq_length),
+            batched=True,
+            remove_columns=["text"],
+            desc=f"Tokenizing {split}",
+        )
     
-    train_dataset = Dataset.from_list(train_formatted)
-    eval_dataset = Dataset.from_list(eval_formatted)
+    cache_settings = {
+        "format": "qwen-chat",
+        "system_prompt": SYSTEM_PROMPT,
+        "max_seq_length": max_seq_length,
+    }
+    train_dataset = load_or_build(
+        "qwen_sft-train", [TRAIN_DATA_PATH], tokenizer, cache_settings,
+        lambda: build(TRAIN_DATA_PATH, "train"), enabled=USE_DATASET_CACHE,
+    )
+    eval_dataset = load_or_build(
+        "qwen_sft-eval", [EVAL_DATA_PATH], tokenizer, cache_settings,
+        lambda: build(EVAL_DATA_PATH, "eval"), enabled=USE_DATASET_CACHE,
+    )
+    print(f"   ✓ Train: {len(train_dataset)} samples (tokenized)")
+    print(f"   ✓ Eval: {len(eval_dataset)} samples (tokenized)")
     
     # ── Training ────────────────────────────────────────────
     print(f"\n🏋️ STARTING TRAINING")
     print("=" * 60)
     
-    # Extract max_seq_length from config
-    max_seq_length = TRAINING_CONFIG.pop("max_seq_length", 512)
-    
     training_args = TrainingArguments(**TRAINING_CONFIG)
     
+    trainer_kwargs = dict(TOKEN_BUDGET_CONFIG) if USE_TOKEN_BUDGET else {}
+    trainer_kwargs["async_checkpoint"] = ASYNC_CHECKPOINT
+    callbacks = [ThroughputCallback(
+            THROUGHPUT_LOG,
+            peak_flops=THROUGHPUT_PEAK_TFLOPS * 1e12 if THROUGHPUT_PEAK_TFLOPS else None,
+        )] if THROUGHPUT_LOG else []
+    preemption = PreemptionCallback()
+    callbacks.append(preemption)
+    resume_from_checkpoint = resolve_resume_checkpoint(resume, TRAINING_CONFIG["output_dir"])
+    
     # Use SFTTrainer from trl for cleaner supervised fine-tuning
-    trainer = SFTTrainer(
+    trainer = TokenBudgetSFTTrainer(
         model=model,
         args=training_args,
         train_dataset=train_dataset,
         eval_dataset=eval_dataset,
         tokenizer=tokenizer,
         max_seq_length=max_seq_length,
-        dataset_text_field="text",
         packing=False,
+        dataset_kwargs={"skip_prepare_dataset": True},  # Sudah di-tokenize
+        callbacks=callbacks,
+        **trainer_kwargs,
     )
     
     # Train!
-    trainer.train()
+    trainer.train(resume_from_checkpoint=resume_from_checkpoint)
+    if preemption.preempted:
+        return  # Checkpoint sudah tersimpan; lanjutkan dengan --resume
     
     # ── Save model ──────────────────────────────────────────
     print(f"\n💾 Saving model to: {OUTPUT_PATH}")
@@ -351,4 +415,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(resume=parse_resume_arg())
@@ -0,0 +1,680 @@
+"""
+Inference Server dengan Dynamic Batching
+========================================
+HTTP server (asyncio, stdlib) di atas ask_question. Dua scheduler:
+
+    dynamic     Request yang datang bersamaan dikumpulkan dalam jendela
+                waktu pendek (max_wait_ms) sampai max_batch_size,
+                di-padding kiri dan dijawab dengan SATU model.generate
+                (test_model.ask_questions / test_model_qwen.ask_questions).
+                Request dengan parameter generate berbeda dibagi per grup.
+    continuous  (default) Iteration-level batching (continuous_batching.py):
+                request masuk/keluar batch di setiap token, parameter
+                sampling per request, jawaban pendek tidak menunggu yang
+                panjang. Beam search (GPT-2 use_beam_search) tetap lewat
+                dynamic batcher.
+
+Generate berjalan di thread worker, jadi event loop tetap menerima
+request baru selama batch dihitung. Antrian penuh (max_queue) -> HTTP 503,
+parameter salah (tipe / rentang / qa_format) -> HTTP 400.
+
+Endpoint:
+    POST /ask        {"question": "...", "temperature": 0.2, ...}
+                     {"question": "...", "stream": true} -> Server-Sent Events:
+                     data: {"delta": "..."} per token, lalu data: {"answer": ..., "done": true}
+                     (scheduler continuous, tanpa beam search)
+    POST /ask_batch  {"questions": ["...", "..."], ...}
+    GET  /health
+    GET  /stats      jumlah request, batch, rata-rata ukuran batch
+
+Penggunaan:
+    python inference_server.py ./tiny-llm-indo-qa --port 8000
+    python inference_server.py ./masa-ai-qwen-merged --qwen --max-batch 8
+    python inference_server.py ./tiny-llm-indo-qa --scheduler dynamic
+
+    curl -X POST localhost:8000/ask -d '{"question": "Apa itu komputer?"}'
+
+Benchmark concurrency: python scripts/bench_server.py ./tiny-llm-indo-qa
+Benchmark tail latency: python scripts/bench_continuous.py ./tiny-llm-indo-qa
+"""
+
+import sys
+import json
+import math
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8000,
+    "max_batch_size": 16,       # Request per model.generate
+    "max_wait_ms": 20,          # Jendela pengumpulan batch setelah request pertama
+    "max_queue": 256,           # Request menunggu; lebih -> 503
+    "max_body_bytes": 64 * 1024,
+    "max_new_tokens_limit": 1024,  # Batas max_new_tokens per request (> -> 400)
+    "scheduler": "continuous",  # "continuous" atau "dynamic"
+}
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+
+class GPT2Backend:
+    """Tiny LLM (GPT-2) dengan template Q&A test_model.py"""
+
+    name = "gpt2"
+    default_params = {
+        "qa_format": "instruction",
+        "temperature": 0.2,
+        "use_beam_search": True,
+        "max_new_tokens": 60,
+    }
+
+    def __init__(self, model_path):
+        import test_model
+        self._module = test_model
+        self.model, self.tokenizer, self.device = test_model.load_model(model_path)
+
+    def generate(self, questions, params):
+        return self._module.ask_questions(self.model, self.tokenizer, questions, self.device, **params)
+
+    @property
+    def use_prefix_cache(self):
+        return self._module.PREFIX_CACHE
+
+    @property
+    def qa_formats(self):
+        return tuple(self._module.QA_TEMPLATES)
+
+    def supports_continuous(self, params):
+        return not params["use_beam_search"]
+
+    def prepare(self, question, params):
+        """Request continuous batching: prompt, sampling, stop, post-processing"""
+        prompt, stop_token = self._module.build_qa_prompt(question, params["qa_format"])
+        template, _ = self._module.build_qa_prompt("", params["qa_format"])
+        return {
+            "prompt_ids": self.tokenizer(prompt).input_ids,
+            "template_ids": self.tokenizer(template).input_ids,
+            "gen_params": self._module.qa_generation_params(
+                self.tokenizer, params["temperature"], use_beam_search=False,
+                max_new_tokens=params["max_new_tokens"],
+            ),
+            "stop_strings": [stop_token],
+            "max_sentences": self._module.MAX_ANSWER_SENTENCES,
+            "sentence_filter": self._module.is_valid_sentence,
+            "finalize": lambda text: self._module.clean_answer(text, stop_token),
+        }
+
+
+class QwenBackend:
+    """Qwen merged model dengan chat template test_model_qwen.py"""
+
+    name = "qwen"
+    default_params = {
+        "temperature": 0.4,
+        "max_new_tokens": 256,
+        "system_prompt": None,
+    }
+
+    def __init__(self, model_path):
+        import test_model_qwen
+        self._module = test_model_qwen
+        self.model, self.tokenizer, self.device = test_model_qwen.load_model(model_path)
+
+    def generate(self, questions, params):
+        return self._module.ask_questions(self.model, self.tokenizer, questions, self.device, **params)
+
+    @property
+    def use_prefix_cache(self):
+        return self._module.PREFIX_CACHE
+
+    def supports_continuous(self, params):
+        return True
+
+    def prepare(self, question, params):
+        """Request continuous batching: prompt, sampling, stop, post-processing"""
+        prompt = self._module.build_chat_prompt(self.tokenizer, question, params["system_prompt"])
+        template = self._module.build_chat_prompt(self.tokenizer, "", params["system_prompt"])
+        return {
+            "prompt_ids": self.tokenizer(prompt).input_ids,
+            "template_ids": self.tokenizer(template).input_ids,
+            "gen_params": self._module.chat_generation_params(
+                self.tokenizer, params["temperature"], params["max_new_tokens"]
+            ),
+            "stop_strings": [],
+            "max_sentences": None,
+            "sentence_filter": None,
+            "finalize": str.strip,
+        }
+
+
+BACKENDS = {"gpt2": GPT2Backend, "qwen": QwenBackend}
+
+
+MAX_TEMPERATURE = 5.0
+
+
+class InvalidParamsError(Exception):
+    """Parameter request tidak valid -> HTTP 400"""
+    pass
+
+
+def _number(key, value, integer=False):
+    """JSON number atau string angka ("0.5") -> float / int"""
+    if isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            raise InvalidParamsError(f"'{key}' harus angka") from None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise InvalidParamsError(f"'{key}' harus angka")
+    if integer:
+        if value != int(value):
+            raise InvalidParamsError(f"'{key}' harus bilangan bulat")
+        return int(value)
+    return float(value)
+
+
+def _flag(key, value):
+    """JSON bool, 0/1, atau "true"/"false" -> bool"""
+    if isinstance(value, str):
+        value = {"true": True, "false": False, "1": True, "0": False}.get(value.strip().lower(), value)
+    if isinstance(value, (bool, int)) and value in (0, 1):
+        return bool(value)
+    raise InvalidParamsError(f"'{key}' harus boolean")
+
+
+def request_params(backend, payload, max_new_tokens_limit=SERVER_CONFIG["max_new_tokens_limit"]):
+    """
+    Parameter generate dari body request (hanya key yang dikenal backend),
+    sudah dikonversi & dicek. Nilai salah -> InvalidParamsError (HTTP 400),
+    jangan sampai TypeError di loop generate menggagalkan request lain.
+    """
+    params = dict(backend.default_params)
+    for key in params:
+        if key in payload:
+            params[key] = payload[key]
+
+    if "temperature" in params:
+        params["temperature"] = _number("temperature", params["temperature"])
+        if not 0 < params["temperature"] <= MAX_TEMPERATURE:
+            raise InvalidParamsError(f"'temperature' harus > 0 dan <= {MAX_TEMPERATURE}")
+    if "max_new_tokens" in params:
+        params["max_new_tokens"] = _number("max_new_tokens", params["max_new_tokens"], integer=True)
+        if not 1 <= params["max_new_tokens"] <= max_new_tokens_limit:
+            raise InvalidParamsError(f"'max_new_tokens' harus 1..{max_new_tokens_limit}")
+    if "use_beam_search" in params:
+        params["use_beam_search"] = _flag("use_beam_search", params["use_beam_search"])
+    if "qa_format" in params and params["qa_format"] not in backend.qa_formats:
+        raise InvalidParamsError(f"'qa_format' harus salah satu dari {', '.join(backend.qa_formats)}")
+    if "system_prompt" in params and not (params["system_prompt"] is None or isinstance(params["system_prompt"], str)):
+        raise InvalidParamsError("'system_prompt' harus string atau null")
+    return params
+
+
+# ============================================================
+# DYNAMIC BATCHER
+# ============================================================
+
+class QueueFullError(Exception):
+    pass
+
+
+class DynamicBatcher:
+    """
+    Kumpulkan request dalam jendela max_wait_ms -> satu backend.generate
+    per grup parameter
+    """
+
+    def __init__(self, backend, max_batch_size=16, max_wait_ms=20, max_queue=256):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+        self.stats = {"requests": 0, "batches": 0, "rejected": 0, "generate_sec": 0.0}
+
+    async def submit(self, question, params):
+        """Masukkan request ke antrian dan tunggu jawabannya"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((question, params, future))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"Antrian penuh ({self.queue.maxsize} request)")
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            try:
+                if timeout <= 0:
+                    batch.append(self.queue.get_nowait())  # Yang sudah antri tetap ikut
+                else:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+        # Client yang sudah putus tidak perlu dijawab
+        return [item for item in batch if not item[2].done()]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            groups = {}
+            for question, params, future in batch:
+                key = json.dumps(params, sort_keys=True)
+                groups.setdefault(key, []).append((question, params, future))
+
+            for items in groups.values():
+                questions = [q for q, _, _ in items]
+                start = time.perf_counter()
+                try:
+                    answers = await loop.run_in_executor(
+                        self.executor, self.backend.generate, questions, items[0][1]
+                    )
+                except Exception as e:
+                    for _, _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.stats["generate_sec"] += time.perf_counter() - start
+                self.stats["requests"] += len(items)
+                self.stats["batches"] += 1
+                for (_, _, future), answer in zip(items, answers):
+                    if not future.done():
+                        future.set_result((answer, len(items)))
+
+    def summary(self):
+        stats = dict(self.stats)
+        stats["avg_batch_size"] = stats["requests"] / max(1, stats["batches"])
+        stats["queue_size"] = self.queue.qsize()
+        return stats
+
+
+# ============================================================
+# CONTINUOUS BATCHER
+# ============================================================
+
+class ContinuousBatcher:
+    """
+    ContinuousBatchScheduler di thread sendiri: loop step() selama ada
+    request, hasil dikirim ke event loop lewat call_soon_threadsafe
+    """
+
+    def __init__(self, backend, max_batch_size=16, max_queue=256):
+        from continuous_batching import ContinuousBatchScheduler
+
+        self.backend = backend
+        self.max_queue = max_queue
+        prefix_cache = None
+        if backend.use_prefix_cache:
+            from prefix_cache import get_prefix_cache
+            prefix_cache = get_prefix_cache(backend.model)
+        self.scheduler = ContinuousBatchScheduler(
+            backend.model, backend.tokenizer, max_batch_size, prefix_cache=prefix_cache
+        )
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.thread = None
+        self.stats = {"requests": 0, "rejected": 0, "generate_sec": 0.0}
+
+    def free_slots(self):
+        return self.max_queue - len(self.scheduler.pending)
+
+    def _enqueue(self, question, params, on_delta=None):
+        """
+        Tambah request ke scheduler. Teks di-stream lewat TextStream (stop
+        string + batas kalimat on the fly); on_delta(delta) dipanggil di
+        event loop per potongan teks, lalu on_delta(None) di akhir.
+
+        Returns:
+            (future (jawaban, ukuran batch), Sequence)
+        """
+        from streaming import TextStream
+
+        if self.free_slots() <= 0:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"Antrian penuh ({self.max_queue} request)")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request = self.backend.prepare(question, params)
+        stream = TextStream(
+            self.backend.tokenizer, request["stop_strings"], request["max_sentences"], request["sentence_filter"]
+        )
+
+        def publish():
+            if on_delta is not None:
+                for delta in stream.drain():
+                    loop.call_soon_threadsafe(on_delta, delta)
+
+        def on_token(seq, token_id):
+            stream.on_token(seq, token_id)
+            publish()
+
+        def resolve(seq):
+            if future.done():
+                return
+            if seq.error is not None:
+                future.set_exception(seq.error)
+            else:
+                self.stats["requests"] += 1
+                future.set_result((request["finalize"](stream.answer), seq.max_batch_size))
+
+        def on_finish(seq):
+            stream.finish()
+            publish()
+            if on_delta is not None:
+                loop.call_soon_threadsafe(on_delta, None)
+            loop.call_soon_threadsafe(resolve, seq)
+
+        try:
+            seq = self.scheduler.add_request(
+                request["prompt_ids"], request["gen_params"], template_ids=request["template_ids"],
+                on_token=on_token, on_finish=on_finish,
+            )
+        except ValueError as e:
+            # Parameter sampling ditolak sebelum masuk batch (normalize_params)
+            raise InvalidParamsError(str(e)) from e
+        self.wakeup.set()
+        return future, seq
+
+    async def submit(self, question, params):
+        """Masukkan request ke scheduler dan tunggu jawabannya"""
+        future, _ = self._enqueue(question, params)
+        return await future
+
+    def stream(self, question, params):
+        """
+        Masukkan request sekarang (QueueFullError langsung), return async
+        iterator: potongan teks (str) lalu (jawaban, ukuran batch)
+        """
+        deltas = asyncio.Queue()
+        future, seq = self._enqueue(question, params, on_delta=deltas.put_nowait)
+
+        async def events():
+            try:
+                while (delta := await deltas.get()) is not None:
+                    yield delta
+                yield await future
+            finally:
+                seq.cancel()  # Client putus di tengah stream: berhenti generate
+        return events()
+
+    def _loop(self):
+        while not self.stopped:
+            if not self.scheduler.has_work():
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            start = time.perf_counter()
+            try:
+                self.scheduler.step()
+            except Exception as e:
+                self.scheduler.fail_all(e)
+            self.stats["generate_sec"] += time.perf_counter() - start
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="continuous-batching", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        self.wakeup.set()
+
+    def summary(self):
+        stats = {**self.stats, **self.scheduler.stats}
+        stats["avg_batch_size"] = stats["tokens"] / max(1, stats["steps"] + stats["admitted"])
+        stats["queue_size"] = len(self.scheduler.pending)
+        stats["active"] = len(self.scheduler.active)
+        if self.scheduler.prefix_cache is not None:
+            stats["prefix_cache"] = dict(self.scheduler.prefix_cache.stats)
+        return stats
+
+
+# ============================================================
+# HTTP
+# ============================================================
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class InferenceServer:
+    """HTTP/1.1 minimal (Connection: close) di atas asyncio.start_server"""
+
+    def __init__(self, backend, config=None):
+        self.config = {**SERVER_CONFIG, **(config or {})}
+        self.backend = backend
+        self.batcher = DynamicBatcher(
+            backend,
+            max_batch_size=self.config["max_batch_size"],
+            max_wait_ms=self.config["max_wait_ms"],
+            max_queue=self.config["max_queue"],
+        )
+        if self.config["scheduler"] not in ("continuous", "dynamic"):
+            raise ValueError(f"Scheduler tidak dikenal: {self.config['scheduler']}")
+        self.continuous = None
+        if self.config["scheduler"] == "continuous":
+            self.continuous = ContinuousBatcher(
+                backend,
+                max_batch_size=self.config["max_batch_size"],
+                max_queue=self.config["max_queue"],
+            )
+
+    def _batcher_for(self, params):
+        if self.continuous is not None and self.backend.supports_continuous(params):
+            return self.continuous
+        return self.batcher
+
+    async def _ask(self, payload):
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            return 400, {"error": "Field 'question' (string) wajib diisi"}
+        params = request_params(self.backend, payload, self.config["max_new_tokens_limit"])
+        start = time.perf_counter()
+        if payload.get("stream"):
+            batcher = self._batcher_for(params)
+            if batcher is not self.continuous:
+                return 400, {"error": "Streaming butuh --scheduler continuous dan sampling (use_beam_search false)"}
+            return 200, self._stream_events(batcher.stream(question.strip(), params), start)
+        answer, batch_size = await self._batcher_for(params).submit(question.strip(), params)
+        return 200, {
+            "answer": answer,
+            "batch_size": batch_size,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    async def _stream_events(self, events, start):
+        first_token_ms = None
+        try:
+            async for event in events:
+                if isinstance(event, str):
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+                    yield {"delta": event}
+                else:
+                    answer, batch_size = event
+                    yield {
+                        "answer": answer,
+                        "batch_size": batch_size,
+                        "first_token_ms": first_token_ms,
+                        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                        "done": True,
+                    }
+        finally:
+            await events.aclose()
+
+    async def _ask_batch(self, payload):
+        questions = payload.get("questions")
+        if not isinstance(questions, list) or not all(isinstance(q, str) and q.strip() for q in questions):
+            return 400, {"error": "Field 'questions' (list string) wajib diisi"}
+        params = request_params(self.backend, payload, self.config["max_new_tokens_limit"])
+        batcher = self._batcher_for(params)
+        if batcher is self.continuous:
+            free = batcher.free_slots()
+        else:
+            free = batcher.queue.maxsize - batcher.queue.qsize()
+        if len(questions) > free:
+            # Tolak utuh, jangan sebagian pertanyaan sempat dijawab
+            batcher.stats["rejected"] += len(questions)
+            raise QueueFullError(f"Antrian tidak cukup untuk {len(questions)} pertanyaan (sisa {free})")
+        start = time.perf_counter()
+        results = await asyncio.gather(*(batcher.submit(q.strip(), params) for q in questions))
+        return 200, {
+            "answers": [answer for answer, _ in results],
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    async def route(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok", "backend": self.backend.name}
+        if path == "/stats":
+            if self.continuous is None:
+                return 200, self.batcher.summary()
+            return 200, {"continuous": self.continuous.summary(), "dynamic": self.batcher.summary()}
+        if path not in ("/ask", "/ask_batch"):
+            return 404, {"error": f"Path tidak dikenal: {path}"}
+        if method != "POST":
+            return 405, {"error": "Gunakan POST"}
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "Body harus JSON"}
+        if not isinstance(payload, dict):
+            return 400, {"error": "Body harus JSON object"}
+        try:
+            if path == "/ask":
+                return await self._ask(payload)
+            return await self._ask_batch(payload)
+        except InvalidParamsError as e:
+            return 400, {"error": str(e)}
+        except QueueFullError as e:
+            return 503, {"error": str(e)}
+
+    async def handle(self, reader, writer):
+        status, payload = 500, {"error": "Internal error"}
+        try:
+            request_line = await reader.readline()
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > self.config["max_body_bytes"]:
+                status, payload = 413, {"error": "Body terlalu besar"}
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.route(method.upper(), path.split("?", 1)[0], body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "Request HTTP tidak valid"}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        if hasattr(payload, "__aiter__"):
+            await self._write_stream(writer, payload)
+            return
+
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def _write_stream(self, writer, events):
+        """Server-Sent Events; body berakhir saat koneksi ditutup"""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        try:
+            async for event in events:
+                writer.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        except Exception as e:
+            writer.write(f"data: {json.dumps({'error': f'{type(e).__name__}: {e}'})}\n\n".encode("utf-8"))
+        finally:
+            await events.aclose()  # Client putus -> sequence dibatalkan
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def serve(self, ready=None):
+        """Jalankan server sampai di-cancel (ready: asyncio.Event saat siap)"""
+        server = await asyncio.start_server(self.handle, self.config["host"], self.config["port"])
+        self.config["port"] = server.sockets[0].getsockname()[1]
+        batch_task = asyncio.create_task(self.batcher.run())
+        if self.continuous is not None:
+            self.continuous.start()
+        print(f"🌐 Server {self.backend.name}: http://{self.config['host']}:{self.config['port']} "
+              f"({self.config['scheduler']}, batch {self.config['max_batch_size']}, "
+              f"wait {self.config['max_wait_ms']} ms, queue {self.config['max_queue']})")
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+            self.batcher.executor.shutdown(wait=False)
+            if self.continuous is not None:
+                self.continuous.stop()
+
+
+def main():
+    args = sys.argv[1:]
+    config = {}
+    backend_name = "gpt2"
+    model_path = None
+    flags = {"--host": ("host", str), "--port": ("port", int), "--max-batch": ("max_batch_size", int),
+             "--max-wait-ms": ("max_wait_ms", float), "--max-queue": ("max_queue", int),
+             "--scheduler": ("scheduler", str)}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in flags:
+            key, cast = flags[arg]
+            config[key] = cast(args[i + 1])
+            i += 1
+        elif arg == "--qwen":
+            backend_name = "qwen"
+        elif not arg.startswith("--"):
+            model_path = arg
+        i += 1
+
+    if backend_name == "gpt2" and model_path is None:
+        model_path = "./tiny-llm-indo-final"
+    backend = BACKENDS[backend_name](model_path)
+    try:
+        asyncio.run(InferenceServer(backend, config).serve())
+    except KeyboardInterrupt:
+        print("\nServer berhenti")
+
+
+if __name__ == "__main__":
+    main()
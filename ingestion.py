@@ -0,0 +1,398 @@
+"""
+Concurrent Multi-Source Ingestion
+=================================
+Tarik teks dari banyak sumber sekaligus:
+    - 1 thread per sumber untuk I/O (download / streaming / baca file)
+    - 1 process pool bersama untuk cleaning & filtering (CPU)
+    - hasil digabung jadi satu stream dengan quota per sumber
+
+Wall-clock prep jadi mendekati sumber paling lambat, bukan jumlah semua
+sumber. LocalFileSource (JSONL / JSON / Parquet) bisa dipakai sebagai
+pengganti sumber HuggingFace supaya pipeline bisa jalan & di-benchmark
+offline.
+
+Dengan state_dir, setiap sumber punya state durable di
+<state_dir>/<nama>/: state.json (offset stream, jumlah accepted, sudah
+habis atau belum) dan accepted.jsonl (shard parsial teks yang lolos).
+Run berikutnya memutar ulang shard tanpa download/filter ulang, lalu
+melanjutkan stream dari offset; sumber yang sudah selesai dilewati.
+Menaikkan quota = top-up inkremental. Sumber dengan raw_limit (batas
+item mentah, mis. quota x 2) tidak dianggap habis saat batas itu
+tercapai: run dengan raw_limit lebih besar membuka ulang stream dari
+offset terakhir.
+
+Penggunaan:
+    from ingestion import TextSource, LocalFileSource, ConcurrentIngestor
+
+    sources = [
+        LocalFileSource("dump", "./dumps/*.jsonl", quota=10000),
+        TextSource("mc4", iter_mc4_raw, quota=15000, filter_args=(100, True, False)),
+    ]
+    ingestor = ConcurrentIngestor(sources, filter_fn=_filter_chunk, num_workers=8,
+                                  state_dir="./dataset/ingest_state")
+    for text in ingestor:
+        ...
+    ingestor.print_stats()
+"""
+
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import itertools
+import threading
+import multiprocessing
+
+_STOPPED = object()    # Reader berhenti (quota / error), sumber belum habis
+_EXHAUSTED = object()  # Stream sumber habis
+
+
+class TextSource:
+    """
+    Satu sumber teks mentah
+
+    Args:
+        name: Nama sumber (untuk quota & laporan)
+        raw_iter_fn: Callable(start) -> iterator teks mentah mulai dari
+            item ke-`start` (untuk resume)
+        quota: Maksimal teks yang diterima dari sumber ini (None = semua)
+        filter_args: Argumen tambahan untuk filter_fn setelah chunk
+        postprocess: Callable(text) -> iterable teks, dijalankan setelah filter
+        raw_limit: Batas item mentah yang dibaca raw_iter_fn (None = sampai
+            stream habis). Iterator yang berhenti di batas ini bukan akhir
+            stream, jadi sumber tidak ditandai exhausted
+    """
+
+    def __init__(self, name, raw_iter_fn, quota=None, filter_args=(),
+                 postprocess=None, raw_limit=None):
+        self.name = name
+        self.raw_iter_fn = raw_iter_fn
+        self.quota = quota
+        self.raw_limit = raw_limit
+        self.filter_args = tuple(filter_args)
+        self.postprocess = postprocess
+
+    def iter_raw(self, start=0):
+        return self.raw_iter_fn(start)
+
+
+def _iter_local_records(path):
+    """Baca record dari satu file JSONL(.gz) / JSON list / Parquet"""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow diperlukan untuk Parquet: pip install pyarrow")
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches():
+            yield from batch.to_pylist()
+    elif path.endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        yield from (data if isinstance(data, list) else [data])
+    else:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def expand_local_paths(path):
+    """File, folder, atau glob -> daftar file terurut"""
+    if os.path.isdir(path):
+        patterns = ["*.jsonl", "*.jsonl.gz", "*.json", "*.parquet"]
+        files = [f for p in patterns for f in glob.glob(os.path.join(path, p))]
+    elif any(ch in path for ch in "*?["):
+        files = glob.glob(path)
+    else:
+        files = [path]
+    return sorted(files)
+
+
+class LocalFileSource(TextSource):
+    """
+    Sumber dari dump lokal (drop-in pengganti sumber HuggingFace)
+
+    Args:
+        name: Nama sumber
+        path: File, folder, atau glob (*.jsonl, *.jsonl.gz, *.json, *.parquet)
+        text_field: Nama field teks di setiap record
+        quota, filter_args, postprocess: Sama seperti TextSource
+    """
+
+    def __init__(self, name, path, text_field="text", **kwargs):
+        self.path = path
+        self.text_field = text_field
+        super().__init__(name, self._iter_texts, **kwargs)
+
+    def _iter_texts(self, start=0):
+        files = expand_local_paths(self.path)
+        if not files:
+            raise FileNotFoundError(f"Tidak ada file untuk {self.path}")
+        records = itertools.chain.from_iterable(_iter_local_records(f) for f in files)
+        for record in itertools.islice(records, start, None):
+            if isinstance(record, str):
+                yield record
+            elif isinstance(record, dict):
+                yield record.get(self.text_field, "")
+            else:
+                yield ""
+
+
+class SourceState:
+    """
+    Progress durable satu sumber
+
+    accepted.jsonl hanya di-append; state.json (ditulis atomik) mencatat
+    berapa byte shard yang valid. Saat load, sisa byte setelah commit
+    terakhir (crash di tengah chunk) dipotong.
+    """
+
+    def __init__(self, state_dir, name):
+        self.dir = os.path.join(state_dir, name)
+        os.makedirs(self.dir, exist_ok=True)
+        self.state_path = os.path.join(self.dir, "state.json")
+        self.shard_path = os.path.join(self.dir, "accepted.jsonl")
+
+        self.offset = 0        # Item mentah yang sudah diproses
+        self.accepted = 0      # Teks di shard
+        self.exhausted = False
+        self.shard_bytes = 0
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.offset = state["offset"]
+            self.accepted = state["accepted"]
+            self.exhausted = state["exhausted"]
+            self.shard_bytes = state["shard_bytes"]
+
+        if os.path.exists(self.shard_path):
+            if os.path.getsize(self.shard_path) > self.shard_bytes:
+                os.truncate(self.shard_path, self.shard_bytes)
+        self._shard = open(self.shard_path, 'ab')
+
+    def iter_accepted(self, limit=None):
+        """Putar ulang teks yang sudah diterima di run sebelumnya"""
+        limit = self.accepted if limit is None else min(limit, self.accepted)
+        if not limit:
+            return
+        with open(self.shard_path, 'rb') as f:
+            for line in itertools.islice(f, limit):
+                yield json.loads(line)["text"]
+
+    def commit(self, texts, offset, exhausted=False):
+        """Append teks lalu simpan offset baru (shard dulu, state belakangan)"""
+        for text in texts:
+            self._shard.write(json.dumps({"text": text}, ensure_ascii=False).encode('utf-8') + b"\n")
+        self._shard.flush()
+        os.fsync(self._shard.fileno())
+
+        self.offset = offset
+        self.accepted += len(texts)
+        self.exhausted = self.exhausted or exhausted
+        self.shard_bytes = self._shard.tell()
+
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "offset": self.offset,
+                "accepted": self.accepted,
+                "exhausted": self.exhausted,
+                "shard_bytes": self.shard_bytes,
+            }, f)
+        os.replace(tmp_path, self.state_path)
+
+    def close(self):
+        self._shard.close()
+
+
+class ConcurrentIngestor:
+    """
+    Jalankan semua sumber bersamaan dan gabungkan hasilnya
+
+    Args:
+        sources: List TextSource
+        filter_fn: Fungsi top-level (picklable) (chunk, *filter_args) ->
+            list teks hasil cleaning atau None jika ditolak
+        num_workers: Jumlah process untuk filter_fn (<=1 = di thread sumber)
+        chunk_size: Teks mentah per task
+        max_pending_chunks: Batas chunk yang antre (backpressure)
+        state_dir: Folder state per sumber untuk resume / top-up (None = tanpa state)
+        content_index: ContentHashIndex opsional; teks baru yang sudah pernah
+            diterima (run mana pun, sumber mana pun) dibuang sebelum quota
+    """
+
+    def __init__(self, sources, filter_fn, num_workers=1, chunk_size=500,
+                 max_pending_chunks=None, state_dir=None, content_index=None):
+        self.sources = sources
+        self.state_dir = state_dir
+        self.content_index = content_index
+        self.filter_fn = filter_fn
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.max_pending_chunks = max_pending_chunks or max(4, num_workers * 2 * len(sources))
+        self.stats = {
+            s.name: {"raw": 0, "accepted": 0, "resumed": 0, "duplicates": 0,
+                     "seconds": 0.0, "error": None}
+            for s in sources
+        }
+        self.wall_seconds = 0.0
+
+    def _reader(self, source, start_offset, pool, results, stop):
+        """Thread I/O: baca sumber, kirim chunk ke pool, antrekan hasilnya"""
+        stats = self.stats[source.name]
+        start = time.time()
+        end_marker = _STOPPED
+        try:
+            offset, chunk = start_offset, []
+            for text in source.iter_raw(start_offset):
+                if stop.is_set():
+                    break
+                chunk.append(text)
+                stats["raw"] += 1
+                if len(chunk) >= self.chunk_size:
+                    results.put((source, offset, len(chunk), self._submit(pool, source, chunk)))
+                    offset, chunk = offset + len(chunk), []
+            else:
+                if chunk:
+                    results.put((source, offset, len(chunk), self._submit(pool, source, chunk)))
+                # Berhenti di raw_limit != stream habis (top-up masih bisa lanjut)
+                if source.raw_limit is None or start_offset + stats["raw"] < source.raw_limit:
+                    end_marker = _EXHAUSTED
+        except Exception as e:
+            stats["error"] = str(e)
+            print(f"⚠ {source.name} failed after {stats['raw']} raw samples: {e}")
+        finally:
+            stats["seconds"] = time.time() - start
+            results.put((source, None, None, end_marker))
+
+    def _submit(self, pool, source, chunk):
+        if pool is None:
+            return self.filter_fn(chunk, *source.filter_args)
+        return pool.apply_async(self.filter_fn, (chunk,) + source.filter_args)
+
+    def _accept_chunk(self, source, texts):
+        """Teks lolos filter (+postprocess) sampai quota; (outputs, item mentah terpakai)"""
+        stats = self.stats[source.name]
+        outputs = []
+        for i, text in enumerate(texts):
+            if text is None:
+                continue
+            candidates = source.postprocess(text) if source.postprocess else (text,)
+            for out in candidates:
+                if source.quota and stats["accepted"] + len(outputs) >= source.quota:
+                    break
+                if self.content_index is None or self.content_index.add(out):
+                    outputs.append(out)
+                else:
+                    stats["duplicates"] += 1
+            if source.quota and stats["accepted"] + len(outputs) >= source.quota:
+                return outputs, i + 1
+        return outputs, len(texts)
+
+    def __iter__(self):
+        start = time.time()
+        states = {}
+        if self.state_dir:
+            states = {s.name: SourceState(self.state_dir, s.name) for s in self.sources}
+
+        # Sumber yang sudah habis / penuh quota / sampai raw_limit tidak perlu thread
+        to_run = []
+        for s in self.sources:
+            state = states.get(s.name)
+            finished = state is not None and (
+                state.exhausted or (s.quota and state.accepted >= s.quota)
+            )
+            at_limit = state is not None and s.raw_limit is not None and state.offset >= s.raw_limit
+            if finished:
+                print(f"⏭  {s.name}: sudah selesai ({state.accepted:,} accepted), skip")
+            elif at_limit:
+                print(f"⏭  {s.name}: raw_limit {s.raw_limit:,} tercapai "
+                      f"({state.accepted:,} accepted), naikkan quota untuk top-up")
+            else:
+                to_run.append(s)
+
+        pool = multiprocessing.Pool(self.num_workers) if self.num_workers > 1 and to_run else None
+        results = queue.Queue(maxsize=self.max_pending_chunks)
+        stops = {s.name: threading.Event() for s in self.sources}
+        threads = [
+            threading.Thread(
+                target=self._reader,
+                args=(s, states[s.name].offset if s.name in states else 0,
+                      pool, results, stops[s.name]),
+                name=f"ingest-{s.name}", daemon=True,
+            )
+            for s in to_run
+        ]
+        for t in threads:
+            t.start()
+
+        try:
+            # Putar ulang hasil run sebelumnya sementara thread mulai download
+            for s in self.sources:
+                if s.name not in states:
+                    continue
+                stats = self.stats[s.name]
+                for text in states[s.name].iter_accepted(limit=s.quota):
+                    stats["accepted"] += 1
+                    stats["resumed"] += 1
+                    yield text
+                if s.quota and stats["accepted"] >= s.quota:
+                    stops[s.name].set()
+
+            active = len(threads)
+            while active:
+                source, offset, count, result = results.get()
+                state = states.get(source.name)
+                if result is _STOPPED or result is _EXHAUSTED:
+                    active -= 1
+                    if result is _EXHAUSTED and state is not None and not stops[source.name].is_set():
+                        state.commit([], state.offset, exhausted=True)
+                    continue
+
+                if stops[source.name].is_set():
+                    continue
+                texts = result.get() if pool is not None else result
+                outputs, consumed = self._accept_chunk(source, texts)
+                # Simpan dulu (shard + offset), baru diteruskan ke consumer
+                if state is not None:
+                    state.commit(outputs, offset + consumed)
+                if self.content_index is not None:
+                    self.content_index.flush()
+                self.stats[source.name]["accepted"] += len(outputs)
+                if source.quota and self.stats[source.name]["accepted"] >= source.quota:
+                    stops[source.name].set()
+                yield from outputs
+        finally:
+            for event in stops.values():
+                event.set()
+            # Kosongkan antrean supaya thread yang sedang put() bisa selesai
+            while any(t.is_alive() for t in threads):
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            for state in states.values():
+                state.close()
+            self.wall_seconds = time.time() - start
+
+    def print_stats(self):
+        """Laporan per sumber + perbandingan wall-clock vs sequential"""
+        print("\n⏱  Ingestion stats:")
+        for name, st in self.stats.items():
+            status = f" (⚠ {st['error'][:60]})" if st["error"] else ""
+            resumed = f" ({st['resumed']:,} resumed)" if st["resumed"] else ""
+            dups = f", {st['duplicates']:,} exact dups" if st["duplicates"] else ""
+            print(f"   {name}: {st['accepted']:,} accepted{resumed} / {st['raw']:,} raw{dups} "
+                  f"in {st['seconds']:.1f}s{status}")
+        sequential = sum(st["seconds"] for st in self.stats.values())
+        slowest = max((st["seconds"] for st in self.stats.values()), default=0.0)
+        print(f"   Wall-clock: {self.wall_seconds:.1f}s "
+              f"(slowest source {slowest:.1f}s, sum of sources {sequential:.1f}s)")
@@ -0,0 +1,200 @@
+"""
+Token-Budget Batching dengan Length-Bucketed Sampling
+=====================================================
+Batch dibentuk berdasarkan jumlah token, bukan jumlah sample tetap:
+sample dengan panjang mirip dikelompokkan, lalu setiap batch dibatasi
+`max_tokens` (= jumlah sample x panjang sample terpanjang di batch).
+Padding hanya sampai anggota terpanjang batch itu sendiri.
+
+Hasilnya: sapaan satu baris (conversational_chatbot.json) masuk ke batch
+besar, jawaban chain-of-thought panjang masuk ke batch kecil, dan
+memory per step kurang lebih konstan.
+
+Penggunaan:
+    from length_batching import TokenBudgetTrainer
+
+    trainer = TokenBudgetTrainer(
+        model=model, args=training_args, train_dataset=train_dataset,
+        data_collator=DataCollatorForLanguageModeling(tokenizer, mlm=False),
+        max_tokens_per_batch=16384,
+    )
+
+Dataset harus di-tokenize TANPA padding (padding=False).
+"""
+
+import random
+
+from torch.utils.data import DataLoader, Sampler
+from transformers import Trainer
+
+try:
+    import datasets
+    DATASETS_AVAILABLE = True
+except ImportError:
+    DATASETS_AVAILABLE = False
+
+
+class TokenBudgetBatchSampler(Sampler):
+    """
+    Batch sampler: kelompokkan sample berdasar panjang, batasi token per batch
+
+    Args:
+        lengths: Panjang token setiap sample
+        max_tokens: Budget token per batch (batch_size x max_len di batch)
+        max_batch_size: Batas jumlah sample per batch (opsional)
+        bucket_size: Jumlah sample per bucket yang di-sort per panjang;
+            makin besar makin rapat, makin kecil makin acak
+        shuffle: Acak urutan sample & batch setiap epoch
+        seed: Seed dasar (ditambah epoch)
+    """
+
+    def __init__(self, lengths, max_tokens, max_batch_size=None,
+                 bucket_size=2048, shuffle=True, seed=42):
+        self.lengths = list(lengths)
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.bucket_size = bucket_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self._batches = None
+        # Di bawah DDP accelerate membungkus batch sampler dengan
+        # BatchSamplerShard dan hanya meneruskan set_epoch ke
+        # batch_sampler.sampler -> sampler index-nya ya objek ini sendiri
+        self.sampler = self
+
+        longest = max(self.lengths) if self.lengths else 0
+        if longest > max_tokens:
+            raise ValueError(
+                f"max_tokens ({max_tokens}) lebih kecil dari sample terpanjang ({longest})"
+            )
+
+    def set_epoch(self, epoch):
+        if epoch != self.epoch:
+            self.epoch = epoch
+            self._batches = None
+
+    def _build_batches(self):
+        indices = list(range(len(self.lengths)))
+        rng = random.Random(self.seed + self.epoch)
+        if self.shuffle:
+            rng.shuffle(indices)
+
+        # Sort per bucket: sample mirip panjang berdekatan, tapi tetap acak antar bucket
+        batches = []
+        for start in range(0, len(indices), self.bucket_size):
+            bucket = sorted(indices[start:start + self.bucket_size],
+                            key=lambda i: self.lengths[i])
+            batch, batch_max = [], 0
+            for idx in bucket:
+                new_max = max(batch_max, self.lengths[idx])
+                too_many_tokens = new_max * (len(batch) + 1) > self.max_tokens
+                too_many_samples = self.max_batch_size and len(batch) >= self.max_batch_size
+                if batch and (too_many_tokens or too_many_samples):
+                    batches.append(batch)
+                    batch, new_max = [], self.lengths[idx]
+                batch.append(idx)
+                batch_max = new_max
+            if batch:
+                batches.append(batch)
+
+        if self.shuffle:
+            rng.shuffle(batches)
+        return batches
+
+    @property
+    def batches(self):
+        if self._batches is None:
+            self._batches = self._build_batches()
+        return self._batches
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
+
+    def padding_stats(self):
+        """Rasio token asli vs slot terpakai (setelah dynamic padding)"""
+        real = sum(self.lengths)
+        slots = sum(len(b) * max(self.lengths[i] for i in b) for b in self.batches)
+        return {
+            "num_batches": len(self.batches),
+            "avg_batch_size": len(self.lengths) / max(1, len(self.batches)),
+            "padding_efficiency": real / max(1, slots),
+        }
+
+
+def get_lengths(dataset, column="input_ids"):
+    """Ambil panjang token tiap sample dari dataset yang sudah di-tokenize"""
+    if DATASETS_AVAILABLE and isinstance(dataset, datasets.Dataset):
+        return [len(ids) for ids in dataset[column]]
+    return [len(dataset[i][column]) for i in range(len(dataset))]
+
+
+class TokenBudgetMixin:
+    """
+    Mixin untuk Trainer / SFTTrainer: ganti DataLoader train & eval
+    dengan TokenBudgetBatchSampler. Jika max_tokens_per_batch None,
+    perilaku Trainer tidak berubah.
+    """
+
+    def __init__(self, *args, max_tokens_per_batch=None, max_batch_size=None,
+                 bucket_size=2048, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_batch_size = max_batch_size
+        self.bucket_size = bucket_size
+
+    def _token_budget_dataloader(self, dataset, description, shuffle):
+        data_collator = self.data_collator
+        if DATASETS_AVAILABLE and isinstance(dataset, datasets.Dataset):
+            dataset = self._remove_unused_columns(dataset, description=description)
+        else:
+            data_collator = self._get_collator_with_removed_columns(
+                data_collator, description=description
+            )
+
+        sampler = TokenBudgetBatchSampler(
+            get_lengths(dataset),
+            max_tokens=self.max_tokens_per_batch,
+            max_batch_size=self.max_batch_size,
+            bucket_size=self.bucket_size,
+            shuffle=shuffle,
+            seed=self.args.seed,
+        )
+        if shuffle:
+            stats = sampler.padding_stats()
+            print(f"🪣 Token-budget batching: {stats['num_batches']:,} batches, "
+                  f"avg {stats['avg_batch_size']:.1f} samples/batch, "
+                  f"padding efficiency {stats['padding_efficiency']*100:.1f}%")
+
+        dataloader = DataLoader(
+            dataset,
+            batch_sampler=sampler,
+            collate_fn=data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        return self.accelerator.prepare(dataloader)
+
+    def get_train_dataloader(self):
+        if not self.max_tokens_per_batch:
+            return super().get_train_dataloader()
+        if self.train_dataset is None:
+            raise ValueError("Trainer: training requires a train_dataset.")
+        return self._token_budget_dataloader(self.train_dataset, "training", shuffle=True)
+
+    def get_eval_dataloader(self, eval_dataset=None):
+        if not self.max_tokens_per_batch or isinstance(eval_dataset, str):
+            return super().get_eval_dataloader(eval_dataset)
+        eval_dataset = eval_dataset if eval_dataset is not None else self.eval_dataset
+        if eval_dataset is None:
+            raise ValueError("Trainer: evaluation requires an eval_dataset.")
+        return self._token_budget_dataloader(eval_dataset, "evaluation", shuffle=False)
+
+
+class TokenBudgetTrainer(TokenBudgetMixin, Trainer):
+    """Trainer dengan token-budget batching"""
+    pass
+
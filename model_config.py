@@ -0,0 +1,30 @@
+"""
+Konfigurasi Arsitektur Tiny LLM (13M params)
+============================================
+Dipisah dari train_tiny_llm.py supaya bisa diimport tanpa efek samping
+script training (CUDA_VISIBLE_DEVICES, warning PEFT, import Trainer &
+semua modul training).
+
+Penggunaan:
+    from model_config import MODEL_CONFIG
+
+    config = GPT2Config(**{**MODEL_CONFIG, "vocab_size": 16000})
+
+Dipakai oleh train_tiny_llm.py, train_tokenizer.py dan scripts/bench_*.py.
+"""
+
+MODEL_CONFIG = {
+    "vocab_size": 32000,
+    "n_positions": 512,
+    "n_embd": 384,        # Hidden size
+    "n_layer": 6,         # Layers
+    "n_head": 6,          # Attention heads
+    "n_inner": 1536,      # FFN hidden (4x n_embd)
+    "activation_function": "gelu_new",
+    "resid_pdrop": 0.05,
+    "embd_pdrop": 0.05,
+    "attn_pdrop": 0.05,
+    "layer_norm_epsilon": 1e-5,
+    "bos_token_id": 1,
+    "eos_token_id": 2,
+}
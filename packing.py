@@ -0,0 +1,222 @@
+"""
+Sequence Packing untuk Causal-LM Training
+=========================================
+Gabungkan sample pendek (dipisah EOS) menjadi blok penuh `block_size`
+token, sehingga compute tidak terbuang untuk pad token.
+
+Sebagian besar sample Q&A < 100 token; dengan padding="max_length"
+ke 512, >80% batch hanya berisi pad. Dengan packing, hampir semua
+posisi di batch adalah token asli.
+
+Opsi `reset_position_ids=True` (hanya attn_implementation="flash_attention_2"):
+    - position_ids mulai lagi dari 0 di setiap dokumen
+    - label token pertama tiap dokumen di-mask (-100), jadi model tidak
+      belajar menebak awal dokumen dari EOS dokumen sebelumnya
+    - flash_attention_2 memakai position_ids ini untuk memisahkan
+      attention per dokumen. Dengan "eager"/"sdpa" (GPT-2 di CPU)
+      attention tetap melintasi batas dokumen, ditambah posisi 0..k yang
+      berulang -> lebih buruk dari packing biasa; check_reset_position_ids
+      menolak kombinasi ini
+
+Penggunaan:
+    from packing import pack_dataset
+
+    tokenized = dataset.map(lambda x: tokenizer(x["text"]), batched=True,
+                            remove_columns=["text"])
+    packed, stats = pack_dataset(tokenized, tokenizer, block_size=512)
+    print_packing_stats(stats)
+"""
+
+
+class BlockPacker:
+    """
+    State packing lintas panggilan: token sisa yang belum mengisi satu
+    blok penuh dibawa ke dokumen berikutnya (mis. antar batch map())
+
+    Args:
+        (sama dengan pack_sequences)
+    """
+
+    def __init__(self, block_size, eos_token_id, pad_token_id=None, reset_position_ids=False):
+        self.block_size = block_size
+        self.eos_token_id = eos_token_id
+        self.pad_token_id = eos_token_id if pad_token_id is None else pad_token_id
+        self.reset_position_ids = reset_position_ids
+        self.ids, self.labels, self.positions = [], [], []
+        self.segment_start = 0
+
+    def _emit(self, length):
+        pad = self.block_size - length
+        block = {
+            "input_ids": self.ids[:length] + [self.pad_token_id] * pad,
+            "attention_mask": [1] * length + [0] * pad,
+            "labels": self.labels[:length] + [-100] * pad,
+        }
+        if self.reset_position_ids:
+            block["position_ids"] = self.positions[:length] + list(range(pad))
+        del self.ids[:length], self.labels[:length], self.positions[:length]
+        return block
+
+    def add(self, seq):
+        """Tambah satu dokumen (+ EOS jika belum ada), return blok yang penuh"""
+        blocks = []
+        if not seq:
+            return blocks
+        doc = list(seq)
+        if doc[-1] != self.eos_token_id:
+            doc.append(self.eos_token_id)
+
+        ids = self.ids
+        for i, token in enumerate(doc):
+            # Posisi mulai dari 0 di awal dokumen dan di awal blok baru
+            # (potongan dokumen yang menyeberang blok)
+            if i == 0 or not ids:
+                self.segment_start = len(ids)
+            ids.append(token)
+            self.positions.append(len(ids) - 1 - self.segment_start)
+            self.labels.append(-100 if self.reset_position_ids and i == 0 else token)
+            if len(ids) == self.block_size:
+                blocks.append(self._emit(self.block_size))
+        return blocks
+
+    def flush(self):
+        """Blok terakhir yang tidak penuh (di-pad), [] jika kosong"""
+        return [self._emit(len(self.ids))] if self.ids else []
+
+
+def iter_packed_blocks(sequences, block_size, eos_token_id, pad_token_id=None,
+                       reset_position_ids=False):
+    """
+    Versi streaming pack_sequences: yield satu blok (dict) setiap kali penuh
+
+    Args:
+        sequences: Iterable of token id lists (boleh generator tanpa akhir)
+        (lainnya sama dengan pack_sequences)
+
+    Yields:
+        Dict: input_ids, attention_mask, labels (+ position_ids); blok
+        terakhir yang tidak penuh di-pad
+    """
+    packer = BlockPacker(block_size, eos_token_id, pad_token_id, reset_position_ids)
+    for seq in sequences:
+        yield from packer.add(seq)
+    yield from packer.flush()
+
+
+def _blocks_to_columns(blocks, reset_position_ids):
+    columns = {"input_ids": [], "attention_mask": [], "labels": []}
+    if reset_position_ids:
+        columns["position_ids"] = []
+    for block in blocks:
+        for key, value in block.items():
+            columns[key].append(value)
+    return columns
+
+
+def check_reset_position_ids(model, reset_position_ids):
+    """
+    ValueError jika reset_position_ids=True tapi attention model bukan
+    flash_attention_2 (dokumen dalam blok tidak terisolasi)
+    """
+    if not reset_position_ids:
+        return
+    attn_implementation = getattr(model.config, "_attn_implementation", None)
+    if attn_implementation != "flash_attention_2":
+        raise ValueError(
+            f"reset_position_ids=True butuh attn_implementation='flash_attention_2' "
+            f"(model: {attn_implementation!r}); dengan eager/sdpa dokumen dalam blok "
+            f"tetap saling attend. Set reset_position_ids=False"
+        )
+
+
+def pack_sequences(sequences, block_size, eos_token_id, pad_token_id=None,
+                   reset_position_ids=False):
+    """
+    Pack list token ids ke blok berukuran tetap
+
+    Args:
+        sequences: List of token id lists (tanpa padding)
+        block_size: Panjang setiap blok
+        eos_token_id: Token pemisah antar dokumen
+        pad_token_id: Token untuk mengisi sisa blok terakhir
+        reset_position_ids: Reset posisi per dokumen (lihat docstring modul)
+
+    Returns:
+        Dict of lists: input_ids, attention_mask, labels (+ position_ids)
+    """
+    return _blocks_to_columns(
+        iter_packed_blocks(sequences, block_size, eos_token_id, pad_token_id, reset_position_ids),
+        reset_position_ids,
+    )
+
+
+def pack_dataset(dataset, tokenizer, block_size=512, reset_position_ids=False,
+                 batch_size=1000, desc="Packing"):
+    """
+    Pack HuggingFace Dataset yang sudah di-tokenize (tanpa padding)
+
+    Args:
+        dataset: Dataset dengan kolom "input_ids"
+        tokenizer: Tokenizer (untuk eos/pad token id)
+        block_size: Panjang blok (biasanya max_length / n_positions)
+        reset_position_ids: Reset posisi per dokumen
+        batch_size: Jumlah dokumen per batch map(); sisa token yang belum
+            penuh dibawa ke batch berikutnya, jadi hanya blok terakhir
+            dataset yang di-pad
+
+    Returns:
+        (packed_dataset, stats)
+    """
+    eos_token_id = tokenizer.eos_token_id
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else eos_token_id
+
+    lengths = []
+    useful_tokens = 0
+    for ids in dataset["input_ids"]:
+        lengths.append(len(ids))
+        if ids:
+            # Token asli + EOS pemisah (hanya jika EOS memang ditambahkan)
+            useful_tokens += len(ids) + (ids[-1] != eos_token_id)
+    num_docs = len(lengths)
+
+    # map() memanggil batch berurutan (num_proc=1); packer membawa sisa
+    # blok antar batch dan di-flush pada batch terakhir
+    packer = BlockPacker(block_size, eos_token_id, pad_token_id, reset_position_ids)
+    last_index = num_docs - 1
+
+    def pack_batch(batch, indices):
+        blocks = [block for seq in batch["input_ids"] for block in packer.add(seq)]
+        if indices and indices[-1] == last_index:
+            blocks += packer.flush()
+        return _blocks_to_columns(blocks, reset_position_ids)
+
+    packed = dataset.map(
+        pack_batch,
+        with_indices=True,
+        batched=True,
+        batch_size=batch_size,
+        remove_columns=dataset.column_names,
+        desc=desc,
+    )
+
+    num_blocks = len(packed)
+    padded_tokens = sum(min(n, block_size) for n in lengths)
+    stats = {
+        "num_docs": num_docs,
+        "num_blocks": num_blocks,
+        "block_size": block_size,
+        "useful_tokens": useful_tokens,
+        "packing_efficiency": useful_tokens / max(1, num_blocks * block_size),
+        "padding_efficiency": padded_tokens / max(1, num_docs * block_size),
+    }
+    stats["speedup"] = stats["packing_efficiency"] / max(1e-9, stats["padding_efficiency"])
+    return packed, stats
+
+
+def print_packing_stats(stats):
+    """Tampilkan efisiensi packing vs padding max_length"""
+    print(f"📦 Packing: {stats['num_docs']:,} docs -> {stats['num_blocks']:,} blocks "
+          f"x {stats['block_size']} tokens")
+    print(f"   Packing efficiency: {stats['packing_efficiency']*100:.1f}% token berguna")
+    print(f"   Padding max_length: {stats['padding_efficiency']*100:.1f}% token berguna")
+    print(f"   Useful tokens/step: ~{stats['speedup']:.1f}x lebih banyak")
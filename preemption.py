@@ -0,0 +1,250 @@
+"""
+Pre-emption-safe Training
+=========================
+Job yang di-kill (spot instance, Slurm pre-emption, Ctrl+C) di antara
+save_steps kehilangan sampai 200 step. Di sini:
+
+    1. PreemptionCallback memasang handler SIGTERM/SIGINT: signal hanya
+       menandai; di akhir optimizer step berikutnya Trainer menyimpan
+       checkpoint biasa (async di thread background jika memakai
+       async_checkpoint.py) lalu berhenti. Signal kedua = keluar paksa.
+       Di bawah torchrun tanda di-all-reduce tiap step supaya semua rank
+       berhenti di step yang sama.
+    2. Posisi data (sampler state: batch terpakai, batch size, world
+       size) ikut tersimpan di trainer_state.json (stateful callback).
+       Untuk StreamingTextDataset posisi stream yang sudah terpecah
+       (epoch data, offset per worker, worker berikutnya; satu per rank)
+       ikut disimpan saat checkpoint, lalu dipakai langsung oleh
+       set_resume_position tanpa membaca ulang data; dataset map-style
+       dilewati Trainer lewat SkipBatchSampler accelerate (hanya daftar
+       index, tanpa load/collate data). Jumlah sample tidak disimpan:
+       dengan token-budget batching ukuran batch tidak tetap.
+    3. --resume: cari checkpoint valid terakhir di output_dir (folder
+       .tmp-/setengah jadi dan checkpoint tanpa bobot/optimizer dilewati)
+
+Penggunaan:
+    python train_tiny_llm.py --resume                 # checkpoint valid terakhir
+    python train_tiny_llm.py --resume ./out/checkpoint-400
+    kill -TERM <pid>                                  # checkpoint + stop
+"""
+
+import os
+import re
+import sys
+import json
+import signal
+import threading
+
+import torch
+import torch.distributed as dist
+from transformers import TrainerCallback
+
+try:
+    from transformers.trainer_callback import ExportableState
+except ImportError:
+    ExportableState = object
+
+CHECKPOINT_RE = re.compile(r"^checkpoint-(\d+)$")
+WEIGHT_FILES = (
+    "model.safetensors",
+    "model.safetensors.index.json",
+    "pytorch_model.bin",
+    "adapter_model.safetensors",
+    "adapter_model.bin",
+)
+RESUME_FILES = ("optimizer.pt", "scheduler.pt")
+
+
+# ============================================================
+# CHECKPOINT DISCOVERY
+# ============================================================
+
+def is_valid_checkpoint(checkpoint_dir):
+    """Checkpoint lengkap: trainer_state terbaca, bobot + optimizer/scheduler ada"""
+    try:
+        with open(os.path.join(checkpoint_dir, "trainer_state.json"), 'r') as f:
+            json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not any(os.path.exists(os.path.join(checkpoint_dir, name)) for name in WEIGHT_FILES):
+        return False
+    return all(os.path.exists(os.path.join(checkpoint_dir, name)) for name in RESUME_FILES)
+
+
+def find_latest_checkpoint(output_dir):
+    """Path checkpoint-N valid dengan N terbesar, None jika tidak ada"""
+    if not os.path.isdir(output_dir):
+        return None
+    checkpoints = sorted(
+        (int(match.group(1)), name)
+        for name in os.listdir(output_dir)
+        if (match := CHECKPOINT_RE.match(name))
+    )
+    for step, name in reversed(checkpoints):
+        path = os.path.join(output_dir, name)
+        if is_valid_checkpoint(path):
+            return path
+        print(f"⚠️  Lewati checkpoint tidak lengkap: {path}")
+    return None
+
+
+def parse_resume_arg(argv=None):
+    """
+    --resume          -> True (checkpoint valid terakhir)
+    --resume <path>   -> path
+    tanpa flag        -> None
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if "--resume" not in argv:
+        return None
+    i = argv.index("--resume")
+    if i + 1 < len(argv) and not argv[i + 1].startswith("--"):
+        return argv[i + 1]
+    return True
+
+
+def resolve_resume_checkpoint(resume, output_dir):
+    """Nilai parse_resume_arg -> path checkpoint (atau None = mulai dari awal)"""
+    if not resume:
+        return None
+    if resume is True:
+        checkpoint = find_latest_checkpoint(output_dir)
+        if checkpoint is None:
+            print(f"ℹ️  Tidak ada checkpoint valid di {output_dir}, mulai dari awal")
+        else:
+            print(f"⏩ Resume dari checkpoint terakhir: {checkpoint}")
+        return checkpoint
+    if not is_valid_checkpoint(resume):
+        raise ValueError(f"Checkpoint tidak valid / tidak lengkap: {resume}")
+    print(f"⏩ Resume dari: {resume}")
+    return resume
+
+
+def load_data_position(checkpoint_dir):
+    """Sampler state yang disimpan PreemptionCallback (None jika tidak ada)"""
+    with open(os.path.join(checkpoint_dir, "trainer_state.json"), 'r') as f:
+        state = json.load(f)
+    saved = state.get("stateful_callbacks", {}).get(PreemptionCallback.__name__)
+    if isinstance(saved, list):
+        saved = saved[-1] if saved else None
+    return saved["attributes"]["data_position"] if saved else None
+
+
+# ============================================================
+# CALLBACK
+# ============================================================
+
+class PreemptionCallback(TrainerCallback, ExportableState):
+    """
+    SIGTERM/SIGINT -> checkpoint di akhir step berjalan + stop training
+
+    Setelah trainer.train() selesai, cek `preempted` untuk melewati
+    langkah pasca-training (save final, merge LoRA, dst).
+    """
+
+    def __init__(self, signals=(signal.SIGTERM, signal.SIGINT), data_position=None):
+        self.signals = signals
+        self.data_position = data_position or {}
+        self.requested = False
+        self.preempted = False
+        self._original_handlers = {}
+        self._pid = os.getpid()
+        self._epoch_start_step = 0
+
+    def _handle_signal(self, signum, frame):
+        if os.getpid() != self._pid:
+            # Worker DataLoader (fork) mewarisi handler: abaikan, main process
+            # yang menyimpan checkpoint dan menutup worker
+            return
+        if self.requested:
+            # Signal kedua: kembalikan handler asli dan keluar sekarang
+            self._restore_handlers()
+            signal.raise_signal(signum)
+            return
+        self.requested = True
+        print(f"\n🛑 {signal.Signals(signum).name} diterima: simpan checkpoint di akhir step ini "
+              f"lalu berhenti (kirim lagi untuk keluar paksa)")
+
+    def _restore_handlers(self):
+        for signum, handler in self._original_handlers.items():
+            signal.signal(signum, handler)
+        self._original_handlers = {}
+
+    def _sync_requested(self, args):
+        """Rank mana pun menerima signal -> semua rank berhenti di step yang sama"""
+        if args.world_size > 1 and dist.is_available() and dist.is_initialized():
+            flag = torch.tensor(int(self.requested), device=args.device)
+            dist.all_reduce(flag, op=dist.ReduceOp.MAX)
+            return bool(flag.item())
+        return self.requested
+
+    def _stream_positions(self, args, state, train_dataloader):
+        """Posisi StreamingTextDataset tiap rank (None jika bukan stream)"""
+        dataset = getattr(train_dataloader, "dataset", None)
+        if not hasattr(dataset, "stream_position"):
+            return None
+        # Batch terpakai di epoch berjalan; epoch sebelumnya sudah tercakup
+        # di epoch data milik dataset
+        batches = (state.global_step - self._epoch_start_step) * args.gradient_accumulation_steps
+        position = dataset.stream_position(
+            batches, args.per_device_train_batch_size, args.dataloader_num_workers
+        )
+        if args.world_size > 1 and dist.is_available() and dist.is_initialized():
+            positions = [None] * args.world_size
+            dist.all_gather_object(positions, position)
+            return positions
+        return [position]
+
+    def _record_stream(self, args, state, control, train_dataloader):
+        """Posisi stream hanya dihitung jika checkpoint akan disimpan"""
+        if not control.should_save:
+            return
+        # DefaultFlowCallback (callback pertama) sudah memutuskan save;
+        # sama di semua rank, jadi all_gather aman
+        stream = self._stream_positions(args, state, train_dataloader)
+        if stream is not None:
+            self.data_position["stream"] = stream
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        # signal.signal hanya bisa dari main thread
+        if threading.current_thread() is not threading.main_thread():
+            return
+        self._pid = os.getpid()
+        for signum in self.signals:
+            self._original_handlers[signum] = signal.getsignal(signum)
+            signal.signal(signum, self._handle_signal)
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._epoch_start_step = state.global_step
+
+    def on_step_end(self, args, state, control, train_dataloader=None, **kwargs):
+        # Dicatat sebelum _save_checkpoint (trainer_state ikut menyimpan state())
+        if self._sync_requested(args):
+            self.preempted = True
+            control.should_save = True
+            control.should_training_stop = True
+        self.data_position = {
+            "global_step": state.global_step,
+            "epoch": state.epoch,
+            "batches_consumed": state.global_step * args.gradient_accumulation_steps,
+            "per_device_train_batch_size": args.per_device_train_batch_size,
+            "gradient_accumulation_steps": args.gradient_accumulation_steps,
+            "world_size": max(1, args.world_size),
+        }
+        self._record_stream(args, state, control, train_dataloader)
+
+    def on_epoch_end(self, args, state, control, train_dataloader=None, **kwargs):
+        # save_strategy="epoch": checkpoint disimpan setelah on_epoch_end
+        self._record_stream(args, state, control, train_dataloader)
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self._restore_handlers()
+        if self.preempted:
+            print(f"\n💾 Pre-emption checkpoint: step {state.global_step} di {args.output_dir}")
+            print("   Lanjutkan dengan flag --resume")
+
+    def state(self):
+        return {
+            "args": {},
+            "attributes": {"data_position": self.data_position},
+        }
@@ -0,0 +1,129 @@
+"""
+Prefix KV-Cache
+===============
+Setiap pertanyaan diawali teks yang sama: system prompt + chat template
+Qwen, atau scaffolding "### Instruksi:" GPT-2. Tanpa cache, prefix itu
+di-prefill ulang di setiap request (di CPU, system prompt Qwen jauh
+lebih panjang dari pertanyaannya).
+
+PrefixCache menghitung KV state prefix SEKALI per model, disimpan per
+token ids (LRU), dan setiap generate mulai dari salinannya; prefill
+tinggal token pertanyaan. Prefix = bagian token yang sama antara prompt
+dan template dengan pertanyaan kosong, jadi batas tokenisasi selalu
+sesuai prompt asli (tidak ada token yang terpotong beda).
+
+Batch: baris disusun [prefix][padding][pertanyaan] (padding di tengah,
+attention_mask 0), position_ids dari cumsum attention_mask; beam search
+didukung (cache diulang per beam).
+
+Penggunaan:
+    from prefix_cache import get_prefix_cache
+
+    cache = get_prefix_cache(model)
+    inputs = cache.batch_inputs(tokenizer, prompts, template, device, num_beams=5)
+    outputs = model.generate(**inputs, num_beams=5, ...)
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+import torch
+
+from continuous_batching import cache_to_kv, kv_to_cache
+
+PREFIX_CACHE_SIZE = 8   # Prefix berbeda per model (system prompt / template)
+
+_caches = weakref.WeakKeyDictionary()
+
+
+def common_prefix_length(a, b):
+    """Jumlah token awal yang sama"""
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def get_prefix_cache(model):
+    """PrefixCache milik model (dibuat sekali)"""
+    if model not in _caches:
+        _caches[model] = PrefixCache(model)
+    return _caches[model]
+
+
+class PrefixCache:
+    """KV state prefix, key = tuple token ids"""
+
+    def __init__(self, model, max_entries=PREFIX_CACHE_SIZE):
+        self.model = model
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()    # Dipakai thread generate server
+        self.stats = {"hits": 0, "misses": 0, "tokens_reused": 0}
+
+    def prefix_length(self, prompt_ids, template_ids):
+        """
+        Panjang prefix yang bisa dipakai ulang: token sama dengan template
+        (minimal 1 token prompt tersisa untuk logits token pertama)
+        """
+        return min(common_prefix_length(prompt_ids, template_ids), len(prompt_ids) - 1)
+
+    @torch.inference_mode()
+    def get(self, prefix_ids):
+        """[(key, value)] per layer untuk prefix (batch 1), dihitung jika belum ada"""
+        key = tuple(prefix_ids)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["tokens_reused"] += len(key)
+                return self.entries[key]
+
+            self.stats["misses"] += 1
+            device = next(self.model.parameters()).device
+            input_ids = torch.tensor([list(key)], device=device)
+            outputs = self.model(input_ids=input_ids, attention_mask=torch.ones_like(input_ids), use_cache=True)
+            kv = cache_to_kv(outputs.past_key_values)
+            self.entries[key] = kv
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return kv
+
+    def make_cache(self, prefix_ids, batch_size=1):
+        """Salinan cache prefix untuk satu generate (batch_size baris)"""
+        return kv_to_cache([
+            (k.repeat(batch_size, 1, 1, 1), v.repeat(batch_size, 1, 1, 1))
+            for k, v in self.get(prefix_ids)
+        ])
+
+    def batch_inputs(self, tokenizer, prompts, template, device, num_beams=1):
+        """
+        Input model.generate untuk prompts yang berbagi prefix dengan
+        template (teks prompt dengan pertanyaan kosong)
+
+        Returns:
+            Dict input_ids, attention_mask (+ past_key_values jika ada prefix)
+        """
+        prompt_ids = [tokenizer(p).input_ids for p in prompts]
+        template_ids = tokenizer(template).input_ids
+        prefix = min(self.prefix_length(ids, template_ids) for ids in prompt_ids)
+        if len({tuple(ids[:prefix]) for ids in prompt_ids}) > 1:
+            prefix = 0
+
+        pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        rests = [ids[prefix:] for ids in prompt_ids]
+        length = max(len(r) for r in rests)
+        shared = prompt_ids[0][:prefix]
+        input_ids = torch.tensor(
+            [shared + [pad_token_id] * (length - len(r)) + r for r in rests], device=device
+        )
+        attention_mask = torch.tensor(
+            [[1] * prefix + [0] * (length - len(r)) + [1] * len(r) for r in rests], device=device
+        )
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if prefix:
+            inputs["past_key_values"] = self.make_cache(shared, len(prompts) * num_beams)
+        return inputs
@@ -11,12 +11,21 @@ import os
 os.environ["CUDA_VISIBLE_DEVICES"] = "0"
 
 import json
+import math
 import random
+import shutil
+import itertools
+import multiprocessing
 from datasets import load_dataset, concatenate_datasets, Dataset
 from transformers import AutoTokenizer
 from tqdm import tqdm
 import re
 
+from token_shards import write_token_shards
+from minhash_dedup import MinHashDeduplicator
+from ingestion import TextSource, LocalFileSource, ConcurrentIngestor
+from content_index import ContentHashIndex
+
 # ============================================================
 # KONFIGURASI
 # ============================================================
@@ -28,33 +37,74 @@ CONFIG = {
     "train_size": 50000,  # Jumlah sample training
     "eval_size": 2000,    # Jumlah sample evaluasi
     "seed": 42,
-    "tokenizer": "cahya/gpt2-small-indonesian-522M",  # Tokenizer Indonesia
+    "tokenizer": "cahya/gpt2-small-indonesian-522M",  # Tokenizer Indonesia (atau hasil train_tokenizer.py)
+    "num_workers": os.cpu_count() or 1,  # Process untuk cleaning & filtering
+    "filter_chunk_size": 500,  # Teks per task di process pool
+    "dedup": {                 # MinHash-LSH near-duplicate removal
+        "threshold": 0.8,      # Perkiraan Jaccard minimum untuk duplikat
+        "num_perm": 128,
+        "bands": None,         # None = dipilih otomatis dari threshold
+        "ngram": 5,            # Shingle n-gram kata
+    },
+    "use_hf_sources": True,    # False = offline, hanya local_sources
+    # Maksimal sample diterima per sumber. Jika total quota < train_size + eval_size,
+    # quota HF diskalakan proporsional (lihat source_quotas()), jadi menaikkan
+    # train_size (atau quota langsung) = top-up inkremental dari state_dir
+    "source_quotas": {
+        "wikipedia": 20000,
+        "news": 15000,
+        "mc4": 15000,
+        "corpus": 10000,
+    },
+    # Dump lokal (JSONL / JSONL.gz / JSON / Parquet, file/folder/glob), contoh:
+    # {"name": "dump", "path": "./dumps/*.jsonl", "text_field": "text", "quota": 20000}
+    "local_sources": [],
+    "state_dir": "./dataset/ingest_state",  # Progress per sumber (resume & top-up)
+    "write_token_shards": True,  # Tulis juga token shards (pre-tokenized, mmap)
+    "shard_dir": "./dataset/shards",
 }
 
 # ============================================================
 # FUNGSI CLEANING
 # ============================================================
 
+# Pattern di-compile sekali di level modul (juga di setiap worker process)
+RE_WHITESPACE = re.compile(r'\s+')
+RE_BAD_CHARS = re.compile(r'[^\w\s.,!?;:\-\'\"()\[\]{}@#%&*+=<>/\\|~`^$€£¥₹₩]')
+RE_URL = re.compile(r'http[s]?://\S+|www\.\S+')
+RE_EMAIL = re.compile(r'\S+@\S+')
+RE_REPEAT_PUNCT = re.compile(r'([.,!?;:])\1+')
+RE_ASCII_LETTER = re.compile(r'[a-zA-Z]')
+
+# Kata-kata umum bahasa Indonesia
+INDONESIAN_WORDS = frozenset([
+    'yang', 'dan', 'di', 'ini', 'itu', 'dengan', 'untuk', 'pada',
+    'adalah', 'dari', 'dalam', 'tidak', 'akan', 'ke', 'juga',
+    'atau', 'ada', 'mereka', 'telah', 'oleh', 'saya', 'kami',
+    'kita', 'bisa', 'seperti', 'karena', 'sudah', 'lebih', 'banyak',
+    'sangat', 'hanya', 'dapat', 'bahwa', 'setelah', 'tahun', 'orang'
+])
+
+
 def clean_text(text):
     """Bersihkan teks dari noise"""
     if not text or not isinstance(text, str):
         return ""
     
     # Hapus multiple whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = RE_WHITESPACE.sub(' ', text)
     
     # Hapus karakter aneh
-    text = re.sub(r'[^\w\s.,!?;:\-\'\"()\[\]{}@#%&*+=<>/\\|~`^$€£¥₹₩]', '', text)
+    text = RE_BAD_CHARS.sub('', text)
     
     # Hapus URL
-    text = re.sub(r'http[s]?://\S+', '', text)
-    text = re.sub(r'www\.\S+', '', text)
+    text = RE_URL.sub('', text)
     
     # Hapus email
-    text = re.sub(r'\S+@\S+', '', text)
+    text = RE_EMAIL.sub('', text)
     
     # Hapus multiple punctuation
-    text = re.sub(r'([.,!?;:])\1+', r'\1', text)
+    text = RE_REPEAT_PUNCT.sub(r'\1', text)
     
     # Hapus spasi di awal/akhir
     text = text.strip()
@@ -62,23 +112,35 @@ def clean_text(text):
     return text
 
 
+def count_char_classes(text):
+    """Hitung digit, huruf kapital, dan huruf dalam satu kali jalan"""
+    digits = upper = letters = 0
+    for c in text:
+        if c.isalpha():
+            letters += 1
+            if c.isupper():
+                upper += 1
+        elif c.isdigit():
+            digits += 1
+    return digits, upper, letters
+
+
 def is_good_quality(text, min_length=50):
     """Filter teks berkualitas"""
     if not text or len(text) < min_length:
         return False
     
     # Harus punya huruf
-    if not re.search(r'[a-zA-Z]', text):
+    if not RE_ASCII_LETTER.search(text):
         return False
     
+    digits, upper, letters = count_char_classes(text)
+    
     # Tidak boleh terlalu banyak angka (>30%)
-    digits = sum(c.isdigit() for c in text)
     if digits / len(text) > 0.3:
         return False
     
     # Tidak boleh terlalu banyak uppercase (>50%)
-    upper = sum(c.isupper() for c in text)
-    letters = sum(c.isalpha() for c in text)
     if letters > 0 and upper / letters > 0.5:
         return False
     
@@ -92,63 +154,110 @@ def is_good_quality(text, min_length=50):
 
 def is_indonesian(text):
     """Simple check apakah teks kemungkinan bahasa Indonesia"""
-    # Kata-kata umum bahasa Indonesia
-    indonesian_words = [
-        'yang', 'dan', 'di', 'ini', 'itu', 'dengan', 'untuk', 'pada',
-        'adalah', 'dari', 'dalam', 'tidak', 'akan', 'ke', 'juga',
-        'atau', 'ada', 'mereka', 'telah', 'oleh', 'saya', 'kami',
-        'kita', 'bisa', 'seperti', 'karena', 'sudah', 'lebih', 'banyak',
-        'sangat', 'hanya', 'dapat', 'bahwa', 'setelah', 'tahun', 'orang'
-    ]
-    
-    text_lower = text.lower()
-    words = text_lower.split()
-    
-    # Hitung berapa kata Indonesia yang muncul
-    count = sum(1 for word in indonesian_words if word in words)
+    words = set(text.lower().split())
     
     # Minimal 3 kata Indonesia
-    return count >= 3
+    return len(INDONESIAN_WORDS & words) >= 3
 
 
 # ============================================================
-# DOWNLOAD & PROCESS DATASETS
+# PARALLEL FILTER ENGINE
 # ============================================================
 
-def load_mc4_indonesian(max_samples=30000):
-    """Load mC4 Indonesian dataset (publicly available)"""
-    print("\n📥 Loading mC4 Indonesian...")
+def _filter_chunk(texts, min_length, clean, require_indonesian):
+    """Worker: clean + filter satu chunk, None untuk teks yang ditolak"""
+    results = []
+    for text in texts:
+        if clean:
+            text = clean_text(text)
+        ok = is_good_quality(text, min_length)
+        if ok and require_indonesian:
+            ok = is_indonesian(text)
+        results.append(text if ok else None)
+    return results
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parallel_filter(texts, min_length=50, clean=True, require_indonesian=False,
+                    num_workers=None, chunk_size=None):
+    """
+    Clean & filter teks memakai process pool, urutan output tetap
+    
+    Input dibaca bertahap (boleh generator/streaming); paling banyak
+    2 chunk per worker yang sedang diproses, jadi memory tetap kecil.
+    Generator ini bisa di-break kapan saja (pool langsung dimatikan).
+    
+    Args:
+        texts: Iterable of raw strings
+        min_length: Minimum karakter (is_good_quality)
+        clean: Jalankan clean_text dulu
+        require_indonesian: Wajib lolos is_indonesian
+        num_workers: Jumlah process (default CONFIG['num_workers'])
+        chunk_size: Teks per task (default CONFIG['filter_chunk_size'])
+    
+    Yields:
+        Teks (sudah di-clean) yang lolos filter
+    """
+    num_workers = num_workers or CONFIG['num_workers'] or 1
+    chunk_size = chunk_size or CONFIG['filter_chunk_size']
+    args = (min_length, clean, require_indonesian)
+    
+    if num_workers <= 1:
+        for chunk in _chunked(texts, chunk_size):
+            for text in _filter_chunk(chunk, *args):
+                if text is not None:
+                    yield text
+        return
+    
+    from collections import deque
+    
+    pool = multiprocessing.Pool(num_workers)
     try:
-        dataset = load_dataset(
-            "allenai/c4",
-            "id",
-            split="train",
-            streaming=True
-        )
+        pending = deque()
+        max_pending = num_workers * 2
         
-        texts = []
-        for i, item in enumerate(tqdm(dataset, desc="Processing mC4")):
-            if i >= max_samples * 2:  # Load lebih untuk filtering
-                break
-            
-            text = clean_text(item.get('text', ''))
-            if is_good_quality(text, min_length=100):
-                texts.append(text)
-            
-            if len(texts) >= max_samples:
-                break
+        def drain(limit):
+            while len(pending) > limit:
+                for text in pending.popleft().get():
+                    if text is not None:
+                        yield text
         
-        print(f"✓ mC4: {len(texts)} samples")
-        return texts
-    except Exception as e:
-        print(f"⚠ mC4 failed: {e}")
-        return []
+        for chunk in _chunked(texts, chunk_size):
+            pending.append(pool.apply_async(_filter_chunk, (chunk,) + args))
+            yield from drain(max_pending)
+        yield from drain(0)
+    finally:
+        pool.terminate()
+        pool.join()
 
 
-def load_indo_general_corpus(max_samples=20000):
-    """Load Indonesian general text corpus"""
-    print("\n📥 Loading Indonesian Corpus...")
-    
+# ============================================================
+# DOWNLOAD & PROCESS DATASETS
+# ============================================================
+
+# Ambil lebih (max_samples * RAW_OVERSAMPLE) item mentah untuk filtering
+RAW_OVERSAMPLE = 2
+
+
+def iter_mc4_raw(max_samples=15000, start=0):
+    """mC4 Indonesian (publicly available), streaming - teks mentah"""
+    dataset = load_dataset("allenai/c4", "id", split="train", streaming=True)
+    for _, item in zip(range(start, max_samples * RAW_OVERSAMPLE), dataset.skip(start)):
+        yield item.get('text', '')
+
+
+def iter_indo_general_corpus_raw(max_samples=10000, start=0):
+    """Indonesian general text corpus - teks mentah, sumber cadangan berurutan"""
     # Try multiple sources in order of preference
     sources = [
         ("csebuetnlp/xlsum", "indonesian", "text"),
@@ -156,103 +265,56 @@ def load_indo_general_corpus(max_samples=20000):
     ]
     
     for dataset_name, config, text_field in sources:
+        count = 0
         try:
-            print(f"   Trying {dataset_name}...")
             if config:
                 dataset = load_dataset(dataset_name, config, split="train", streaming=True)
             else:
                 dataset = load_dataset(dataset_name, split="train", streaming=True)
             
-            texts = []
-            for i, item in enumerate(tqdm(dataset, desc=f"Processing {dataset_name}")):
-                if i >= max_samples * 2:
-                    break
-                
+            for _, item in zip(range(start, max_samples * RAW_OVERSAMPLE), dataset.skip(start)):
                 # Try different field names
-                text = item.get(text_field, item.get('article', item.get('content', '')))
-                text = clean_text(text)
-                
-                if is_good_quality(text, min_length=80):
-                    texts.append(text)
-                
-                if len(texts) >= max_samples:
-                    break
-            
-            if texts:
-                print(f"✓ {dataset_name}: {len(texts)} samples")
-                return texts
-                
+                yield item.get(text_field, item.get('article', item.get('content', '')))
+                count += 1
         except Exception as e:
             print(f"   ⚠ {dataset_name} failed: {e}")
-            continue
+        
+        if count:
+            return
     
-    print("⚠ All corpus sources failed")
-    return []
+    raise RuntimeError("All corpus sources failed")
 
 
-def load_wikipedia_indonesian(max_samples=20000):
-    """Load Wikipedia Indonesia"""
-    print("\n📥 Loading Wikipedia Indonesian...")
-    try:
-        dataset = load_dataset(
-            "wikimedia/wikipedia",
-            "20231101.id",
-            split="train"
-        )
-        
-        texts = []
-        indices = random.sample(range(len(dataset)), min(max_samples * 2, len(dataset)))
-        
-        for idx in tqdm(indices, desc="Processing Wikipedia"):
-            text = clean_text(dataset[idx].get('text', ''))
-            if is_good_quality(text, min_length=200):
-                # Ambil paragraf pertama saja untuk variasi
-                paragraphs = text.split('\n\n')
-                for para in paragraphs[:3]:
-                    if len(para) > 100:
-                        texts.append(para)
-            
-            if len(texts) >= max_samples:
-                break
-        
-        print(f"✓ Wikipedia: {len(texts)} samples")
-        return texts
-    except Exception as e:
-        print(f"⚠ Wikipedia failed: {e}")
-        return []
+def _stable_sample_indices(n, max_samples, start=0):
+    """Urutan acak tetap (seed) sehingga offset resume & top-up konsisten"""
+    indices = list(range(n))
+    random.Random(CONFIG['seed']).shuffle(indices)
+    return indices[start:min(max_samples * RAW_OVERSAMPLE, n)]
 
 
-def load_indo4b_news(max_samples=15000):
-    """Load Indonesian news dataset"""
-    print("\n📥 Loading Indonesian News...")
-    try:
-        dataset = load_dataset(
-            "id_newspapers_2018",
-            split="train"
-        )
-        
-        texts = []
-        indices = random.sample(range(len(dataset)), min(max_samples * 2, len(dataset)))
-        
-        for idx in tqdm(indices, desc="Processing News"):
-            item = dataset[idx]
-            # Gabung title dan content
-            title = item.get('title', '')
-            content = item.get('content', '')
-            text = f"{title}. {content}" if title else content
-            text = clean_text(text)
-            
-            if is_good_quality(text, min_length=100):
-                texts.append(text)
-            
-            if len(texts) >= max_samples:
-                break
-        
-        print(f"✓ News: {len(texts)} samples")
-        return texts
-    except Exception as e:
-        print(f"⚠ News failed: {e}")
-        return []
+def iter_wikipedia_raw(max_samples=20000, start=0):
+    """Wikipedia Indonesia - artikel acak, teks mentah"""
+    dataset = load_dataset("wikimedia/wikipedia", "20231101.id", split="train")
+    for idx in _stable_sample_indices(len(dataset), max_samples, start):
+        yield dataset[idx].get('text', '')
+
+
+def iter_indo4b_news_raw(max_samples=15000, start=0):
+    """Indonesian news dataset - title + content, teks mentah"""
+    dataset = load_dataset("id_newspapers_2018", split="train")
+    for idx in _stable_sample_indices(len(dataset), max_samples, start):
+        item = dataset[idx]
+        # Gabung title dan content
+        title = item.get('title', '')
+        content = item.get('content', '')
+        yield f"{title}. {content}" if title else content
+
+
+def wikipedia_paragraphs(text):
+    """Ambil 3 paragraf pertama saja untuk variasi"""
+    for para in text.split('\n\n')[:3]:
+        if len(para) > 100 and is_good_quality(para, CONFIG['min_length']) and is_indonesian(para):
+            yield para
 
 
 def create_conversational_data():
@@ -339,69 +401,156 @@ def create_conversational_data():
 
 
 # ============================================================
-# MAIN PIPELINE
+# STREAMING HELPERS
 # ============================================================
 
-def main():
-    print("=" * 60)
-    print("🚀 INDONESIAN LLM DATASET PREPARATION")
-    print("=" * 60)
-    
-    random.seed(CONFIG['seed'])
-    os.makedirs(CONFIG['output_dir'], exist_ok=True)
-    
-    # Collect semua data
-    all_texts = []
+class ReservoirSampler:
+    """
+    Reservoir sampling (Algorithm R): sample acak seragam berukuran k
+    dari stream yang panjangnya tidak diketahui, memory O(k)
+    """
     
-    # 1. Wikipedia (high quality)
-    wiki_texts = load_wikipedia_indonesian(max_samples=20000)
-    all_texts.extend(wiki_texts)
+    def __init__(self, k, seed=42):
+        self.k = k
+        self.rng = random.Random(seed)
+        self.items = []
+        self.seen = 0
     
-    # 2. News (formal Indonesian)
-    news_texts = load_indo4b_news(max_samples=15000)
-    all_texts.extend(news_texts)
+    def add(self, item):
+        self.seen += 1
+        if len(self.items) < self.k:
+            self.items.append(item)
+        else:
+            j = self.rng.randrange(self.seen)
+            if j < self.k:
+                self.items[j] = item
     
-    # 3. mC4 Indonesian (diverse web text) - replaces OSCAR
-    mc4_texts = load_mc4_indonesian(max_samples=15000)
-    all_texts.extend(mc4_texts)
+    def extend(self, items):
+        for item in items:
+            self.add(item)
+
+
+def write_json_list(path, texts):
+    """Tulis [{"text": ...}, ...] satu item per satu (tanpa list besar di RAM)"""
+    tmp_path = path + ".tmp"
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for text in texts:
+            f.write(",\n  " if count else "\n  ")
+            f.write(json.dumps({"text": text}, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n" if count else "]\n")
+    os.replace(tmp_path, path)
+    return count
+
+
+def _source_filter_args(min_length):
+    """Clean + quality + cek bahasa Indonesia dalam satu pass di worker"""
+    return (max(min_length, CONFIG['min_length']), True, True)
+
+
+def source_quotas():
+    """
+    Quota sumber HF dari CONFIG['source_quotas'], diskalakan proporsional
+    supaya totalnya minimal train_size + eval_size
+    """
+    quotas = dict(CONFIG['source_quotas'])
+    target = CONFIG['train_size'] + CONFIG['eval_size']
+    total = sum(quotas.values())
+    if total and total < target:
+        quotas = {name: math.ceil(q * target / total) for name, q in quotas.items()}
+    return quotas
+
+
+def build_sources():
+    """Daftar sumber (HuggingFace + dump lokal) dengan quota masing-masing"""
+    quotas = source_quotas()
+    sources = []
+    
+    if CONFIG['use_hf_sources']:
+        # raw_limit = batas iterator (bukan akhir stream) -> quota naik, stream dilanjutkan
+        sources += [
+            # 1. Wikipedia (high quality)
+            TextSource("wikipedia", lambda start: iter_wikipedia_raw(quotas['wikipedia'], start),
+                       quota=quotas['wikipedia'], filter_args=_source_filter_args(200),
+                       postprocess=wikipedia_paragraphs,
+                       raw_limit=quotas['wikipedia'] * RAW_OVERSAMPLE),
+            # 2. News (formal Indonesian)
+            TextSource("news", lambda start: iter_indo4b_news_raw(quotas['news'], start),
+                       quota=quotas['news'], filter_args=_source_filter_args(100),
+                       raw_limit=quotas['news'] * RAW_OVERSAMPLE),
+            # 3. mC4 Indonesian (diverse web text) - replaces OSCAR
+            TextSource("mc4", lambda start: iter_mc4_raw(quotas['mc4'], start),
+                       quota=quotas['mc4'], filter_args=_source_filter_args(100),
+                       raw_limit=quotas['mc4'] * RAW_OVERSAMPLE),
+            # 4. Liputan6/Indo corpus (additional text) - replaces CC100
+            TextSource("corpus", lambda start: iter_indo_general_corpus_raw(quotas['corpus'], start),
+                       quota=quotas['corpus'], filter_args=_source_filter_args(80),
+                       raw_limit=quotas['corpus'] * RAW_OVERSAMPLE),
+        ]
     
-    # 4. Liputan6/Indo corpus (additional text) - replaces CC100
-    corpus_texts = load_indo_general_corpus(max_samples=10000)
-    all_texts.extend(corpus_texts)
+    for local in CONFIG['local_sources']:
+        sources.append(LocalFileSource(
+            local.get('name', os.path.basename(local['path'])),
+            local['path'],
+            text_field=local.get('text_field', 'text'),
+            quota=local.get('quota'),
+            filter_args=_source_filter_args(local.get('min_length', CONFIG['min_length'])),
+        ))
     
     # 5. Conversational data
-    conv_texts = create_conversational_data()
     # Gandakan conversational data agar model lebih ingat
-    all_texts.extend(conv_texts * 50)
-    
-    print(f"\n📊 Total raw samples: {len(all_texts)}")
-    
-    # Shuffle
-    random.shuffle(all_texts)
-    
-    # Final filtering
-    print("\n🔍 Final quality filtering...")
-    filtered_texts = []
-    for text in tqdm(all_texts, desc="Filtering"):
-        if is_good_quality(text, CONFIG['min_length']) and is_indonesian(text):
-            filtered_texts.append(text)
-    
-    print(f"✓ After filtering: {len(filtered_texts)} samples")
+    conv_texts = create_conversational_data()
+    sources.append(TextSource(
+        "conversational",
+        lambda start: itertools.islice((t for _ in range(50) for t in conv_texts), start, None),
+        filter_args=(CONFIG['min_length'], False, True),
+    ))
+    return sources
+
+
+# ============================================================
+# MAIN PIPELINE
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("🚀 INDONESIAN LLM DATASET PREPARATION")
+    print("=" * 60)
     
-    # Deduplicate (simple)
-    print("\n🔄 Removing duplicates...")
-    seen = set()
-    unique_texts = []
-    for text in filtered_texts:
-        # Hash first 100 chars for dedup
-        key = text[:100].lower()
-        if key not in seen:
-            seen.add(key)
-            unique_texts.append(text)
+    random.seed(CONFIG['seed'])
+    os.makedirs(CONFIG['output_dir'], exist_ok=True)
     
-    print(f"✓ After dedup: {len(unique_texts)} samples")
+    # Streaming pipeline: ingest (semua sumber paralel) -> dedup -> reservoir sample.
+    # Memory sebanding dengan train_size + eval_size, bukan ukuran download.
+    print("\n🔍 Streaming: ingest + quality filter -> dedup -> sample...")
+    ingestor = ConcurrentIngestor(
+        build_sources(),
+        filter_fn=_filter_chunk,
+        num_workers=CONFIG['num_workers'],
+        chunk_size=CONFIG['filter_chunk_size'],
+        state_dir=CONFIG['state_dir'],
+        # Exact dedup lintas run & sumber; hanya teks baru yang di-hash
+        content_index=ContentHashIndex(os.path.join(CONFIG['state_dir'], "content_index")),
+    )
+    dedup = MinHashDeduplicator(**CONFIG['dedup'], seed=CONFIG['seed'])
+    reservoir = ReservoirSampler(CONFIG['train_size'] + CONFIG['eval_size'],
+                                 seed=CONFIG['seed'])
+    
+    reservoir.extend(dedup.filter(tqdm(ingestor, desc="Ingest")))
+    ingestor.content_index.close()
+    
+    ingestor.print_stats()
+    raw_total = sum(st['raw'] for st in ingestor.stats.values())
+    filtered_total = sum(st['accepted'] for st in ingestor.stats.values())
+    print(f"\n📊 Total raw samples: {raw_total}")
+    print(f"✓ After filtering: {filtered_total} samples")
+    dedup.print_report()
+    print(f"✓ After dedup: {reservoir.seen} samples")
     
     # Split train/eval
+    unique_texts = reservoir.items
     random.shuffle(unique_texts)
     
     train_size = min(CONFIG['train_size'], int(len(unique_texts) * 0.95))
@@ -414,20 +563,28 @@ def main():
     print(f"   Train: {len(train_texts)} samples")
     print(f"   Eval: {len(eval_texts)} samples")
     
-    # Save as JSON
+    # Save as JSON (ditulis bertahap per item)
     train_path = os.path.join(CONFIG['output_dir'], "train.json")
     eval_path = os.path.join(CONFIG['output_dir'], "eval.json")
     
-    with open(train_path, 'w', encoding='utf-8') as f:
-        json.dump([{"text": t} for t in train_texts], f, ensure_ascii=False, indent=2)
-    
-    with open(eval_path, 'w', encoding='utf-8') as f:
-        json.dump([{"text": t} for t in eval_texts], f, ensure_ascii=False, indent=2)
+    write_json_list(train_path, train_texts)
+    write_json_list(eval_path, eval_texts)
     
     print(f"\n💾 Saved to:")
     print(f"   {train_path}")
     print(f"   {eval_path}")
     
+    # Pre-tokenize ke token shards supaya training tidak tokenize ulang
+    if CONFIG['write_token_shards']:
+        print("\n🔤 Writing token shards...")
+        tokenizer = AutoTokenizer.from_pretrained(CONFIG['tokenizer'])
+        for split, texts in [("train", train_texts), ("eval", eval_texts)]:
+            shard_path = os.path.join(CONFIG['shard_dir'], split)
+            meta = write_token_shards(texts, tokenizer, shard_path,
+                                      max_length=CONFIG['max_length'])
+            print(f"   {shard_path}: {meta['num_docs']:,} docs, "
+                  f"{meta['num_tokens']:,} tokens ({meta['dtype']})")
+    
     # Stats
     print("\n📈 Dataset Statistics:")
     total_chars = sum(len(t) for t in train_texts)
@@ -737,4 +894,14 @@ if __name__ == "__main__":
         prepare_qa_dataset(qa_format=qa_format)
     else:
         # Default: prepare general dataset
+        # --local PATH (boleh berulang) menambah dump lokal, --offline mematikan HuggingFace
+        args = sys.argv[1:]
+        for i, arg in enumerate(args):
+            if arg == "--local" and i + 1 < len(args):
+                CONFIG['local_sources'].append({"path": args[i + 1]})
+        if "--offline" in args:
+            CONFIG['use_hf_sources'] = False
+        # --fresh: buang progress lama, mulai dari nol
+        if "--fresh" in args and os.path.isdir(CONFIG['state_dir']):
+            shutil.rmtree(CONFIG['state_dir'])
         main()
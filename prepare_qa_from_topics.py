@@ -4,15 +4,26 @@ Prepare Q&A Dataset dari Dataset Topics
 Script ini membaca semua file JSON dari dataset_topics/
 dan convert ke format training untuk fine-tuning
 
+Run berikutnya bersifat inkremental: hanya Q&A baru (belum ada di
+content-hash index) yang di-append ke train/eval, file topik yang
+tidak berubah dilewati. Entry dari file topik yang berubah / dihapus
+diganti (bukan menumpuk). Manifest (ditulis atomik, paling akhir)
+mencatat signature output & index; jika tidak cocok (run terhenti di
+tengah), dataset dibangun ulang.
+
 Penggunaan:
-    python prepare_qa_from_topics.py
+    python prepare_qa_from_topics.py            # Inkremental
+    python prepare_qa_from_topics.py --rebuild  # Bangun ulang dari nol
 """
 
 import os
+import sys
 import json
 import random
 from pathlib import Path
 
+from content_index import ContentHashIndex, fingerprint
+
 # ============================================================
 # KONFIGURASI
 # ============================================================
@@ -22,6 +33,11 @@ OUTPUT_DIR = "./dataset"
 TRAIN_SPLIT = 0.8  # 80% training, 20% eval
 SEED = 42
 
+# Index dedup persisten + manifest file topik yang sudah diproses
+INDEX_PATH = os.path.join(OUTPUT_DIR, "qa_content_index")
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "qa_topics_manifest.json")
+MANIFEST_VERSION = 2
+
 # Format template untuk training
 QA_FORMAT = "instruction"  # Pilihan: "simple", "instruction", "chat"
 
@@ -36,9 +52,8 @@ TEMPLATES = {
 # FUNGSI
 # ============================================================
 
-def load_all_qa_from_topics():
-    """Load semua Q&A dari dataset_topics/"""
-    all_qa = []
+def list_topic_files():
+    """File JSON di dataset_topics/ (terurut), list kosong jika tidak ada"""
     source_path = Path(SOURCE_DIR)
     
     if not source_path.exists():
@@ -59,42 +74,65 @@ def load_all_qa_from_topics():
     
     if not json_files:
         print(f"❌ Tidak ada file JSON di {SOURCE_DIR}")
+    return json_files
+
+
+def load_topic_file(json_file):
+    """Load Q&A dari satu file topik (None jika gagal / format tidak valid)"""
+    try:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        if isinstance(data, list):
+            topic_name = json_file.stem
+            # Flatten nested lists if any
+            flat_data = []
+            for item in data:
+                if isinstance(item, dict):
+                    flat_data.append(item)
+                elif isinstance(item, list):
+                    # Handle nested list
+                    flat_data.extend([i for i in item if isinstance(i, dict)])
+            
+            print(f"  ✓ {topic_name}: {len(flat_data)} QA pairs")
+            return flat_data
+        else:
+            print(f"  ⚠️  {json_file.name}: Format tidak valid (bukan list)")
+    
+    except json.JSONDecodeError:
+        print(f"  ❌ {json_file.name}: Error parsing JSON")
+    except Exception as e:
+        print(f"  ❌ {json_file.name}: {str(e)}")
+    return None
+
+
+def load_all_qa_from_topics():
+    """Load semua Q&A dari dataset_topics/"""
+    all_qa = []
+    json_files = list_topic_files()
+    if not json_files:
         return []
     
     print(f"📂 Membaca {len(json_files)} file JSON dari {SOURCE_DIR}")
     print("-" * 60)
     
     for json_file in json_files:
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                topic_name = json_file.stem
-                # Flatten nested lists if any
-                flat_data = []
-                for item in data:
-                    if isinstance(item, dict):
-                        flat_data.append(item)
-                    elif isinstance(item, list):
-                        # Handle nested list
-                        flat_data.extend([i for i in item if isinstance(i, dict)])
-                
-                print(f"  ✓ {topic_name}: {len(flat_data)} QA pairs")
-                all_qa.extend(flat_data)
-            else:
-                print(f"  ⚠️  {json_file.name}: Format tidak valid (bukan list)")
-        
-        except json.JSONDecodeError:
-            print(f"  ❌ {json_file.name}: Error parsing JSON")
-        except Exception as e:
-            print(f"  ❌ {json_file.name}: {str(e)}")
+        all_qa.extend(load_topic_file(json_file) or [])
     
     print("-" * 60)
     print(f"✓ Total Q&A pairs: {len(all_qa)}")
     return all_qa
 
 
+def file_signature(path):
+    """[size, mtime_ns] untuk deteksi perubahan (None jika file tidak ada)"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
 def convert_qa_to_text(qa_item, template_key="instruction"):
     """Convert QA item ke format text untuk training"""
     # Validate input is a dictionary
@@ -132,61 +170,202 @@ def split_train_eval(data, train_ratio=0.8, seed=42):
     return train_data, eval_data
 
 
+def reset_incremental_state():
+    """Hapus index & manifest (untuk --rebuild)"""
+    for path in [INDEX_PATH + ".npy", INDEX_PATH + ".log", MANIFEST_PATH]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_manifest():
+    """Manifest run sebelumnya (None jika belum ada / format lama)"""
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def output_signatures(paths):
+    return {path: file_signature(path) for path in paths}
+
+
+def save_manifest(manifest):
+    """Tulis manifest atomik (tmp + os.replace): titik commit satu run"""
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _dump_entry(item):
+    return json.dumps(item, ensure_ascii=False)
+
+
 def save_dataset(data, output_path):
-    """Save dataset ke JSON file"""
+    """
+    Save dataset ke JSON file (tmp + os.replace)
+    
+    Tetap JSON list biasa, tapi satu entry per baris supaya bisa di-append
+    (append_dataset) dan difilter per baris (rewrite_dataset).
+    """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("[\n")
+        f.write(",\n".join(_dump_entry(item) for item in data))
+        f.write("\n]\n" if data else "]\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, output_path)
 
 
-def main():
+def append_dataset(data, output_path):
+    """Tambahkan entry ke akhir file save_dataset, O(data baru)"""
+    if not data:
+        return
+    with open(output_path, 'r+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        empty = size <= len(b"[\n]\n")
+        f.seek(size - (2 if empty else 3))  # Timpa "]\n" / "\n]\n" penutup
+        f.write((b"" if empty else b",\n")
+                + ",\n".join(_dump_entry(item) for item in data).encode('utf-8')
+                + b"\n]\n")
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def rewrite_dataset(data, output_path, drop_fingerprints):
+    """Buang entry dengan fingerprint di drop_fingerprints, tambah data; return jumlah entry"""
+    kept = []
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip().rstrip(",")
+            if not line.startswith("{"):
+                continue
+            item = json.loads(line)
+            if fingerprint(item["text"]) not in drop_fingerprints:
+                kept.append(item)
+    save_dataset(kept + data, output_path)
+    return len(kept) + len(data)
+
+
+def main(rebuild=False):
     print("=" * 60)
     print("📚 PREPARE Q&A DATASET FROM TOPICS")
     print("=" * 60)
     print()
     
-    # Load semua Q&A
-    all_qa = load_all_qa_from_topics()
+    train_path = os.path.join(OUTPUT_DIR, "train_qa.json")
+    eval_path = os.path.join(OUTPUT_DIR, "eval_qa.json")
+    state_paths = [train_path, eval_path, INDEX_PATH + ".npy", INDEX_PATH + ".log"]
+    
+    # Manifest ditulis paling akhir (atomik). Output/index yang tidak cocok
+    # dengan signature di manifest = run sebelumnya terhenti di tengah
+    # commit (atau file diubah tool lain) -> bangun ulang dari nol
+    manifest = None if rebuild else load_manifest()
+    if manifest is not None and manifest["outputs"] != output_signatures(state_paths):
+        print("⚠️  Output/index tidak cocok dengan manifest, bangun ulang dari nol")
+        manifest = None
+    fresh = manifest is None
+    if fresh:
+        reset_incremental_state()
+        manifest = {"version": MANIFEST_VERSION, "files": {}, "counts": {"train": 0, "eval": 0}}
+    else:
+        print(f"♻️  Mode inkremental: {sum(manifest['counts'].values())} samples sudah ada")
     
-    if not all_qa:
+    json_files = list_topic_files()
+    if not json_files and fresh:
         print("\n❌ Tidak ada data Q&A yang ditemukan!")
         return
     
+    # File topik yang berubah / dihapus: entry lamanya dibuang dari output & index
+    signatures = {f.name: file_signature(f) for f in json_files}
+    stale = [name for name, entry in manifest["files"].items()
+             if signatures.get(name) != entry["signature"]]
+    stale_fingerprints = set()
+    for name in stale:
+        stale_fingerprints.update(manifest["files"].pop(name)["fingerprints"])
+    
+    # Load Q&A (file topik yang tidak berubah dilewati)
+    print(f"📂 Membaca {len(json_files)} file JSON dari {SOURCE_DIR}")
+    print("-" * 60)
+    topic_qa = []
+    for json_file in json_files:
+        if json_file.name in manifest["files"]:
+            print(f"  = {json_file.stem}: tidak berubah, skip")
+            continue
+        qa = load_topic_file(json_file)
+        if qa is not None:
+            topic_qa.append((json_file.name, qa))
+    print("-" * 60)
+    print(f"✓ Q&A pairs baru/berubah: {sum(len(qa) for _, qa in topic_qa)}")
+    if stale:
+        print(f"♻️  File berubah/dihapus: {len(stale)} ({len(stale_fingerprints)} entry lama diganti)")
+    
+    if not topic_qa and not stale:
+        print("\n✅ Tidak ada Q&A baru, dataset sudah up to date")
+        return
+    
     # Convert ke format training
     print(f"\n🔄 Converting ke format training...")
     print(f"   Format: {QA_FORMAT}")
     
     converted_data = []
     skipped = 0
+    duplicates = 0
     
-    for qa_item in all_qa:
-        converted = convert_qa_to_text(qa_item, QA_FORMAT)
-        if converted:
-            converted_data.append(converted)
-        else:
-            skipped += 1
+    # Exact dedup (teks dinormalisasi) terhadap semua run sebelumnya
+    index = ContentHashIndex(INDEX_PATH)
+    index.discard(stale_fingerprints)
+    for name, qa in topic_qa:
+        added = []
+        for qa_item in qa:
+            converted = convert_qa_to_text(qa_item, QA_FORMAT)
+            if not converted:
+                skipped += 1
+                continue
+            fp = fingerprint(converted["text"])
+            if index.add_fingerprint(fp):
+                converted_data.append(converted)
+                added.append(fp)
+            else:
+                duplicates += 1
+        # Fingerprint per file: entry yang diganti saat file ini berubah
+        manifest["files"][name] = {"signature": signatures[name], "fingerprints": added}
     
-    print(f"   ✓ Converted: {len(converted_data)}")
+    print(f"   ✓ Converted (baru): {len(converted_data)}")
     if skipped > 0:
         print(f"   ⚠️  Skipped (invalid): {skipped}")
+    if duplicates > 0:
+        print(f"   ♻️  Duplikat (sudah ada): {duplicates}")
     
-    # Split train/eval
+    # Split train/eval (hanya data baru; data lama tetap di split-nya)
     print(f"\n✂️  Splitting train/eval ({int(TRAIN_SPLIT*100)}/{int((1-TRAIN_SPLIT)*100)})...")
-    train_data, eval_data = split_train_eval(converted_data, TRAIN_SPLIT, SEED)
-    
-    print(f"   ✓ Train: {len(train_data)} samples")
-    print(f"   ✓ Eval: {len(eval_data)} samples")
-    
-    # Save datasets
-    train_path = os.path.join(OUTPUT_DIR, "train_qa.json")
-    eval_path = os.path.join(OUTPUT_DIR, "eval_qa.json")
+    new_train, new_eval = split_train_eval(converted_data, TRAIN_SPLIT, SEED)
     
+    # Output (append O(baru), tulis ulang hanya jika ada entry yang diganti),
+    # index, lalu manifest sebagai commit terakhir
     print(f"\n💾 Saving datasets...")
-    save_dataset(train_data, train_path)
-    save_dataset(eval_data, eval_path)
+    counts = manifest["counts"]
+    for split, path, data in [("train", train_path, new_train), ("eval", eval_path, new_eval)]:
+        if fresh:
+            save_dataset(data, path)
+            counts[split] = len(data)
+        elif stale_fingerprints:
+            counts[split] = rewrite_dataset(data, path, stale_fingerprints)
+        else:
+            append_dataset(data, path)
+            counts[split] += len(data)
+    index.close()
+    manifest["outputs"] = output_signatures(state_paths)
+    save_manifest(manifest)
     
-    print(f"   ✓ Train saved: {train_path}")
-    print(f"   ✓ Eval saved: {eval_path}")
+    print(f"   ✓ Train saved: {train_path} ({counts['train']} samples, +{len(new_train)})")
+    print(f"   ✓ Eval saved: {eval_path} ({counts['eval']} samples, +{len(new_eval)})")
     
     # Summary
     print("\n" + "=" * 60)
@@ -194,16 +373,16 @@ def main():
     print("=" * 60)
     
     print(f"\n📊 Summary:")
-    print(f"   Total Q&A pairs: {len(converted_data)}")
-    print(f"   Training samples: {len(train_data)}")
-    print(f"   Evaluation samples: {len(eval_data)}")
+    print(f"   Total Q&A pairs: {counts['train'] + counts['eval']}")
+    print(f"   Training samples: {counts['train']}")
+    print(f"   Evaluation samples: {counts['eval']}")
     print(f"   Format: {QA_FORMAT}")
     
     # Show sample
-    if train_data:
+    if new_train:
         print(f"\n📝 Sample training data:")
         print("-" * 60)
-        sample_text = train_data[0]["text"]
+        sample_text = new_train[0]["text"]
         # Truncate jika terlalu panjang
         if len(sample_text) > 300:
             sample_text = sample_text[:300] + "..."
@@ -216,4 +395,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(rebuild="--rebuild" in sys.argv)
@@ -0,0 +1,298 @@
+"""
+Vocabulary Pruning untuk Model Hasil Training
+=============================================
+Buang baris embedding (wte) & LM head untuk token yang tidak pernah
+muncul di teks Indonesia kita. Softmax & proyeksi LM head mengecil
+sebanding dengan vocab, jadi latency decode per token di CPU turun,
+tanpa training ulang.
+
+Token yang disimpan:
+    1. Semua token id yang muncul saat corpus referensi di-tokenize
+       (dataset_topics/ dalam semua template Q&A + dataset/train.json)
+    2. Special tokens
+    3. Alphabet byte-level (token dasar) supaya teks apa pun tetap bisa
+       di-encode tanpa <unk>
+    4. Closure merge BPE: token perantara yang dibutuhkan untuk membentuk
+       token di atas, sehingga tokenisasi corpus tidak berubah
+
+Hasilnya model + tokenizer baru (id di-remap) yang bisa langsung dibuka
+dengan test_model.load_model.
+
+Penggunaan:
+    python prune_vocab.py ./tiny-llm-indo-final
+    python prune_vocab.py ./tiny-llm-indo-qa ./tiny-llm-indo-qa-pruned
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+
+import torch
+from tokenizers import Tokenizer
+from transformers import PreTrainedTokenizerFast
+
+from test_model import load_model, QA_TEMPLATES
+from prepare_qa_from_topics import load_all_qa_from_topics, convert_qa_to_text, TEMPLATES
+
+# ============================================================
+# KONFIGURASI
+# ============================================================
+
+CONFIG = {
+    "corpus_files": ["./dataset/train.json", "./dataset/train_qa.json"],
+    "use_topics": True,        # dataset_topics/ (semua template Q&A)
+    "batch_size": 512,
+    "verify_samples": 200,     # Cek tokenisasi & logits sebelum/sesudah
+    "bench_tokens": 32,        # Token decode untuk benchmark latency
+}
+
+# ============================================================
+# CORPUS SCAN
+# ============================================================
+
+def iter_reference_texts():
+    """Teks referensi: corpus JSON + Q&A topik di semua template + prompt test"""
+    for path in CONFIG['corpus_files']:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for item in json.load(f):
+                    if isinstance(item, dict) and item.get("text"):
+                        yield item["text"]
+
+    if CONFIG['use_topics']:
+        for qa_item in load_all_qa_from_topics():
+            # "cot" dipakai otomatis oleh "instruction" jika ada chain of thought
+            for template_key in [k for k in TEMPLATES if k != "cot"]:
+                converted = convert_qa_to_text(qa_item, template_key)
+                if converted:
+                    yield converted["text"]
+
+    # Scaffolding prompt & stop string yang dipakai saat inference
+    for template in QA_TEMPLATES.values():
+        yield template["format"].format(question="")
+        yield template["stop"]
+
+
+def collect_used_ids(tokenizer, texts):
+    """Set token id yang muncul di teks"""
+    used = set()
+    batch = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= CONFIG['batch_size']:
+            for ids in tokenizer(batch, add_special_tokens=False)["input_ids"]:
+                used.update(ids)
+            batch = []
+    if batch:
+        for ids in tokenizer(batch, add_special_tokens=False)["input_ids"]:
+            used.update(ids)
+    return used
+
+
+# ============================================================
+# TOKENIZER PRUNING
+# ============================================================
+
+def _split_merge(merge):
+    return tuple(merge) if isinstance(merge, list) else tuple(merge.split(" ", 1))
+
+
+def prune_tokenizer_json(tokenizer_json, keep_ids):
+    """
+    Pangkas tokenizer.json BPE ke keep_ids (+ alphabet & closure merge)
+
+    Returns:
+        (tokenizer_json baru, old_ids terurut; new id = posisi di list)
+    """
+    model = tokenizer_json["model"]
+    if model.get("type") != "BPE":
+        raise ValueError(f"Hanya tokenizer BPE yang didukung (dapat: {model.get('type')})")
+
+    vocab = model["vocab"]
+    id_to_token = {i: t for t, i in vocab.items()}
+    merges = [_split_merge(m) for m in model["merges"]]
+    merged_tokens = {a + b for a, b in merges}
+
+    keep_tokens = {id_to_token[i] for i in keep_ids if i in id_to_token}
+    # Alphabet: token yang bukan hasil merge (byte-level base)
+    keep_tokens.update(t for t in vocab if t not in merged_tokens)
+    # Closure: parent merge punya rank lebih kecil, jadi cukup satu pass mundur
+    for a, b in reversed(merges):
+        if a + b in keep_tokens:
+            keep_tokens.add(a)
+            keep_tokens.add(b)
+
+    added = tokenizer_json.get("added_tokens", [])
+    old_ids = sorted({vocab[t] for t in keep_tokens} | {tok["id"] for tok in added})
+    remap = {old: new for new, old in enumerate(old_ids)}
+
+    model["vocab"] = {t: remap[i] for t, i in vocab.items() if i in remap}
+    string_merges = bool(model["merges"]) and isinstance(model["merges"][0], str)
+    model["merges"] = [
+        f"{a} {b}" if string_merges else [a, b]
+        for a, b in merges if a + b in keep_tokens
+    ]
+    for tok in added:
+        tok["id"] = remap[tok["id"]]
+    return tokenizer_json, old_ids
+
+
+def build_pruned_tokenizer(tokenizer, keep_ids):
+    """Tokenizer HuggingFace baru + daftar old id"""
+    tokenizer_json = json.loads(tokenizer.backend_tokenizer.to_str())
+    pruned_json, old_ids = prune_tokenizer_json(tokenizer_json, keep_ids)
+    special = {
+        key: getattr(tokenizer, key)
+        for key in ["bos_token", "eos_token", "unk_token", "pad_token"]
+        if getattr(tokenizer, key, None) is not None
+    }
+    new_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=Tokenizer.from_str(json.dumps(pruned_json)),
+        model_max_length=tokenizer.model_max_length,
+        **special,
+    )
+    return new_tokenizer, old_ids
+
+
+# ============================================================
+# MODEL PRUNING
+# ============================================================
+
+def prune_model(model, old_ids):
+    """Slice wte & lm_head ke old_ids, remap special token id di config"""
+    index = torch.tensor(old_ids, dtype=torch.long)
+    remap = {old: new for new, old in enumerate(old_ids)}
+    tied = model.get_output_embeddings().weight is model.get_input_embeddings().weight
+
+    old_wte = model.get_input_embeddings().weight.data
+    new_wte = torch.nn.Embedding(len(old_ids), old_wte.shape[1])
+    new_wte.weight.data = old_wte[index].clone()
+    model.set_input_embeddings(new_wte)
+
+    lm_head = model.get_output_embeddings()
+    if tied:
+        lm_head.weight = new_wte.weight
+    else:
+        lm_head.weight = torch.nn.Parameter(lm_head.weight.data[index].clone())
+    if getattr(lm_head, "bias", None) is not None:
+        lm_head.bias = torch.nn.Parameter(lm_head.bias.data[index].clone())
+    lm_head.out_features = len(old_ids)
+
+    model.config.vocab_size = len(old_ids)
+    for config in [model.config, model.generation_config]:
+        if config is None:
+            continue
+        for key in ["bos_token_id", "eos_token_id", "pad_token_id"]:
+            value = getattr(config, key, None)
+            if isinstance(value, int) and value in remap:
+                setattr(config, key, remap[value])
+    return model
+
+
+# ============================================================
+# VERIFIKASI & BENCHMARK
+# ============================================================
+
+def verify(tokenizer, new_tokenizer, model, new_model, old_ids, texts):
+    """Tokenisasi & logits harus identik (setelah remap)"""
+    remap = {old: new for new, old in enumerate(old_ids)}
+    index = torch.tensor(old_ids, dtype=torch.long)
+    mismatched = 0
+    max_diff = 0.0
+    for text in texts:
+        old = tokenizer(text, add_special_tokens=False)["input_ids"][:128]
+        new = new_tokenizer(text, add_special_tokens=False)["input_ids"][:128]
+        if [remap.get(i) for i in old] != new:
+            mismatched += 1
+            continue
+        if not old:
+            continue
+        with torch.no_grad():
+            old_logits = model(torch.tensor([old])).logits[0][:, index]
+            new_logits = new_model(torch.tensor([new])).logits[0]
+        max_diff = max(max_diff, (old_logits - new_logits).abs().max().item())
+    return mismatched, max_diff
+
+
+def decode_latency(model, prompt_ids, num_tokens):
+    """Detik per token (greedy, KV cache, CPU)"""
+    input_ids = torch.tensor([prompt_ids])
+    with torch.no_grad():
+        model.generate(input_ids, max_new_tokens=4, do_sample=False,
+                       pad_token_id=model.config.eos_token_id)
+        start = time.time()
+        output = model.generate(input_ids, max_new_tokens=num_tokens, min_new_tokens=num_tokens,
+                                do_sample=False, pad_token_id=model.config.eos_token_id)
+    generated = output.shape[1] - input_ids.shape[1]
+    return (time.time() - start) / max(1, generated)
+
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main(model_path="./tiny-llm-indo-final", output_path=None):
+    output_path = output_path or model_path.rstrip("/") + "-pruned"
+
+    print("=" * 60)
+    print("✂️  VOCABULARY PRUNING")
+    print("=" * 60)
+
+    model, tokenizer, _ = load_model(model_path)
+    if hasattr(model, "merge_and_unload"):
+        print("🔗 Merging LoRA adapter...")
+        model = model.merge_and_unload()
+    model = model.to("cpu").eval()
+
+    print("\n🔍 Scanning reference corpus...")
+    texts = list(iter_reference_texts())
+    used = collect_used_ids(tokenizer, texts)
+    used.update(tokenizer.all_special_ids)
+    used.update(
+        i for i in [model.config.bos_token_id, model.config.eos_token_id, model.config.pad_token_id]
+        if isinstance(i, int) and i < len(tokenizer)
+    )
+    print(f"   {len(texts):,} texts, {len(used):,} distinct token ids")
+
+    new_tokenizer, old_ids = build_pruned_tokenizer(tokenizer, used)
+    old_vocab = model.get_input_embeddings().weight.shape[0]
+    old_params = sum(p.numel() for p in model.parameters())
+
+    new_model = prune_model(copy.deepcopy(model), old_ids)
+    new_params = sum(p.numel() for p in new_model.parameters())
+
+    print(f"\n📉 Vocab: {old_vocab:,} -> {len(old_ids):,} "
+          f"({100 * len(old_ids) / old_vocab:.1f}%)")
+    print(f"   Parameters: {old_params:,} -> {new_params:,}")
+
+    print("\n🧪 Verifying tokenization & logits...")
+    step = max(1, len(texts) // CONFIG['verify_samples'])
+    mismatched, max_diff = verify(tokenizer, new_tokenizer, model, new_model,
+                                  old_ids, texts[::step][:CONFIG['verify_samples']])
+    print(f"   Tokenization mismatches: {mismatched}")
+    print(f"   Max |logit diff|: {max_diff:.2e}")
+
+    prompt = QA_TEMPLATES["instruction"]["format"].format(question="Apa ibu kota Indonesia?")
+    old_latency = decode_latency(model, tokenizer(prompt)["input_ids"], CONFIG['bench_tokens'])
+    new_latency = decode_latency(new_model, new_tokenizer(prompt)["input_ids"], CONFIG['bench_tokens'])
+    print(f"\n⏱  Decode latency (CPU): {old_latency*1000:.2f} ms/token -> "
+          f"{new_latency*1000:.2f} ms/token ({old_latency / new_latency:.2f}x)")
+
+    os.makedirs(output_path, exist_ok=True)
+    new_model.save_pretrained(output_path)
+    new_tokenizer.save_pretrained(output_path)
+    with open(os.path.join(output_path, "vocab_pruning.json"), 'w') as f:
+        json.dump({"source_model": model_path, "old_vocab_size": old_vocab,
+                   "old_ids": old_ids}, f)
+
+    print(f"\n💾 Saved: {output_path}")
+    print(f"   python test_model.py {output_path} --qa")
+    return new_model, new_tokenizer
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "./tiny-llm-indo-final"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else None
+    main(model_path, output_path)
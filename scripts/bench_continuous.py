@@ -0,0 +1,127 @@
+"""Tail-latency benchmark: dynamic batching vs continuous batching under mixed-length load.
+
+Starts inference_server.py in-process once per scheduler and simulates N
+concurrent users. Every request samples (no beam search); a fraction of
+them asks for a long answer (--long-tokens) and the rest for a short one
+(--short-tokens). With dynamic batching a short request that lands in a
+batch with a long one waits for the whole batch; continuous batching
+retires it as soon as its own tokens are done. Reports p50/p95 latency per
+request class and requests/sec.
+
+    python scripts/bench_continuous.py ./tiny-llm-indo-qa
+    python scripts/bench_continuous.py ./masa-ai-qwen-merged --qwen --users 16 --long-every 3
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bench_server import QUESTIONS, _post  # noqa: E402
+
+OUTPUT_PATH = ROOT / "logs" / "continuous_bench.json"
+
+
+def _percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+async def _user(port: int, user_id: int, args: argparse.Namespace, params: dict, latencies: dict) -> None:
+    for i in range(args.requests_per_user):
+        n = user_id + i
+        kind = "long" if n % args.long_every == 0 else "short"
+        payload = {
+            "question": QUESTIONS[n % len(QUESTIONS)],
+            "max_new_tokens": args.long_tokens if kind == "long" else args.short_tokens,
+            **params,
+        }
+        start = time.perf_counter()
+        await _post(port, "/ask", payload)
+        latencies[kind].append(time.perf_counter() - start)
+
+
+async def _bench(backend, scheduler: str, args: argparse.Namespace, params: dict) -> dict:
+    from inference_server import InferenceServer
+
+    config = {"scheduler": scheduler, "port": 0, "max_batch_size": args.max_batch,
+              "max_wait_ms": args.max_wait_ms, "max_queue": 4096}
+    server = InferenceServer(backend, config)
+    ready = asyncio.Event()
+    task = asyncio.create_task(server.serve(ready))
+    await ready.wait()
+
+    await _post(server.config["port"], "/ask", {"question": QUESTIONS[0], "max_new_tokens": 4, **params})  # Warmup
+    latencies: dict[str, list[float]] = {"short": [], "long": []}
+    start = time.perf_counter()
+    await asyncio.gather(*(_user(server.config["port"], u, args, params, latencies) for u in range(args.users)))
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    result = {"scheduler": scheduler, "users": args.users, "elapsed_sec": elapsed,
+              "requests_per_sec": sum(len(v) for v in latencies.values()) / elapsed}
+    for kind, values in latencies.items():
+        if values:
+            result[f"{kind}_requests"] = len(values)
+            result[f"{kind}_p50_ms"] = statistics.median(values) * 1000
+            result[f"{kind}_p95_ms"] = _percentile(values, 0.95) * 1000
+    every = latencies["short"] + latencies["long"]
+    result["all_p95_ms"] = _percentile(every, 0.95) * 1000
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("--qwen", action="store_true")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--requests-per-user", type=int, default=4)
+    parser.add_argument("--short-tokens", type=int, default=8)
+    parser.add_argument("--long-tokens", type=int, default=128)
+    parser.add_argument("--long-every", type=int, default=4, help="Setiap request ke-N minta jawaban panjang")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument("--params", default="{}", help="JSON parameter generate per request")
+    args = parser.parse_args()
+
+    from inference_server import BACKENDS
+
+    backend = BACKENDS["qwen" if args.qwen else "gpt2"](args.model_path)
+    params = json.loads(args.params)
+    if not args.qwen:
+        params.setdefault("use_beam_search", False)  # Beam search tidak lewat continuous batching
+
+    results = []
+    for scheduler in ("dynamic", "continuous"):
+        print(f"\n▶ {scheduler}...")
+        results.append(asyncio.run(_bench(backend, scheduler, args, params)))
+
+    print("\n" + "=" * 76)
+    print(f"{'Scheduler':<11} {'Req/sec':>8} {'short p50':>10} {'short p95':>10} "
+          f"{'long p50':>9} {'long p95':>9} {'all p95':>8}")
+    print("-" * 76)
+    for r in results:
+        print(f"{r['scheduler']:<11} {r['requests_per_sec']:>8.2f} {r.get('short_p50_ms', 0):>10.0f} "
+              f"{r.get('short_p95_ms', 0):>10.0f} {r.get('long_p50_ms', 0):>9.0f} "
+              f"{r.get('long_p95_ms', 0):>9.0f} {r['all_p95_ms']:>8.0f}")
+    print("=" * 76)
+
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT_PATH.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"💾 {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
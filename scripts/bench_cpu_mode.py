@@ -0,0 +1,151 @@
+"""Before/after benchmark of the CPU performance mode on the 13M config.
+
+Each mode runs in its own process (thread settings and compiled graphs are
+process-global) and measures optimizer steps/sec for forward + backward +
+AdamW on a fixed random batch:
+
+    baseline   fp32, default threads, eager
+    threads    + intra/inter-op thread tuning and contiguity fixes
+    bf16       + bf16 autocast (skipped on CPUs without native bf16)
+    compile    + torch.compile of the GPT-2 blocks (= full CPU perf mode)
+
+    python scripts/bench_cpu_mode.py
+    python scripts/bench_cpu_mode.py --steps 5 --batch-size 4 --seq-len 256
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+OUTPUT_PATH = ROOT / "logs" / "cpu_mode_bench.json"
+
+MODES = {
+    "baseline": {"threads": False, "bf16": False, "compile": False},
+    "threads": {"threads": True, "bf16": False, "compile": False},
+    "bf16": {"threads": True, "bf16": True, "compile": False},
+    "compile": {"threads": True, "bf16": True, "compile": True},
+}
+
+
+def _worker(args: argparse.Namespace) -> None:
+    import torch
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    import cpu_perf
+    from model_config import MODEL_CONFIG
+
+    mode = MODES[args.mode]
+    torch.manual_seed(0)
+    model = GPT2LMHeadModel(GPT2Config(**{**MODEL_CONFIG, "vocab_size": args.vocab_size}))
+    model.train()
+
+    if mode["threads"]:
+        cpu_perf.configure_threads()
+        cpu_perf.make_contiguous(model)
+    bf16 = mode["bf16"] and cpu_perf.cpu_supports_bf16()
+    compiled = cpu_perf.compile_gpt2_blocks(model) if mode["compile"] else 0
+
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    input_ids = torch.randint(0, args.vocab_size, (args.batch_size, args.seq_len))
+    autocast = (
+        torch.autocast("cpu", dtype=torch.bfloat16) if bf16 else contextlib.nullcontext()
+    )
+
+    def step() -> None:
+        with autocast:
+            loss = model(input_ids=input_ids, labels=input_ids).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad(set_to_none=True)
+
+    for _ in range(args.warmup):
+        step()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "mode": args.mode,
+        "bf16": bf16,
+        "compiled_blocks": compiled,
+        "threads": torch.get_num_threads(),
+        "interop_threads": torch.get_num_interop_threads(),
+        "steps_per_sec": args.steps / elapsed,
+        "tokens_per_sec": args.steps * args.batch_size * args.seq_len / elapsed,
+    }
+    Path(args.out).write_text(json.dumps(result), encoding="utf-8")
+
+
+def _run_mode(mode: str, args: argparse.Namespace) -> dict | None:
+    out = ROOT / "logs" / f".bench_cpu_{mode}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()), "--worker", "--mode", mode,
+        "--out", str(out), "--steps", str(args.steps), "--warmup", str(args.warmup),
+        "--batch-size", str(args.batch_size), "--seq-len", str(args.seq_len),
+        "--vocab-size", str(args.vocab_size),
+    ]
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES="")
+    completed = subprocess.run(cmd, cwd=ROOT, env=env)
+    if completed.returncode != 0 or not out.exists():
+        print(f"⚠️  Mode {mode} gagal (exit {completed.returncode})")
+        return None
+    result = json.loads(out.read_text(encoding="utf-8"))
+    out.unlink()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=3, help="Termasuk kompilasi")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seq-len", type=int, default=512)
+    parser.add_argument("--vocab-size", type=int, default=32000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    results = []
+    for mode in args.modes:
+        print(f"\n▶ {mode}...")
+        result = _run_mode(mode, args)
+        if result:
+            results.append(result)
+    if not results:
+        return
+
+    base = results[0]["steps_per_sec"]
+    print("\n" + "=" * 70)
+    print(f"{'Mode':<10} {'bf16':>5} {'Compiled':>9} {'Threads':>8} "
+          f"{'Steps/sec':>10} {'Tokens/sec':>11} {'Speedup':>8}")
+    print("-" * 70)
+    for r in results:
+        r["speedup"] = r["steps_per_sec"] / base
+        print(f"{r['mode']:<10} {str(r['bf16']):>5} {r['compiled_blocks']:>9} "
+              f"{r['threads']:>4}/{r['interop_threads']:<3} {r['steps_per_sec']:>10.3f} "
+              f"{r['tokens_per_sec']:>11,.0f} {r['speedup']:>7.2f}x")
+    print("=" * 70)
+
+    OUTPUT_PATH.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"💾 {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Benchmark CPU data-parallel scaling (torchrun + gloo) on the 13M config.
+
+Runs the same training step (forward + backward + all-reduce + AdamW) with
+1, 2, 4 and 8 processes and reports global tokens/sec. Per-rank batch is
+fixed (weak scaling), threads per rank = cores / processes.
+
+    python scripts/bench_ddp_scaling.py
+    python scripts/bench_ddp_scaling.py --procs 1 2 4 --steps 10 --batch-size 4
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+OUTPUT_PATH = ROOT / "logs" / "ddp_scaling.json"
+
+
+def _worker(args: argparse.Namespace) -> None:
+    import torch
+    import torch.distributed as dist
+    from torch.nn.parallel import DistributedDataParallel
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    from distributed import configure_cpu_threads, get_dist_info
+    from model_config import MODEL_CONFIG
+
+    rank, _, world_size, _ = get_dist_info()
+    dist.init_process_group("gloo")
+    threads = configure_cpu_threads()
+
+    torch.manual_seed(0)
+    model = GPT2LMHeadModel(GPT2Config(**{**MODEL_CONFIG, "vocab_size": args.vocab_size}))
+    model.train()
+    model = DistributedDataParallel(model)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+
+    generator = torch.Generator().manual_seed(rank)
+    input_ids = torch.randint(0, args.vocab_size, (args.batch_size, args.seq_len), generator=generator)
+
+    def step() -> None:
+        loss = model(input_ids=input_ids, labels=input_ids).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad(set_to_none=True)
+
+    for _ in range(args.warmup):
+        step()
+    dist.barrier()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    elapsed = torch.tensor(time.perf_counter() - start)
+    # Rank paling lambat menentukan waktu step
+    dist.all_reduce(elapsed, op=dist.ReduceOp.MAX)
+
+    if rank == 0:
+        tokens = world_size * args.steps * args.batch_size * args.seq_len
+        result = {
+            "procs": world_size,
+            "threads_per_proc": threads,
+            "steps": args.steps,
+            "elapsed_sec": elapsed.item(),
+            "tokens_per_sec": tokens / elapsed.item(),
+            "num_params": sum(p.numel() for p in model.parameters()),
+        }
+        Path(args.out).write_text(json.dumps(result), encoding="utf-8")
+    dist.destroy_process_group()
+
+
+def _launch(procs: int, args: argparse.Namespace) -> dict | None:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "result.json")
+        cmd = [
+            sys.executable, "-m", "torch.distributed.run",
+            "--standalone", "--nproc_per_node", str(procs),
+            str(Path(__file__).resolve()), "--worker", "--out", out,
+            "--steps", str(args.steps), "--warmup", str(args.warmup),
+            "--batch-size", str(args.batch_size), "--seq-len", str(args.seq_len),
+            "--vocab-size", str(args.vocab_size),
+        ]
+        env = {k: v for k, v in os.environ.items() if k != "CUDA_VISIBLE_DEVICES"}
+        env["CUDA_VISIBLE_DEVICES"] = ""  # Paksa CPU
+        completed = subprocess.run(cmd, cwd=ROOT, env=env)
+        if completed.returncode != 0 or not os.path.exists(out):
+            print(f"⚠️  {procs} proses gagal (exit {completed.returncode})")
+            return None
+        return json.loads(Path(out).read_text(encoding="utf-8"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=8, help="Per proses")
+    parser.add_argument("--seq-len", type=int, default=512)
+    parser.add_argument("--vocab-size", type=int, default=32000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    print(f"🖧  DDP scaling benchmark: {os.cpu_count()} cores, "
+          f"batch {args.batch_size} x {args.seq_len} per proses")
+    results = []
+    for procs in args.procs:
+        print(f"\n▶ {procs} proses...")
+        result = _launch(procs, args)
+        if result:
+            results.append(result)
+
+    if not results:
+        return
+    base = results[0]["tokens_per_sec"] / results[0]["procs"]
+    print("\n" + "=" * 60)
+    print(f"{'Procs':>6} {'Threads':>8} {'Tokens/sec':>12} {'Speedup':>8} {'Efficiency':>11}")
+    print("-" * 60)
+    for r in results:
+        speedup = r["tokens_per_sec"] / base
+        r["speedup"] = speedup
+        r["efficiency"] = speedup / r["procs"]
+        print(f"{r['procs']:>6} {r['threads_per_proc']:>8} {r['tokens_per_sec']:>12,.0f} "
+              f"{speedup:>7.2f}x {r['efficiency']*100:>10.0f}%")
+    print("=" * 60)
+
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT_PATH.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"💾 {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
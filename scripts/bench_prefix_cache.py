@@ -0,0 +1,88 @@
+"""Prefix KV-cache benchmark: ask_question latency with and without prefix_cache.py.
+
+Runs the same questions through test_model.ask_questions (GPT-2 template)
+or test_model_qwen.ask_questions (system prompt + chat template), one
+question per call, with PREFIX_CACHE off and on. --max-new-tokens defaults
+to 1 so the timing is dominated by prefill (time to first token); raise it
+to see the end-to-end effect.
+
+    python scripts/bench_prefix_cache.py ./tiny-llm-indo-qa
+    python scripts/bench_prefix_cache.py ./masa-ai-qwen-merged --qwen --max-new-tokens 32
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import torch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bench_server import QUESTIONS  # noqa: E402
+
+OUTPUT_PATH = ROOT / "logs" / "prefix_cache_bench.json"
+
+
+def _run(module, model, tokenizer, device, args: argparse.Namespace, kwargs: dict) -> list[float]:
+    latencies = []
+    for i in range(args.repeats * len(QUESTIONS)):
+        question = QUESTIONS[i % len(QUESTIONS)]
+        start = time.perf_counter()
+        module.ask_questions(model, tokenizer, [question], device, max_new_tokens=args.max_new_tokens, **kwargs)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("--qwen", action="store_true")
+    parser.add_argument("--max-new-tokens", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--beam-search", action="store_true", help="GPT-2: beam search (default sampling)")
+    args = parser.parse_args()
+
+    if args.qwen:
+        import test_model_qwen as module
+        kwargs = {"temperature": 0.0}
+    else:
+        import test_model as module
+        kwargs = {"use_beam_search": args.beam_search}
+    model, tokenizer, device = module.load_model(args.model_path)
+
+    results = []
+    for enabled in (False, True):
+        module.PREFIX_CACHE = enabled
+        torch.manual_seed(0)
+        _run(module, model, tokenizer, device, argparse.Namespace(repeats=1, max_new_tokens=1), kwargs)  # Warmup
+        latencies = _run(module, model, tokenizer, device, args, kwargs)
+        results.append({
+            "prefix_cache": enabled,
+            "max_new_tokens": args.max_new_tokens,
+            "calls": len(latencies),
+            "mean_ms": statistics.mean(latencies) * 1000,
+            "p50_ms": statistics.median(latencies) * 1000,
+        })
+        print(f"   prefix_cache={enabled!s:<5}: mean {results[-1]['mean_ms']:.1f} ms, "
+              f"p50 {results[-1]['p50_ms']:.1f} ms")
+
+    from prefix_cache import get_prefix_cache
+
+    cache = get_prefix_cache(model)
+    prefix_tokens = [len(key) for key in cache.entries]
+    speedup = results[0]["mean_ms"] / results[1]["mean_ms"]
+    print(f"\n⚡ Speedup {speedup:.2f}x (prefix {prefix_tokens} token, {cache.stats['hits']} hit)")
+
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT_PATH.write_text(json.dumps({"results": results, "speedup": speedup, "prefix_tokens": prefix_tokens,
+                                       "cache_stats": cache.stats}, indent=2), encoding="utf-8")
+    print(f"💾 {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
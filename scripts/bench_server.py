@@ -0,0 +1,152 @@
+"""Concurrency benchmark for inference_server.py (dynamic batching vs batch size 1).
+
+Starts the server in-process, then simulates N concurrent users that each
+send a few /ask requests back to back, and reports requests/sec and latency
+percentiles per concurrency level. The "no batching" baseline runs the same
+server with max_batch_size=1, i.e. one model.generate per request.
+
+    python scripts/bench_server.py ./tiny-llm-indo-qa
+    python scripts/bench_server.py ./masa-ai-qwen-merged --qwen --users 1 8 32
+    python scripts/bench_server.py ./tiny-llm-indo-qa --params '{"use_beam_search": false}'
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+OUTPUT_PATH = ROOT / "logs" / "server_bench.json"
+
+QUESTIONS = [
+    "Apa itu komputer?",
+    "Di mana Jakarta berada?",
+    "Siapa presiden pertama Indonesia?",
+    "Apa manfaat olahraga?",
+    "Mengapa langit berwarna biru?",
+    "Bagaimana cara membuat nasi goreng?",
+    "Apa itu kecerdasan buatan?",
+    "Halo!",
+]
+
+
+async def _post(port: int, path: str, payload: dict) -> dict:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if status != 200:
+        raise RuntimeError(f"HTTP {status}: {data[:200]!r}")
+    return json.loads(data)
+
+
+async def _user(port: int, user_id: int, requests: int, params: dict, latencies: list) -> None:
+    for i in range(requests):
+        question = QUESTIONS[(user_id + i) % len(QUESTIONS)]
+        start = time.perf_counter()
+        await _post(port, "/ask", {"question": question, **params})
+        latencies.append(time.perf_counter() - start)
+
+
+async def _run_level(server, users: int, requests: int, params: dict) -> dict:
+    port = server.config["port"]
+    latencies: list[float] = []
+    before = dict(server.batcher.stats)
+    start = time.perf_counter()
+    await asyncio.gather(*(_user(port, u, requests, params, latencies) for u in range(users)))
+    elapsed = time.perf_counter() - start
+    stats = server.batcher.stats
+    batches = stats["batches"] - before["batches"]
+    latencies.sort()
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "elapsed_sec": elapsed,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)] * 1000,
+        "avg_batch_size": (stats["requests"] - before["requests"]) / max(1, batches),
+    }
+
+
+async def _bench(backend, mode: str, args: argparse.Namespace, params: dict) -> list[dict]:
+    from inference_server import InferenceServer
+
+    config = {"scheduler": "dynamic", "port": 0, "max_wait_ms": args.max_wait_ms, "max_queue": 4096,
+              "max_batch_size": 1 if mode == "no_batching" else args.max_batch}
+    server = InferenceServer(backend, config)
+    ready = asyncio.Event()
+    task = asyncio.create_task(server.serve(ready))
+    await ready.wait()
+
+    await _run_level(server, 1, 1, params)  # Warmup
+    results = []
+    for users in args.users:
+        result = await _run_level(server, users, args.requests_per_user, params)
+        result["mode"] = mode
+        results.append(result)
+        print(f"   {mode:<12} {users:>3} users: {result['requests_per_sec']:.2f} req/s, "
+              f"p50 {result['p50_ms']:.0f} ms, batch {result['avg_batch_size']:.1f}")
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("--qwen", action="store_true")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--requests-per-user", type=int, default=3)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument("--params", default="{}", help="JSON parameter generate per request")
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    from inference_server import BACKENDS
+
+    backend = BACKENDS["qwen" if args.qwen else "gpt2"](args.model_path)
+    params = json.loads(args.params)
+
+    results = []
+    modes = ["batching"] if args.skip_baseline else ["no_batching", "batching"]
+    for mode in modes:
+        print(f"\n▶ {mode}...")
+        results += asyncio.run(_bench(backend, mode, args, params))
+
+    single = {r["mode"]: r for r in results if r["users"] == 1}
+    print("\n" + "=" * 72)
+    print(f"{'Mode':<12} {'Users':>6} {'Req/sec':>9} {'Scaling':>8} {'p50 ms':>8} {'p95 ms':>8} {'Batch':>6}")
+    print("-" * 72)
+    for r in results:
+        base = single.get(r["mode"], r)["requests_per_sec"]
+        r["scaling"] = r["requests_per_sec"] / base
+        print(f"{r['mode']:<12} {r['users']:>6} {r['requests_per_sec']:>9.2f} {r['scaling']:>7.1f}x "
+              f"{r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['avg_batch_size']:>6.1f}")
+    print("=" * 72)
+
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT_PATH.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"💾 {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Early-termination benchmark: tokens generated per answer with and without stopping_criteria.py.
+
+Runs test_model.ask_questions over a fixed question set with
+STOPPING_CRITERIA off and on (same seed per question). A forward hook counts decoding
+steps (one token per sequence per step, prefill included). Also reports
+wall time and how many final answers (after clean_answer) are identical.
+
+    python scripts/bench_stopping.py ./tiny-llm-indo-qa
+    python scripts/bench_stopping.py ./tiny-llm-indo-qa --beam-search
+    python scripts/bench_stopping.py ./tiny-llm-indo-qa --temperature 0.7 --repeats 3
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import torch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+OUTPUT_PATH = ROOT / "logs" / "stopping_bench.json"
+
+QUESTIONS = [
+    "Apa itu komputer?",
+    "Di mana Jakarta berada?",
+    "Siapa presiden pertama Indonesia?",
+    "Apa manfaat olahraga?",
+    "Mengapa langit berwarna biru?",
+    "Bagaimana cara membuat nasi goreng?",
+    "Apa itu kecerdasan buatan?",
+    "Jelaskan tentang Indonesia!",
+    "Apa itu fotosintesis?",
+    "Mengapa pendidikan penting?",
+]
+
+
+def _run(test_model, model, tokenizer, device, args: argparse.Namespace) -> dict:
+    steps = []
+    counter = {"calls": 0}
+    base_model = model.get_base_model() if hasattr(model, "get_base_model") else model  # PEFT
+    hook = base_model.register_forward_hook(lambda module, inputs, output: counter.update(calls=counter["calls"] + 1))
+    answers, latencies = [], []
+    try:
+        for repeat in range(args.repeats):
+            for i, question in enumerate(QUESTIONS):
+                # Seed per pertanyaan: berhenti lebih awal tidak menggeser RNG pertanyaan berikutnya
+                torch.manual_seed(args.seed + repeat * len(QUESTIONS) + i)
+                counter["calls"] = 0
+                start = time.perf_counter()
+                answers += test_model.ask_questions(
+                    model, tokenizer, [question], device,
+                    qa_format=args.qa_format,
+                    temperature=args.temperature,
+                    use_beam_search=args.beam_search,
+                    max_new_tokens=args.max_new_tokens,
+                )
+                latencies.append(time.perf_counter() - start)
+                steps.append(counter["calls"])
+    finally:
+        hook.remove()
+    return {
+        "answers": answers,
+        "avg_tokens": statistics.mean(steps),
+        "max_tokens": max(steps),
+        "avg_latency_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("--qa-format", default="instruction")
+    parser.add_argument("--temperature", type=float, default=0.2)
+    parser.add_argument("--beam-search", action="store_true")
+    parser.add_argument("--max-new-tokens", type=int, default=60)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import test_model
+
+    model, tokenizer, device = test_model.load_model(args.model_path)
+    test_model.ask_questions(model, tokenizer, [QUESTIONS[0]], device, max_new_tokens=2)  # Warmup + prefix cache
+
+    results = {}
+    for enabled in (False, True):
+        test_model.STOPPING_CRITERIA = enabled
+        results[enabled] = _run(test_model, model, tokenizer, device, args)
+        r = results[enabled]
+        print(f"   stopping_criteria={enabled!s:<5}: {r['avg_tokens']:.1f} token/jawaban "
+              f"(max {r['max_tokens']}), {r['avg_latency_ms']:.0f} ms")
+
+    before, after = results[False], results[True]
+    same = sum(a == b for a, b in zip(before["answers"], after["answers"]))
+    summary = {
+        "mode": "beam_search" if args.beam_search else f"sampling t={args.temperature}",
+        "max_new_tokens": args.max_new_tokens,
+        "questions": len(before["answers"]),
+        "avg_tokens_before": before["avg_tokens"],
+        "avg_tokens_after": after["avg_tokens"],
+        "token_reduction": 1 - after["avg_tokens"] / before["avg_tokens"],
+        "avg_latency_ms_before": before["avg_latency_ms"],
+        "avg_latency_ms_after": after["avg_latency_ms"],
+        "identical_answers": same,
+    }
+    print(f"\n✂️  Token: {summary['avg_tokens_before']:.1f} -> {summary['avg_tokens_after']:.1f} "
+          f"(-{summary['token_reduction']:.0%}), jawaban identik {same}/{summary['questions']}")
+
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT_PATH.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(f"💾 {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Correctness check for chunked_loss.py (exits non-zero on failure).
+
+- training: loss and gradients match full-logits cross-entropy
+- eval (torch.no_grad, parameters still requires_grad): no gradient
+  buffers are allocated, i.e. no [V, H] grad_weight and no [N, H]
+  grad_hidden, and nothing is saved for backward
+
+    python scripts/check_chunked_loss.py
+    python scripts/check_chunked_loss.py --vocab-size 20000 --hidden 256
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import torch
+from torch.overrides import TorchFunctionMode
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from chunked_loss import chunked_cross_entropy  # noqa: E402
+
+
+class _ShapeRecorder(TorchFunctionMode):
+    """Records the shapes of every new tensor created while active."""
+
+    def __init__(self, existing: list[torch.Tensor]) -> None:
+        super().__init__()
+        self.existing = {t.data_ptr() for t in existing}
+        self.shapes: list[tuple[int, ...]] = []
+
+    def __torch_function__(self, func, types, args=(), kwargs=None):
+        out = func(*args, **(kwargs or {}))
+        if isinstance(out, torch.Tensor) and out.data_ptr() not in self.existing:
+            self.shapes.append(tuple(out.shape))
+        return out
+
+
+def _inputs(args: argparse.Namespace) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    torch.manual_seed(0)
+    hidden = torch.randn(args.positions, args.hidden, requires_grad=True)
+    weight = torch.nn.Parameter(torch.randn(args.vocab_size, args.hidden) * 0.05)
+    labels = torch.randint(0, args.vocab_size, (args.positions,))
+    labels[::7] = -100
+    return hidden, weight, labels
+
+
+def check_training(args: argparse.Namespace) -> None:
+    hidden, weight, labels = _inputs(args)
+    loss = chunked_cross_entropy(hidden, weight, labels, chunk_size=args.chunk_size)
+    loss.backward()
+    grads = hidden.grad.clone(), weight.grad.clone()
+
+    hidden.grad = weight.grad = None
+    reference = torch.nn.functional.cross_entropy(hidden @ weight.t(), labels, ignore_index=-100)
+    reference.backward()
+
+    torch.testing.assert_close(loss, reference, rtol=1e-5, atol=1e-5)
+    torch.testing.assert_close(grads[0], hidden.grad, rtol=1e-4, atol=1e-6)
+    torch.testing.assert_close(grads[1], weight.grad, rtol=1e-4, atol=1e-6)
+    print("✅ training: loss & gradients sama dengan full-logits CE")
+
+
+def check_eval(args: argparse.Namespace) -> None:
+    hidden, weight, labels = _inputs(args)
+    recorder = _ShapeRecorder([hidden, weight])
+    start = time.perf_counter()
+    with torch.no_grad(), recorder:
+        loss = chunked_cross_entropy(hidden, weight, labels, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    grad_shapes = {tuple(weight.shape), tuple(hidden.shape)}
+    allocated = [shape for shape in recorder.shapes if shape in grad_shapes]
+    if allocated or loss.grad_fn is not None:
+        sys.exit(f"❌ eval: buffer gradient dialokasikan di no_grad: {allocated}")
+    print(f"✅ eval: tanpa grad_weight / grad_hidden ({elapsed*1000:.0f} ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--positions", type=int, default=512)
+    parser.add_argument("--hidden", type=int, default=64)
+    parser.add_argument("--vocab-size", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=32)
+    args = parser.parse_args()
+    if args.chunk_size >= args.hidden:
+        # logits per chunk [chunk, V] tidak boleh sebesar grad_weight [V, H]
+        parser.error("--chunk-size harus < --hidden")
+
+    check_training(args)
+    check_eval(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Stopping Criteria (early termination)
+=====================================
+Post-processing Q&A (test_model.clean_answer, compare_temperatures)
+membuang semua teks setelah stop marker "\\n### Instruksi:" atau setelah
+kalimat lengkap kedua, tapi model.generate tetap jalan sampai
+max_new_tokens (60-120 token). StoppingCriteria di sini menghentikan
+setiap sequence begitu jawabannya final:
+
+    StopStringsCriteria        stop marker muncul di teks jawaban
+    SentenceCountCriteria      N kalimat lengkap (filter kalimat sama
+                               dengan clean_answer); hanya saat kurung
+                               seimbang, jadi hasil clean_answer tidak
+                               berubah
+    UnbalancedBracketCriteria  kurung terbuka terlalu lama (> max_open_chars);
+                               ekor ini dibuang clean_answer
+
+Semua per sequence (BoolTensor [batch]): di batch generate baris yang
+selesai berhenti sendiri, di beam search kandidat yang kena dianggap
+hipotesis selesai.
+
+Penggunaan:
+    from stopping_criteria import answer_stopping_criteria
+
+    criteria = answer_stopping_criteria(tokenizer, prompt_length, ["\\n### Instruksi:"], max_sentences=2)
+    model.generate(**inputs, stopping_criteria=criteria, ...)
+
+Benchmark token: python scripts/bench_stopping.py ./tiny-llm-indo-qa
+"""
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+SENTENCE_ENDINGS = ".!?"
+BRACKETS = [("(", ")"), ("[", "]"), ("{", "}")]
+MAX_OPEN_CHARS = 80
+
+
+def open_bracket(text):
+    """Posisi kurung terbuka terakhir yang belum ditutup (logika clean_answer), -1 jika seimbang"""
+    position = -1
+    for open_ch, close_ch in BRACKETS:
+        if text.count(open_ch) > text.count(close_ch):
+            position = max(position, text.rfind(open_ch))
+    return position
+
+
+class GeneratedTextCriteria(StoppingCriteria):
+    """Basis: decode bagian jawaban (setelah prompt_length) per baris"""
+
+    def __init__(self, tokenizer, prompt_length):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self._cache_key = None
+        self._cache_texts = None
+
+    def generated_texts(self, input_ids):
+        # Beberapa criteria di satu StoppingCriteriaList -> decode sekali per step
+        key = (input_ids.data_ptr(), tuple(input_ids.shape))
+        if key != self._cache_key:
+            self._cache_key = key
+            self._cache_texts = self.tokenizer.batch_decode(
+                input_ids[:, self.prompt_length:], skip_special_tokens=True
+            )
+        return self._cache_texts
+
+    def is_done(self, text):
+        raise NotImplementedError
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.tensor(
+            [self.is_done(text) for text in self.generated_texts(input_ids)],
+            dtype=torch.bool, device=input_ids.device,
+        )
+
+
+class StopStringsCriteria(GeneratedTextCriteria):
+    """Berhenti saat salah satu stop string muncul di jawaban"""
+
+    def __init__(self, tokenizer, prompt_length, stop_strings):
+        super().__init__(tokenizer, prompt_length)
+        self.stop_strings = [s for s in stop_strings if s]
+
+    def is_done(self, text):
+        return any(stop in text for stop in self.stop_strings)
+
+
+class SentenceCountCriteria(GeneratedTextCriteria):
+    """
+    Berhenti setelah max_sentences kalimat lengkap
+
+    Args:
+        sentence_filter: Callable(kalimat) -> bool, kalimat yang dihitung
+        require_balanced: Hanya berhenti jika tidak ada kurung terbuka
+            (clean_answer memotong kurung terbuka sebelum menghitung kalimat)
+    """
+
+    def __init__(self, tokenizer, prompt_length, max_sentences=2, sentence_filter=None,
+                 stop_strings=(), require_balanced=True):
+        super().__init__(tokenizer, prompt_length)
+        self.max_sentences = max_sentences
+        self.sentence_filter = sentence_filter
+        self.stop_strings = [s for s in stop_strings if s]
+        self.require_balanced = require_balanced
+
+    def is_done(self, text):
+        for stop in self.stop_strings:
+            text = text.split(stop)[0]
+        text = text.strip()
+        count = 0
+        current = ""
+        for i, char in enumerate(text):
+            current += char
+            if char not in SENTENCE_ENDINGS:
+                continue
+            sentence = current.strip()
+            current = ""
+            if self.sentence_filter is None or self.sentence_filter(sentence):
+                count += 1
+                if count >= self.max_sentences:
+                    return not self.require_balanced or open_bracket(text[:i + 1]) == -1
+        return False
+
+
+class UnbalancedBracketCriteria(GeneratedTextCriteria):
+    """Berhenti jika kurung terbuka tidak ditutup dalam max_open_chars karakter"""
+
+    def __init__(self, tokenizer, prompt_length, max_open_chars=MAX_OPEN_CHARS):
+        super().__init__(tokenizer, prompt_length)
+        self.max_open_chars = max_open_chars
+
+    def is_done(self, text):
+        position = open_bracket(text)
+        return position != -1 and len(text) - position > self.max_open_chars
+
+
+def answer_stopping_criteria(tokenizer, prompt_length, stop_strings=(), max_sentences=None,
+                             sentence_filter=None, max_open_chars=MAX_OPEN_CHARS, require_balanced=True):
+    """
+    StoppingCriteriaList sesuai aturan post-processing jawaban
+
+    Args:
+        prompt_length: Panjang input_ids prompt (termasuk padding)
+        max_sentences: None = tanpa batas kalimat
+        max_open_chars: None = tanpa cutoff kurung
+    """
+    criteria = []
+    shared = None
+    if stop_strings:
+        criteria.append(StopStringsCriteria(tokenizer, prompt_length, stop_strings))
+    if max_sentences:
+        criteria.append(SentenceCountCriteria(
+            tokenizer, prompt_length, max_sentences, sentence_filter, stop_strings, require_balanced
+        ))
+    if max_open_chars is not None:
+        criteria.append(UnbalancedBracketCriteria(tokenizer, prompt_length, max_open_chars))
+    for criterion in criteria:
+        # Satu decode per step untuk semua criteria
+        shared = shared or criterion
+        criterion.generated_texts = shared.generated_texts
+    return StoppingCriteriaList(criteria)
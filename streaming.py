@@ -0,0 +1,214 @@
+"""
+Token Streaming
+===============
+ask_question menunggu semua max_new_tokens, decode seluruh output, baru
+memotong di stop marker dan membatasi kalimat. Di sini teks dikirim per
+token selama generate berjalan:
+
+    - IncrementalDetokenizer: decode hanya jendela token terakhir
+      (bukan seluruh output tiap token); karakter multi-byte yang belum
+      lengkap ditahan sampai token berikutnya
+    - TextStream: deteksi stop string dan batas kalimat on the fly; teks
+      yang mungkin awal stop string ("\\n###") ditahan dulu supaya
+      marker tidak sempat tampil. Begitu stop/kalimat cukup, sequence
+      dihentikan (tidak menghabiskan sisa max_new_tokens)
+    - stream_generate: generator delta teks di atas
+      ContinuousBatchScheduler (satu sequence, prefix cache opsional).
+      Beam search tidak bisa di-stream (hasil baru pasti di akhir)
+
+Penggunaan:
+    from streaming import stream_generate
+
+    for delta in stream_generate(model, tokenizer, prompt_ids, gen_params,
+                                 stop_strings=["\\n### Instruksi:"], max_sentences=2):
+        print(delta, end="", flush=True)
+
+Dipakai oleh qa_interactive (test_model.py, test_model_qwen.py) dan
+inference_server.py ({"stream": true} -> Server-Sent Events).
+"""
+
+from continuous_batching import ContinuousBatchScheduler
+
+SENTENCE_ENDINGS = ".!?"
+
+
+# ============================================================
+# INCREMENTAL DETOKENIZER
+# ============================================================
+
+class IncrementalDetokenizer:
+    """
+    Token -> delta teks. Decode ulang hanya dari prefix_offset (token
+    sebelum delta terakhir, untuk konteks spasi/merge) sampai token terbaru.
+    """
+
+    def __init__(self, tokenizer, skip_special_tokens=True):
+        self.tokenizer = tokenizer
+        self.skip_special_tokens = skip_special_tokens
+        self.ids = []
+        self.prefix_offset = 0
+        self.read_offset = 0
+
+    def _decode(self, ids):
+        return self.tokenizer.decode(ids, skip_special_tokens=self.skip_special_tokens)
+
+    def push(self, token_id):
+        """Tambah satu token, return teks baru ("" jika masih ditahan)"""
+        self.ids.append(token_id)
+        prefix_text = self._decode(self.ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.ids[self.prefix_offset:])
+        if len(new_text) > len(prefix_text) and not new_text.endswith("�"):
+            self.prefix_offset = self.read_offset
+            self.read_offset = len(self.ids)
+            return new_text[len(prefix_text):]
+        return ""
+
+    def flush(self):
+        """Sisa teks yang masih ditahan (akhir generate)"""
+        prefix_text = self._decode(self.ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.ids[self.prefix_offset:])
+        self.prefix_offset = self.read_offset = len(self.ids)
+        return new_text[len(prefix_text):]
+
+
+# ============================================================
+# TEXT STREAM (stop string + batas kalimat)
+# ============================================================
+
+class TextStream:
+    """
+    Kumpulkan delta teks, tahan calon stop string, hentikan sequence saat
+    stop string / batas kalimat tercapai
+
+    Args:
+        stop_strings: Teks penghenti (tidak ikut dikirim)
+        max_sentences: Berhenti setelah N kalimat (None = tanpa batas)
+        sentence_filter: Callable(kalimat) -> bool, kalimat yang dihitung
+            (default semua)
+    """
+
+    def __init__(self, tokenizer, stop_strings=(), max_sentences=None, sentence_filter=None):
+        self.tokenizer = tokenizer
+        self.detokenizer = IncrementalDetokenizer(tokenizer)
+        self.stop_strings = [s for s in stop_strings if s]
+        self.max_sentences = max_sentences
+        self.sentence_filter = sentence_filter
+        self.text = ""          # Semua teks hasil decode
+        self.emitted = 0        # Panjang self.text yang sudah dikirim
+        self.end = None         # Posisi akhir jawaban (stop string / kalimat)
+        self.sentences = 0
+        self.sentence_start = 0
+        self.scanned = 0
+        self.pending = []       # Delta siap dikirim
+        self.stop_reason = None
+
+    @property
+    def stopped(self):
+        return self.end is not None
+
+    @property
+    def answer(self):
+        """Teks jawaban (tanpa stop string, sampai batas kalimat)"""
+        return self.text[:self.end if self.end is not None else len(self.text)].strip()
+
+    def _holdback(self):
+        """Panjang akhir teks yang mungkin awal stop string"""
+        longest = 0
+        for stop in self.stop_strings:
+            for n in range(min(len(stop) - 1, len(self.text)), longest, -1):
+                if self.text.endswith(stop[:n]):
+                    longest = n
+                    break
+        return longest
+
+    def _scan_sentences(self, limit):
+        for i in range(self.scanned, limit):
+            if self.text[i] not in SENTENCE_ENDINGS:
+                continue
+            sentence = self.text[self.sentence_start:i + 1].strip()
+            self.sentence_start = i + 1
+            if self.sentence_filter is None or self.sentence_filter(sentence):
+                self.sentences += 1
+                if self.sentences >= self.max_sentences:
+                    self.scanned = i + 1
+                    return i + 1
+        self.scanned = limit
+        return None
+
+    def _emit(self, end):
+        if end <= self.emitted:
+            return  # Tidak ada teks baru (mis. masih ditahan): jangan kirim delta kosong
+        delta = self.text[self.emitted:end]
+        if not self.emitted:
+            delta = delta.lstrip()   # Jawaban tanpa spasi/newline awal
+            if not delta:
+                return
+        self.emitted = end
+        self.pending.append(delta)
+
+    def push_text(self, delta, final=False):
+        if self.stopped:
+            return
+        start = max(0, len(self.text) - max((len(s) for s in self.stop_strings), default=0))
+        self.text += delta
+
+        safe_end = len(self.text)
+        for stop in self.stop_strings:
+            index = self.text.find(stop, start)
+            if index != -1 and index < safe_end:
+                safe_end = index
+                self.end = index
+                self.stop_reason = "stop_string"
+        if not self.stopped and not final:
+            safe_end -= self._holdback()
+
+        if self.max_sentences:
+            sentence_end = self._scan_sentences(safe_end)
+            if sentence_end is not None:
+                safe_end = self.end = sentence_end
+                self.stop_reason = "sentences"
+        self._emit(safe_end)
+
+    def on_token(self, seq, token_id):
+        """Callback ContinuousBatchScheduler: delta baru, hentikan jika selesai"""
+        self.push_text(self.detokenizer.push(token_id))
+        if self.stopped:
+            seq.finish("stop", self.tokenizer)
+
+    def finish(self):
+        """Akhir generate: keluarkan teks yang masih ditahan"""
+        if not self.stopped:
+            self.push_text(self.detokenizer.flush(), final=True)
+
+    def drain(self):
+        deltas, self.pending = self.pending, []
+        return deltas
+
+
+# ============================================================
+# GENERATOR
+# ============================================================
+
+def stream_generate(model, tokenizer, prompt_ids, gen_params, stop_strings=(), max_sentences=None,
+                    sentence_filter=None, template_ids=None, prefix_cache=None):
+    """
+    Generator delta teks untuk satu prompt
+
+    Args:
+        prompt_ids: Token prompt
+        gen_params: Parameter sampling (key model.generate, tanpa beam search)
+        template_ids: Token template pertanyaan kosong (untuk prefix_cache)
+
+    Yields:
+        Potongan teks jawaban, sudah tanpa stop string
+    """
+    if gen_params.get("num_beams", 1) > 1:
+        raise ValueError("Beam search tidak bisa di-stream, gunakan sampling/greedy")
+    stream = TextStream(tokenizer, stop_strings, max_sentences, sentence_filter)
+    scheduler = ContinuousBatchScheduler(model, tokenizer, max_batch_size=1, prefix_cache=prefix_cache)
+    scheduler.add_request(prompt_ids, gen_params, on_token=stream.on_token, template_ids=template_ids)
+    while scheduler.has_work():
+        scheduler.step()
+        yield from stream.drain()
+    stream.finish()
+    yield from stream.drain()
@@ -0,0 +1,532 @@
+"""
+Streaming Training dari Sharded JSONL
+=====================================
+load_dataset_from_json memuat seluruh file (json.load + Dataset.from_list),
+jadi ukuran training set dibatasi RAM. Modul ini membaca corpus multi-GB
+sebagai torch IterableDataset dengan memory tetap:
+
+    - Shard JSONL / JSONL.gz / JSONL.zst, dibaca baris per baris
+    - Shuffle buffer (ukuran tetap) + urutan shard diacak per epoch
+    - Worker splitting shard-aware: dengan dataloader_num_workers = W,
+      worker w membaca shard w, w+W, ...; jika shard < W, setiap worker
+      membaca semua shard tapi hanya baris ke-w, w+W, ... (di bawah
+      torchrun: split = rank x W + worker, lihat StreamingDataMixin)
+    - Tokenize di worker, opsional packing ke blok penuh (packing.py)
+    - Resume offset deterministik: urutan stream hanya bergantung pada
+      (seed, epoch, jumlah worker). stream_position() memberi posisi
+      yang sudah terpecah (epoch data, offset example per worker, worker
+      berikutnya) tanpa membaca ulang data -- disimpan PreemptionCallback
+      di checkpoint dan dipakai langsung oleh set_resume_position(). Untuk
+      checkpoint lama hanya ada jumlah batch (set_resume_offset): epoch
+      penuh dihitung panjangnya, epoch terakhir berhenti dihitung begitu
+      melewati sisa batch; tanpa packing, hitungan & baris yang dilewati
+      tidak perlu di-tokenize sama sekali.
+
+Layout folder:
+    dataset/stream/train/shard_00000.jsonl.zst   {"text": ...} per baris
+    dataset/stream/train/shard_00001.jsonl.zst
+    ...
+
+Konversi dari JSON hasil prepare_dataset.py:
+    python streaming_dataset.py ./dataset/train.json ./dataset/stream/train
+    python streaming_dataset.py ./dataset/eval.json ./dataset/stream/eval --compress none
+
+Penggunaan:
+    from streaming_dataset import StreamingTextDataset
+
+    dataset = StreamingTextDataset("./dataset/stream/train", tokenizer,
+                                   max_length=512, block_size=512)
+    dataset.set_resume_position(position)  # opsional, dari stream_position()
+"""
+
+import io
+import os
+import sys
+import glob
+import gzip
+import json
+import math
+import random
+import itertools
+
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from packing import iter_packed_blocks
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+SHARD_PATTERNS = ["*.jsonl", "*.jsonl.gz", "*.jsonl.zst"]
+MAX_STREAM_WORKERS = 256  # slot panjang epoch per worker (shared memory)
+
+
+# ============================================================
+# SHARD I/O
+# ============================================================
+
+def list_shards(path):
+    """Folder, glob, atau satu file -> daftar shard terurut"""
+    if os.path.isdir(path):
+        files = [f for p in SHARD_PATTERNS for f in glob.glob(os.path.join(path, p))]
+    elif any(ch in path for ch in "*?["):
+        files = glob.glob(path)
+    else:
+        files = [path]
+    return sorted(files)
+
+
+def open_shard(path):
+    """File teks untuk dibaca baris per baris (dekompresi streaming)"""
+    if path.endswith(".zst"):
+        if not ZSTD_AVAILABLE:
+            raise ImportError("zstandard diperlukan untuk shard .zst: pip install zstandard")
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_shard_lines(path):
+    with open_shard(path) as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def write_jsonl_shards(texts, output_dir, shard_size=100_000, compress="zst"):
+    """
+    Tulis teks ke shard JSONL ({"text": ...} per baris)
+
+    Args:
+        texts: Iterable of strings
+        output_dir: Folder output
+        shard_size: Jumlah dokumen per shard
+        compress: "zst", "gz", atau None
+
+    Returns:
+        Daftar path shard
+    """
+    if compress == "zst" and not ZSTD_AVAILABLE:
+        print("⚠️  zstandard tidak terinstall, pakai gzip")
+        compress = "gz"
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = ".jsonl" + (f".{compress}" if compress else "")
+
+    paths = []
+    texts = iter(texts)
+    while True:
+        chunk = list(itertools.islice(texts, shard_size))
+        if not chunk:
+            break
+        path = os.path.join(output_dir, f"shard_{len(paths):05d}{suffix}")
+        data = "".join(json.dumps({"text": t}, ensure_ascii=False) + "\n" for t in chunk)
+        data = data.encode('utf-8')
+        if compress == "zst":
+            data = zstandard.ZstdCompressor(level=3).compress(data)
+        elif compress == "gz":
+            data = gzip.compress(data)
+        with open(path + ".tmp", 'wb') as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        paths.append(path)
+    return paths
+
+
+# ============================================================
+# STREAMING DATASET
+# ============================================================
+
+def _round_robin_skip(worker_batches, batches, start=0):
+    """
+    DataLoader mengambil batch round-robin dari worker start, start+1, ...;
+    worker yang sudah habis dilewati. worker_batches[w] = None berarti
+    worker w belum habis (panjangnya tidak perlu diketahui). Return (batch
+    terpakai per worker, worker yang gilirannya berikutnya)
+    """
+    left = [math.inf if b is None else b for b in worker_batches]
+    skip = [0] * len(worker_batches)
+    worker = start
+    remaining = batches
+    while remaining:
+        active = [w for w in range(len(left)) if left[w] > 0]
+        if not active:
+            break
+        # Putaran penuh: setiap worker aktif dapat 1 batch, giliran kembali ke `worker`
+        rounds = min(remaining // len(active), min(left[w] for w in active))
+        if rounds:
+            for w in active:
+                skip[w] += rounds
+                left[w] -= rounds
+            remaining -= rounds * len(active)
+            continue
+        for _ in range(len(left)):
+            if not remaining:
+                break
+            if left[worker] > 0:
+                skip[worker] += 1
+                left[worker] -= 1
+                remaining -= 1
+            worker = (worker + 1) % len(left)
+    return skip, worker
+
+
+class StreamingTextDataset(IterableDataset):
+    """
+    IterableDataset dari shard JSONL (lihat docstring modul)
+
+    Args:
+        path: Folder / glob / file shard
+        tokenizer: HuggingFace tokenizer (dipakai di worker)
+        max_length: Truncation per dokumen
+        text_field: Field teks di setiap baris JSON
+        shuffle_buffer: Ukuran buffer shuffle (0 = urutan asli, mis. eval)
+        block_size: Jika diisi, dokumen di-pack ke blok block_size token
+        reset_position_ids: Diteruskan ke packing
+        seed: Seed shuffle (dikombinasi dengan epoch & worker id)
+    """
+
+    def __init__(self, path, tokenizer, max_length=512, text_field="text",
+                 shuffle_buffer=10_000, block_size=None, reset_position_ids=False,
+                 seed=42):
+        self.shards = list_shards(path)
+        if not self.shards:
+            raise FileNotFoundError(f"Tidak ada shard JSONL di: {path}")
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.text_field = text_field
+        self.shuffle_buffer = shuffle_buffer
+        self.block_size = block_size
+        self.reset_position_ids = reset_position_ids
+        self.seed = seed
+        self.epoch = 0
+        self._epoch_offset = 0
+        self._pending_resume = None
+        self._resume_epoch = None
+        self._resume_skip = []
+        self._resume_next_worker = 0
+        self.rank = 0
+        self.num_replicas = 1
+        # (epoch, jumlah example) per worker logis, ditulis worker saat
+        # epoch-nya habis; shared memory supaya terbaca di main process
+        self._epoch_lengths = torch.full((MAX_STREAM_WORKERS, 2), -1, dtype=torch.long).share_memory_()
+
+    def set_epoch(self, epoch):
+        """
+        Dipanggil Trainer tiap epoch -> urutan shard & shuffle berbeda
+
+        Setelah resume, hitungan epoch Trainer mulai lagi dari 0
+        (IterableDataset tidak punya panjang), jadi epoch data = epoch +
+        jumlah epoch yang sudah selesai sebelum checkpoint
+        """
+        if self._pending_resume is not None:
+            self._resolve_resume(epoch)
+        self.epoch = epoch + self._epoch_offset
+
+    def set_replica(self, rank, num_replicas):
+        """Data-parallel: setiap rank membaca bagian stream sendiri"""
+        self.rank = rank
+        self.num_replicas = num_replicas
+
+    def set_resume_offset(self, batches_consumed, batch_size, num_workers=0,
+                          gradient_accumulation_steps=1):
+        """
+        Lewati batch yang sudah dipakai run sebelumnya (lintas epoch)
+
+        Args:
+            batches_consumed: Jumlah batch dataloader yang sudah dipakai
+                sejak awal training (global_step x gradient_accumulation_steps)
+            batch_size: Batch size dataloader
+            num_workers: dataloader_num_workers (harus sama dengan DataLoader)
+            gradient_accumulation_steps: Step terakhir tiap epoch bisa
+                berisi kurang dari GA batch
+
+        Pemecahan ke (epoch, offset) dihitung saat set_epoch / iterasi
+        pertama, setelah set_replica (shard milik rank ini sudah pasti).
+        Hanya untuk checkpoint tanpa posisi stream; jika ada, pakai
+        set_resume_position (tanpa membaca ulang data).
+        """
+        self._pending_resume = (batches_consumed, batch_size, max(1, num_workers),
+                                gradient_accumulation_steps)
+
+    def set_resume_position(self, position):
+        """
+        Lanjut tepat di batch berikutnya dari posisi stream_position()
+        yang tersimpan di checkpoint (tidak ada data yang dihitung ulang)
+        """
+        self._pending_resume = dict(position)
+
+    def stream_position(self, batches, batch_size, num_workers=0):
+        """
+        Posisi stream setelah `batches` batch dataloader di epoch data
+        berjalan (dipanggil di main process, mis. oleh PreemptionCallback)
+
+        Panjang worker yang sudah habis dibaca dari _epoch_lengths; worker
+        yang belum menulis panjangnya belum habis saat batch terakhir
+        diproduksi, jadi juga belum habis saat batch itu dipakai.
+
+        Returns:
+            dict (JSON-serializable) untuk set_resume_position:
+            epoch, offsets (example terpakai per worker logis),
+            next_worker, batch_size, num_workers
+        """
+        num_workers = max(1, num_workers)
+        if self.epoch == self._resume_epoch and len(self._resume_skip) == num_workers:
+            base, start = list(self._resume_skip), self._resume_next_worker
+        else:
+            base, start = [0] * num_workers, 0
+
+        remaining = []
+        for w in range(num_workers):
+            epoch, count = self._epoch_lengths[w].tolist() if w < MAX_STREAM_WORKERS else (-1, -1)
+            remaining.append(max(0, math.ceil((count - base[w]) / batch_size))
+                             if epoch == self.epoch else None)
+        skip, next_worker = _round_robin_skip(remaining, batches, start)
+
+        position = {"epoch": self.epoch, "next_worker": next_worker,
+                    "batch_size": batch_size, "num_workers": num_workers}
+        if None not in remaining and skip == remaining:
+            # Semua worker habis: lanjut dari awal epoch berikutnya
+            position.update(epoch=self.epoch + 1, next_worker=0)
+            position["offsets"] = [0] * num_workers
+        else:
+            position["offsets"] = [b + s * batch_size for b, s in zip(base, skip)]
+        return position
+
+    def _resolve_resume(self, start_epoch):
+        """Jalan per epoch (hitung panjangnya) sampai sisa batch jatuh di dalam satu epoch"""
+        pending, self._pending_resume = self._pending_resume, None
+        if isinstance(pending, dict):
+            # Posisi tersimpan: sudah terpecah, langsung pakai
+            self._epoch_offset = pending["epoch"] - start_epoch
+            self._resume_epoch = pending["epoch"]
+            self._resume_skip = list(pending["offsets"])
+            self._resume_next_worker = pending["next_worker"]
+            return
+
+        batches, batch_size, num_workers, ga = pending
+        epoch = start_epoch + self._epoch_offset
+        while True:
+            # Worker dengan > batches batch tidak mungkin habis dalam `batches`
+            # giliran pertama -> cukup hitung sampai batas itu
+            limit = (batches + 1) * batch_size
+            worker_batches = [
+                math.ceil(self._count_examples(epoch, w, num_workers, limit) / batch_size)
+                for w in range(num_workers)
+            ]
+            epoch_batches = math.ceil(sum(worker_batches) / ga) * ga
+            if not epoch_batches or batches < epoch_batches:
+                break
+            batches -= epoch_batches
+            epoch += 1
+        self._epoch_offset = epoch - start_epoch
+        self._resume_epoch = epoch
+        skip, self._resume_next_worker = _round_robin_skip(worker_batches, batches)
+        self._resume_skip = [s * batch_size for s in skip]
+
+    def _count_examples(self, epoch, worker_id, num_workers, limit=None):
+        """Jumlah example satu worker (logis) dalam satu epoch, maksimal `limit`"""
+        texts = self._iter_texts(self._iter_lines(worker_id, num_workers, epoch))
+        if self.block_size:
+            return sum(1 for _ in itertools.islice(self._pack(self._iter_token_ids(texts)), limit))
+        return sum(1 for _ in itertools.islice(texts, limit))
+
+    def _record_length(self, worker_id, count):
+        """Worker selesai satu epoch: simpan panjangnya (count dulu, baru tag epoch)"""
+        if worker_id < MAX_STREAM_WORKERS:
+            self._epoch_lengths[worker_id, 1] = count
+            self._epoch_lengths[worker_id, 0] = self.epoch
+
+    def _worker(self):
+        """
+        (id logis, jumlah worker). Saat resume, id dirotasi supaya worker 0
+        run baru melanjutkan worker yang gilirannya batch berikutnya
+        """
+        info = get_worker_info()
+        worker_id, num_workers = (info.id, info.num_workers) if info else (0, 1)
+        if self.epoch == self._resume_epoch:
+            worker_id = (worker_id + self._resume_next_worker) % num_workers
+        return worker_id, num_workers
+
+    def _skip_examples(self, worker_id, num_workers):
+        """Example yang sudah dipakai worker ini di epoch resume"""
+        if self.epoch != self._resume_epoch:
+            return 0
+        if len(self._resume_skip) != num_workers:
+            raise ValueError(f"Posisi resume (num_workers={len(self._resume_skip)}) tidak sama "
+                             f"dengan DataLoader (num_workers={num_workers})")
+        return self._resume_skip[worker_id]
+
+    def _iter_lines(self, worker_id, num_workers, epoch=None):
+        """Baris mentah milik (rank, worker) ini, urutan shard diacak per epoch"""
+        epoch = self.epoch if epoch is None else epoch
+        split = self.rank * num_workers + worker_id
+        num_splits = self.num_replicas * num_workers
+        shards = list(self.shards)
+        random.Random(self.seed + epoch).shuffle(shards)
+        if len(shards) >= num_splits:
+            for path in shards[split::num_splits]:
+                yield from iter_shard_lines(path)
+        else:
+            lines = itertools.chain.from_iterable(iter_shard_lines(p) for p in shards)
+            yield from itertools.islice(lines, split, None, num_splits)
+
+    def _shuffle(self, lines, rng):
+        """Shuffle buffer ukuran tetap (memory tidak tumbuh dengan corpus)"""
+        if self.shuffle_buffer <= 1:
+            yield from lines
+            return
+        buffer = []
+        for line in lines:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(line)
+                continue
+            idx = rng.randrange(len(buffer))
+            yield buffer[idx]
+            buffer[idx] = line
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def _iter_texts(self, lines):
+        for line in lines:
+            text = json.loads(line).get(self.text_field)
+            if text:
+                yield text
+
+    def _iter_token_ids(self, texts):
+        for text in texts:
+            ids = self.tokenizer(text, truncation=True, max_length=self.max_length)["input_ids"]
+            if ids:
+                yield ids
+
+    def _pack(self, token_ids):
+        eos_token_id = self.tokenizer.eos_token_id
+        pad_token_id = self.tokenizer.pad_token_id
+        return iter_packed_blocks(
+            token_ids, self.block_size, eos_token_id,
+            pad_token_id=eos_token_id if pad_token_id is None else pad_token_id,
+            reset_position_ids=self.reset_position_ids,
+        )
+
+    def __iter__(self):
+        if self._pending_resume is not None:
+            # Tanpa set_epoch (dipakai di luar Trainer)
+            self._resolve_resume(self.epoch - self._epoch_offset)
+            self.epoch = self._resume_epoch
+        worker_id, num_workers = self._worker()
+        rng = random.Random(f"{self.seed}-{self.epoch}-{self.rank}-{worker_id}")
+        texts = self._iter_texts(self._shuffle(self._iter_lines(worker_id, num_workers), rng))
+        skip = self._skip_examples(worker_id, num_workers)
+
+        if self.block_size:
+            examples = self._pack(self._iter_token_ids(texts))
+            # Blok bergantung pada panjang token -> skip setelah tokenize
+            examples = itertools.islice(examples, skip, None)
+        else:
+            # 1 dokumen = 1 example -> skip teks tanpa tokenize
+            texts = itertools.islice(texts, skip, None)
+            examples = (
+                {"input_ids": ids, "attention_mask": [1] * len(ids)}
+                for ids in self._iter_token_ids(texts)
+            )
+
+        count = skip
+        for example in examples:
+            count += 1
+            yield example
+        # Hanya tercapai jika epoch worker ini benar-benar habis
+        self._record_length(worker_id, count)
+
+
+class EpochDataLoader(DataLoader):
+    """DataLoader biasa + set_epoch (Trainer memanggilnya tiap epoch, sebelum iter)"""
+
+    def set_epoch(self, epoch):
+        if hasattr(self.dataset, "set_epoch"):
+            self.dataset.set_epoch(epoch)
+
+    def __iter__(self):
+        # Satu batch di depan (seperti DataLoaderShard accelerate): saat
+        # batch terakhir epoch diserahkan, semua worker sudah mencatat
+        # panjang epoch-nya, jadi stream_position tidak menunjuk ke sisa
+        # epoch yang kosong
+        iterator = super().__iter__()
+        sentinel = object()
+        batch = next(iterator, sentinel)
+        while batch is not sentinel:
+            next_batch = next(iterator, sentinel)
+            yield batch
+            batch = next_batch
+
+
+class StreamingDataMixin:
+    """
+    Mixin Trainer untuk StreamingTextDataset di bawah torchrun
+
+    Accelerate membungkus IterableDataset dengan IterableDatasetShard
+    (setiap rank membaca SELURUH stream lalu membuang bagian rank lain)
+    atau dispatch dari rank 0. Di sini setiap rank langsung membaca shard
+    miliknya; DataLoader tidak lewat accelerator.prepare (set_epoch
+    diteruskan oleh EpochDataLoader), batch dipindah ke device oleh
+    Trainer._prepare_inputs.
+    """
+
+    def get_train_dataloader(self):
+        dataset = self.train_dataset
+        if not isinstance(dataset, StreamingTextDataset) or self.args.world_size <= 1:
+            return super().get_train_dataloader()
+
+        dataset.set_replica(self.args.process_index, self.args.world_size)
+        return EpochDataLoader(
+            dataset,
+            batch_size=self._train_batch_size,
+            collate_fn=self._get_collator_with_removed_columns(
+                self.data_collator, description="training"
+            ),
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+
+
+def resume_batches_from_checkpoint(checkpoint_dir, gradient_accumulation_steps=1):
+    """Jumlah batch dataloader yang sudah dipakai (dari trainer_state.json)"""
+    with open(os.path.join(checkpoint_dir, "trainer_state.json"), 'r') as f:
+        global_step = json.load(f)["global_step"]
+    return global_step * gradient_accumulation_steps
+
+
+# ============================================================
+# MAIN: JSON -> shard JSONL
+# ============================================================
+
+def main(input_path, output_dir, shard_size=100_000, compress="zst"):
+    print(f"📂 Loading: {input_path}")
+    with open(input_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    texts = (item["text"] if isinstance(item, dict) else str(item) for item in data)
+    paths = write_jsonl_shards(texts, output_dir, shard_size=shard_size, compress=compress)
+    print(f"💾 {len(data):,} docs -> {len(paths)} shards di {output_dir}")
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    shard_size, compress = 100_000, "zst"
+    if "--shard-size" in argv:
+        i = argv.index("--shard-size")
+        shard_size = int(argv.pop(i + 1))
+        argv.pop(i)
+    if "--compress" in argv:
+        i = argv.index("--compress")
+        compress = argv.pop(i + 1)
+        argv.pop(i)
+        compress = None if compress == "none" else compress
+    if len(argv) < 2:
+        print("Usage: python streaming_dataset.py INPUT.json OUTPUT_DIR "
+              "[--shard-size N] [--compress zst|gz|none]")
+        sys.exit(1)
+    main(argv[0], argv[1], shard_size=shard_size, compress=compress)
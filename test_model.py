@@ -34,6 +34,20 @@ QA_TEMPLATES = {
     },
 }
 
+# KV state scaffolding template dihitung sekali per model (prefix_cache.py)
+PREFIX_CACHE = True
+
+MAX_ANSWER_SENTENCES = 2  # Max 2 kalimat untuk lebih fokus
+
+# Hentikan generate begitu jawaban final (stop marker / kalimat cukup),
+# bukan setelah max_new_tokens (stopping_criteria.py)
+STOPPING_CRITERIA = True
+
+# qa_interactive: True = token tampil saat dihasilkan (sampling t=0.2,
+# beam search tidak bisa di-stream); False = beam search, jawaban utuh
+# di akhir (perilaku lama). CLI: --no-stream
+STREAM_ANSWERS = True
+
 
 def load_model(model_path="./tiny-llm-indo-final", use_lora=True, base_model_path=None):
     """
@@ -112,6 +126,12 @@ def load_model(model_path="./tiny-llm-indo-final", use_lora=True, base_model_pat
         # Standard model loading
         model = GPT2LMHeadModel.from_pretrained(model_path)
     
+    # Tokenizer fallback (cahya/gpt2) tidak cocok untuk model dengan
+    # tokenizer sendiri (train_tokenizer.py) atau vocab yang dipangkas
+    vocab_size = model.get_input_embeddings().weight.shape[0]
+    if len(tokenizer) > vocab_size:
+        print(f"⚠️  Tokenizer ({len(tokenizer)}) lebih besar dari vocab model ({vocab_size})!")
+    
     device = "cuda" if torch.cuda.is_available() else "cpu"
     model = model.to(device)
     model.eval()
@@ -215,39 +235,17 @@ def batch_test(model, tokenizer, device):
 # Q&A / CHAT FUNCTIONS
 # ============================================================
 
-def ask_question(model, tokenizer, question, device, 
-                 qa_format="instruction",
-                 max_length=150,
-                 temperature=0.2,
-                 use_beam_search=True):
-    """
-    Ajukan pertanyaan ke model
-    
-    Args:
-        question: Pertanyaan dalam bahasa Indonesia
-        qa_format: Format template ("simple", "instruction", "chat")
-        temperature: Kontrol kreativitas (0.2=sangat faktual, 0.5=seimbang, 0.7=kreatif)
-        use_beam_search: Gunakan beam search untuk jawaban lebih konsisten
-    
-    Returns:
-        Jawaban dari model
-    """
+def build_qa_prompt(question, qa_format="instruction"):
+    """Prompt Q&A + stop marker sesuai template training"""
     template = QA_TEMPLATES.get(qa_format, QA_TEMPLATES["instruction"])
-    prompt = template["format"].format(question=question)
-    stop_token = template["stop"]
-    
-    inputs = tokenizer(prompt, return_tensors="pt").to(device)
-    prompt_length = inputs.input_ids.shape[1]  # Panjang prompt dalam TOKENS
-    
-    # Buat attention mask
-    attention_mask = torch.ones_like(inputs.input_ids)
-    
-    # Generation parameters bergantung mode
+    return template["format"].format(question=question), template["stop"]
+
+
+def qa_generation_params(tokenizer, temperature=0.2, use_beam_search=True, max_new_tokens=60):
+    """Parameter model.generate untuk Q&A (tanpa input_ids / attention_mask)"""
     gen_params = {
-        "input_ids": inputs.input_ids,
-        "attention_mask": attention_mask,
-        "max_new_tokens": 60,  # Lebih pendek untuk hindari jawaban ngawur
-        "min_length": prompt_length + 5,
+        "max_new_tokens": max_new_tokens,  # Default pendek untuk hindari jawaban ngawur
+        "min_new_tokens": 5,
         "pad_token_id": tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
         "eos_token_id": tokenizer.eos_token_id,
         "repetition_penalty": 2.0,  # Sangat tinggi untuk hindari pengulangan
@@ -270,17 +268,31 @@ def ask_question(model, tokenizer, question, device,
             "top_k": 20,  # Sangat selektif
             "top_p": 0.75,  # Hanya token probability sangat tinggi
         })
-    
-    import warnings
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        with torch.no_grad():
-            outputs = model.generate(**gen_params)
-    
-    # Decode HANYA bagian jawaban (skip prompt tokens)
-    answer_tokens = outputs[0][prompt_length:]
-    answer = tokenizer.decode(answer_tokens, skip_special_tokens=True).strip()
-    
+    return gen_params
+
+
+def tokenize_left_padded(tokenizer, prompts, device):
+    """
+    Tokenize batch prompt dengan padding kiri (token baru decoder-only
+    harus langsung menyambung token prompt terakhir)
+    """
+    padding_side = tokenizer.padding_side
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    try:
+        return tokenizer(prompts, return_tensors="pt", padding=True).to(device)
+    finally:
+        tokenizer.padding_side = padding_side
+
+
+def is_valid_sentence(sentence):
+    """Kalimat yang dihitung/dipakai: cukup panjang, tanpa karakter aneh"""
+    return len(sentence) > 10 and not any(bad in sentence.lower() for bad in ["''", '""', 'http', 'www'])
+
+
+def clean_answer(answer, stop_token):
+    """Post-processing jawaban: stop marker, kurung terbuka, max 2 kalimat"""
     # Stop at next question marker if exists
     if stop_token in answer:
         answer = answer.split(stop_token)[0].strip()
@@ -299,10 +311,10 @@ def ask_question(model, tokenizer, question, device,
         if char in '.!?':
             sent = current.strip()
             # Filter kalimat yang mengandung karakter aneh atau terlalu pendek
-            if len(sent) > 10 and not any(bad in sent.lower() for bad in ["''", '""', 'http', 'www']):
+            if is_valid_sentence(sent):
                 sentences.append(sent)
             current = ""
-            if len(sentences) >= 2:  # Max 2 kalimat untuk lebih fokus
+            if len(sentences) >= MAX_ANSWER_SENTENCES:
                 break
     
     if sentences:
@@ -323,11 +335,121 @@ def ask_question(model, tokenizer, question, device,
     return answer
 
 
-def qa_interactive(model, tokenizer, device, qa_format="instruction"):
-    """Interactive Q&A mode"""
+def ask_question(model, tokenizer, question, device, 
+                 qa_format="instruction",
+                 temperature=0.2,
+                 use_beam_search=True):
+    """
+    Ajukan pertanyaan ke model
+    
+    Args:
+        question: Pertanyaan dalam bahasa Indonesia
+        qa_format: Format template ("simple", "instruction", "chat")
+        temperature: Kontrol kreativitas (0.2=sangat faktual, 0.5=seimbang, 0.7=kreatif)
+        use_beam_search: Gunakan beam search untuk jawaban lebih konsisten
+    
+    Returns:
+        Jawaban dari model
+    """
+    return ask_questions(model, tokenizer, [question], device,
+                         qa_format=qa_format,
+                         temperature=temperature,
+                         use_beam_search=use_beam_search)[0]
+
+
+def ask_questions(model, tokenizer, questions, device,
+                  qa_format="instruction",
+                  temperature=0.2,
+                  use_beam_search=True,
+                  max_new_tokens=60):
+    """
+    Batch Q&A: semua pertanyaan di-padding kiri dan dijawab dalam satu
+    model.generate (dipakai inference_server.py)
+    
+    Returns:
+        List jawaban, urutan sama dengan questions
+    """
+    prompts = []
+    for question in questions:
+        prompt, stop_token = build_qa_prompt(question, qa_format)
+        prompts.append(prompt)
+    
+    gen_params = qa_generation_params(tokenizer, temperature, use_beam_search, max_new_tokens)
+    
+    if PREFIX_CACHE:
+        # Prefill hanya pertanyaan; "### Instruksi:" dari cache
+        from prefix_cache import get_prefix_cache
+        template, _ = build_qa_prompt("", qa_format)
+        inputs = get_prefix_cache(model).batch_inputs(
+            tokenizer, prompts, template, device, num_beams=gen_params.get("num_beams", 1)
+        )
+    else:
+        inputs = tokenize_left_padded(tokenizer, prompts, device)
+    prompt_length = inputs["input_ids"].shape[1]  # Panjang prompt (+ padding) dalam TOKENS
+    
+    if STOPPING_CRITERIA:
+        from stopping_criteria import answer_stopping_criteria
+        gen_params["stopping_criteria"] = answer_stopping_criteria(
+            tokenizer, prompt_length,
+            stop_strings=[stop_token],
+            max_sentences=MAX_ANSWER_SENTENCES,
+            sentence_filter=is_valid_sentence,
+        )
+    
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        with torch.no_grad():
+            outputs = model.generate(**inputs, **gen_params)
+    
+    # Decode HANYA bagian jawaban (skip prompt tokens)
+    answers = []
+    for output in outputs:
+        answer = tokenizer.decode(output[prompt_length:], skip_special_tokens=True).strip()
+        answers.append(clean_answer(answer, stop_token))
+    return answers
+
+
+def stream_question(model, tokenizer, question,
+                    qa_format="instruction",
+                    temperature=0.2,
+                    max_new_tokens=60):
+    """
+    Seperti ask_question tapi generator: yield potongan jawaban per token.
+    Stop marker dan batas kalimat dideteksi selama generate (streaming.py),
+    jadi generate berhenti begitu jawaban lengkap. Selalu sampling (beam
+    search tidak bisa di-stream).
+    """
+    from streaming import stream_generate
+    
+    prompt, stop_token = build_qa_prompt(question, qa_format)
+    gen_params = qa_generation_params(tokenizer, temperature, use_beam_search=False, max_new_tokens=max_new_tokens)
+    template_ids = prefix_cache = None
+    if PREFIX_CACHE:
+        from prefix_cache import get_prefix_cache
+        template_ids = tokenizer(build_qa_prompt("", qa_format)[0]).input_ids
+        prefix_cache = get_prefix_cache(model)
+    
+    yield from stream_generate(
+        model, tokenizer, tokenizer(prompt).input_ids, gen_params,
+        stop_strings=[stop_token],
+        max_sentences=MAX_ANSWER_SENTENCES,
+        sentence_filter=is_valid_sentence,
+        template_ids=template_ids,
+        prefix_cache=prefix_cache,
+    )
+
+
+def qa_interactive(model, tokenizer, device, qa_format="instruction", stream=None):
+    """Interactive Q&A mode (stream=None -> STREAM_ANSWERS)"""
+    if stream is None:
+        stream = STREAM_ANSWERS
+    _, stop_token = build_qa_prompt("", qa_format)
+    
     print("\n" + "=" * 60)
     print("🤖 MODE TANYA JAWAB")
     print(f"   Format: {qa_format}")
+    print(f"   Mode: {'streaming (sampling)' if stream else 'beam search'}")
     print("   Ketik 'quit' untuk keluar")
     print("=" * 60)
     
@@ -341,13 +463,29 @@ def qa_interactive(model, tokenizer, device, qa_format="instruction"):
         if not question:
             continue
         
-        print("\n⏳ Berpikir...")
-        answer = ask_question(model, tokenizer, question, device, 
-                             qa_format=qa_format,
-                             temperature=0.2,  # Sangat rendah untuk jawaban faktual
-                             use_beam_search=True)  # Gunakan beam search untuk konsistensi
+        if not stream:
+            answer = ask_question(model, tokenizer, question, device,
+                                  qa_format=qa_format,
+                                  use_beam_search=True)
+            print(f"\n💬 Jawaban: {answer}")
+            print("-" * 50)
+            continue
         
-        print(f"\n💬 Jawaban: {answer}")
+        # Streaming: token tampil begitu dihasilkan
+        print("\n💬 Jawaban: ", end="", flush=True)
+        streamed = ""
+        for delta in stream_question(model, tokenizer, question,
+                                     qa_format=qa_format,
+                                     temperature=0.2):  # Sangat rendah untuk jawaban faktual
+            streamed += delta
+            print(delta, end="", flush=True)
+        print()
+        # Stream sudah memotong stop marker & jumlah kalimat; sisa
+        # post-processing (kurung terbuka, potong koma, jawaban terlalu
+        # pendek) hanya bisa setelah jawaban lengkap
+        answer = clean_answer(streamed, stop_token)
+        if answer != streamed.strip():
+            print(f"   ↳ {answer}")
         print("-" * 50)
 
 
@@ -427,6 +565,7 @@ MODES:
   --qa-interactive  Interactive Q&A only
   --qa-batch        Q&A batch test only
   (default)         Text generation mode
+  --no-stream       Interactive Q&A: beam search, tanpa streaming
   
 Q&A FORMATS:
   instruction       (default) ### Instruksi format
@@ -448,7 +587,8 @@ GENERATION PARAMETERS (optimized):
         """)
         return
     
-    args = sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--no-stream"]
+    stream = "--no-stream" not in sys.argv[1:]
     for i, arg in enumerate(args):
         if arg.startswith("--"):
             mode = arg
@@ -472,10 +612,10 @@ GENERATION PARAMETERS (optimized):
     if mode == "--qa":
         # Q&A batch test lalu interactive
         qa_batch_test(model, tokenizer, device, qa_format)
-        qa_interactive(model, tokenizer, device, qa_format)
+        qa_interactive(model, tokenizer, device, qa_format, stream=stream)
     elif mode == "--qa-interactive":
         # Langsung ke interactive Q&A
-        qa_interactive(model, tokenizer, device, qa_format)
+        qa_interactive(model, tokenizer, device, qa_format, stream=stream)
     elif mode == "--qa-batch":
         # Hanya batch test
         qa_batch_test(model, tokenizer, device, qa_format)
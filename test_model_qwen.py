@@ -27,6 +27,9 @@ SYSTEM_PROMPT = (
     "Jawab pertanyaan dengan akurat, jelas, dan ringkas dalam bahasa Indonesia."
 )
 
+# KV state system prompt + chat template dihitung sekali per model (prefix_cache.py)
+PREFIX_CACHE = True
+
 BASE_MODEL = "Qwen/Qwen2.5-1.5B"
 DEFAULT_MODEL_PATH = "./masa-ai-qwen-merged"
 
@@ -100,11 +103,8 @@ def load_model(model_path=None):
 # GENERATION
 # ============================================================
 
-def ask_question(model, tokenizer, question, device,
-                 temperature=0.4, max_new_tokens=256,
-                 system_prompt=None):
-    """Tanya jawab dengan chat template"""
-    
+def build_chat_prompt(tokenizer, question, system_prompt=None):
+    """Prompt chat template (system + user) siap generate"""
     if system_prompt is None:
         system_prompt = SYSTEM_PROMPT
     
@@ -113,13 +113,13 @@ def ask_question(model, tokenizer, question, device,
         {"role": "user", "content": question},
     ]
     
-    text = tokenizer.apply_chat_template(
+    return tokenizer.apply_chat_template(
         messages, tokenize=False, add_generation_prompt=True
     )
-    
-    inputs = tokenizer(text, return_tensors="pt").to(device)
-    prompt_length = inputs.input_ids.shape[1]
-    
+
+
+def chat_generation_params(tokenizer, temperature=0.4, max_new_tokens=256):
+    """Parameter model.generate untuk tanya jawab"""
     gen_params = {
         "max_new_tokens": max_new_tokens,
         "pad_token_id": tokenizer.pad_token_id,
@@ -138,15 +138,72 @@ def ask_question(model, tokenizer, question, device,
             "top_k": 40,
             "top_p": 0.90,
         })
+    return gen_params
+
+
+def ask_question(model, tokenizer, question, device,
+                 temperature=0.4, max_new_tokens=256,
+                 system_prompt=None):
+    """Tanya jawab dengan chat template"""
+    return ask_questions(model, tokenizer, [question], device,
+                         temperature=temperature,
+                         max_new_tokens=max_new_tokens,
+                         system_prompt=system_prompt)[0]
+
+
+def ask_questions(model, tokenizer, questions, device,
+                  temperature=0.4, max_new_tokens=256,
+                  system_prompt=None):
+    """
+    Batch tanya jawab: padding kiri, satu model.generate
+    (dipakai inference_server.py)
+    """
+    texts = [build_chat_prompt(tokenizer, q, system_prompt) for q in questions]
+    
+    if PREFIX_CACHE:
+        # Prefill hanya pertanyaan; system prompt dari cache
+        from prefix_cache import get_prefix_cache
+        template = build_chat_prompt(tokenizer, "", system_prompt)
+        inputs = get_prefix_cache(model).batch_inputs(tokenizer, texts, template, device)
+    else:
+        padding_side = tokenizer.padding_side
+        tokenizer.padding_side = "left"
+        try:
+            inputs = tokenizer(texts, return_tensors="pt", padding=True).to(device)
+        finally:
+            tokenizer.padding_side = padding_side
+    prompt_length = inputs["input_ids"].shape[1]
+    
+    gen_params = chat_generation_params(tokenizer, temperature, max_new_tokens)
     
     with torch.no_grad():
         outputs = model.generate(**inputs, **gen_params)
     
     # Decode hanya jawaban
-    answer_tokens = outputs[0][prompt_length:]
-    answer = tokenizer.decode(answer_tokens, skip_special_tokens=True).strip()
-    
-    return answer
+    return [
+        tokenizer.decode(output[prompt_length:], skip_special_tokens=True).strip()
+        for output in outputs
+    ]
+
+
+def stream_question(model, tokenizer, question,
+                    temperature=0.4, max_new_tokens=256,
+                    system_prompt=None):
+    """Seperti ask_question tapi generator: yield potongan jawaban per token"""
+    from streaming import stream_generate
+    
+    prompt = build_chat_prompt(tokenizer, question, system_prompt)
+    gen_params = chat_generation_params(tokenizer, temperature, max_new_tokens)
+    template_ids = prefix_cache = None
+    if PREFIX_CACHE:
+        from prefix_cache import get_prefix_cache
+        template_ids = tokenizer(build_chat_prompt(tokenizer, "", system_prompt)).input_ids
+        prefix_cache = get_prefix_cache(model)
+    
+    yield from stream_generate(
+        model, tokenizer, tokenizer(prompt).input_ids, gen_params,
+        template_ids=template_ids, prefix_cache=prefix_cache,
+    )
 
 
 def generate_text(model, tokenizer, prompt, device,
@@ -205,11 +262,11 @@ def qa_interactive(model, tokenizer, device):
                 print("❌ Format: temp 0.7")
             continue
         
-        print("\n⏳ Berpikir...")
-        answer = ask_question(model, tokenizer, question, device,
-                             temperature=temp)
-        
-        print(f"\n💬 Jawaban: {answer}")
+        # Streaming: token tampil begitu dihasilkan
+        print("\n💬 Jawaban: ", end="", flush=True)
+        for delta in stream_question(model, tokenizer, question, temperature=temp):
+            print(delta, end="", flush=True)
+        print()
         print("-" * 50)
 
 
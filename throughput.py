@@ -0,0 +1,410 @@
+"""
+Training Throughput Instrumentation
+===================================
+Callback Trainer yang mencatat per logging window (setiap logging_steps):
+    - tokens/sec (hanya token non-pad, dari attention_mask) & samples/sec
+    - waktu step dipecah: data-wait, forward, backward, optimizer, other
+    - peak RSS & peak memory CUDA
+    - padding ratio (slot pad / total slot)
+    - estimasi MFU (6 x params x tokens/sec / peak FLOPS); peak dari
+      tabel GPU, estimasi CPU (thread x clock x FLOP/cycle SIMD), atau
+      peak_flops manual. Jika tidak diketahui, MFU dicatat null / "n/a"
+
+Hasil ditulis ke JSONL (satu baris per window) + ringkasan di akhir
+trainer.train(), termasuk verdict data-bound vs compute-bound.
+
+Cara kerja (tanpa mengubah Trainer):
+    - forward pre-hook di model (dan base_model, untuk chunked loss/PEFT):
+      awal micro-step, hitung token dari input_ids/attention_mask
+    - hook grad di output forward: awal backward
+    - hook grad di setiap parameter trainable: akhir backward
+    - optimizer.step di-wrap: waktu optimizer
+    - sisa waktu sejak micro-step sebelumnya = data-wait
+Di CUDA, tiap batas fase di-synchronize supaya waktu kernel terhitung.
+
+Penggunaan:
+    from throughput import ThroughputCallback
+
+    trainer = Trainer(..., callbacks=[ThroughputCallback("./logs/throughput.jsonl")])
+"""
+
+import os
+import json
+import time
+import resource
+
+import torch
+from transformers.trainer_callback import TrainerCallback
+
+# Peak dense bf16/fp16 tensor FLOPS (untuk MFU); override via peak_flops=
+GPU_PEAK_FLOPS = {
+    "H100": 989e12,
+    "A100": 312e12,
+    "L4": 121e12,
+    "A10": 125e12,
+    "V100": 125e12,
+    "RTX 4090": 165e12,
+    "RTX 3090": 71e12,
+    "T4": 65e12,
+}
+
+# FLOP/cycle per core (lebar SIMD x 2 FMA unit x 2) untuk estimasi kasar
+# peak CPU; bf16 hanya dipakai jika Trainer bf16 (autocast) aktif
+CPU_FLOPS_PER_CYCLE = [
+    # (flag /proc/cpuinfo, bf16 saja, FLOP/cycle)
+    ("amx_bf16", True, 2048),
+    ("avx512_bf16", True, 128),
+    ("avx512f", False, 64),
+    ("avx2", False, 32),
+]
+CPU_FALLBACK_FLOPS_PER_CYCLE = 8  # SSE
+
+
+def _in_backward():
+    """True jika sedang di dalam autograd backward (mis. recompute checkpointing)"""
+    try:
+        return torch._C._current_graph_task_id() != -1
+    except AttributeError:
+        return False
+
+
+def _first_grad_tensor(output):
+    """Tensor output pertama yang ikut backward (logits / hidden state)"""
+    if torch.is_tensor(output):
+        return output if output.requires_grad else None
+    values = output.values() if isinstance(output, dict) else output
+    if hasattr(output, "to_tuple"):
+        values = output.to_tuple()
+    for value in values if isinstance(values, (list, tuple)) else list(values):
+        if torch.is_tensor(value) and value.requires_grad:
+            return value
+    return None
+
+
+def _cpu_max_mhz():
+    """Clock maksimum (MHz) dari cpufreq / /proc/cpuinfo, None jika tidak terbaca"""
+    try:
+        with open("/sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq", 'r') as f:
+            return int(f.read()) / 1000
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/cpuinfo", 'r') as f:
+            mhz = [float(line.split(":", 1)[1]) for line in f if line.startswith("cpu MHz")]
+    except (OSError, ValueError):
+        return None
+    return max(mhz) if mhz else None
+
+
+def estimate_cpu_peak_flops(bf16=False):
+    """Thread intra-op x clock x FLOP/cycle (estimasi kasar, tanpa turbo/throttling)"""
+    from cpu_perf import _cpu_flags
+
+    mhz = _cpu_max_mhz()
+    if not mhz:
+        return None
+    flags = _cpu_flags()
+    per_cycle = next(
+        (n for flag, bf16_only, n in CPU_FLOPS_PER_CYCLE if flag in flags and (bf16 or not bf16_only)),
+        CPU_FALLBACK_FLOPS_PER_CYCLE,
+    )
+    return torch.get_num_threads() * mhz * 1e6 * per_cycle
+
+
+def detect_peak_flops(bf16=False):
+    """(peak FLOPS, sumber) untuk MFU; (None, None) jika tidak diketahui"""
+    if torch.cuda.is_available():
+        name = torch.cuda.get_device_name(0)
+        for key, flops in GPU_PEAK_FLOPS.items():
+            if key in name:
+                return flops * torch.cuda.device_count(), "gpu_table"
+        return None, None
+    flops = estimate_cpu_peak_flops(bf16)
+    return (flops, "cpu_estimate") if flops else (None, None)
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Instrumentasi throughput training (lihat docstring modul)
+
+    Args:
+        output_path: File JSONL (di-append)
+        peak_flops: Peak FLOPS hardware untuk MFU (default: tabel GPU /
+            estimasi CPU; None jika tidak terdeteksi -> MFU "n/a")
+        cuda_sync: Synchronize di batas fase (default: True jika CUDA)
+        data_bound_threshold: Fraksi data-wait di atas ini = data-bound
+    """
+
+    def __init__(self, output_path="./logs/throughput.jsonl", peak_flops=None,
+                 cuda_sync=None, data_bound_threshold=0.25):
+        self.output_path = output_path
+        self.peak_flops = peak_flops
+        self.peak_flops_source = "manual" if peak_flops else None
+        self.cuda_sync = torch.cuda.is_available() if cuda_sync is None else cuda_sync
+        self.data_bound_threshold = data_bound_threshold
+        self._handles = []
+        self._optimizer = None
+        self._original_step = None
+
+    # ── Clock & state ───────────────────────────────────────
+
+    def _now(self):
+        if self.cuda_sync:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    @staticmethod
+    def _empty_counters():
+        return {
+            "tokens": 0, "slots": 0, "samples": 0, "micro_steps": 0,
+            "data_wait": 0.0, "forward": 0.0, "backward": 0.0, "optimizer": 0.0,
+        }
+
+    def _reset_micro_step(self):
+        self._phase = "idle"
+        self._fwd_start = self._bwd_start = self._bwd_end = None
+        self._grads_seen = 0
+        self._tokens_counted = False
+
+    # ── Hooks ───────────────────────────────────────────────
+
+    def _count_tokens(self, args, kwargs):
+        input_ids = kwargs.get("input_ids")
+        if input_ids is None and args and torch.is_tensor(args[0]) and not args[0].is_floating_point():
+            input_ids = args[0]
+        if input_ids is None:
+            return
+        mask = kwargs.get("attention_mask")
+        slots = input_ids.numel()
+        tokens = int(mask.sum().item()) if mask is not None else slots
+        for counters in (self._window, self._total):
+            counters["tokens"] += tokens
+            counters["slots"] += slots
+            counters["samples"] += input_ids.shape[0] if input_ids.dim() > 1 else 1
+        self._tokens_counted = True
+
+    def _forward_pre_hook(self, module, args, kwargs):
+        if not module.training or _in_backward():
+            return
+        if self._phase != "forward":
+            self._finish_micro_step()
+            now = self._now()
+            if self._last_end is not None:
+                self._add("data_wait", now - self._last_end)
+            self._phase = "forward"
+            self._fwd_start = now
+        if not self._tokens_counted:
+            self._count_tokens(args, kwargs)
+
+    def _forward_hook(self, module, args, output):
+        if self._phase != "forward" or not module.training:
+            return
+        tensor = _first_grad_tensor(output)
+        if tensor is not None:
+            tensor.register_hook(self._backward_start_hook)
+
+    def _backward_start_hook(self, grad):
+        if self._phase == "forward":
+            self._bwd_start = self._now()
+            self._phase = "backward"
+        return None
+
+    def _param_grad_hook(self, *_):
+        if self._phase != "backward":
+            return
+        self._grads_seen += 1
+        if self._grads_seen >= self._num_trainable:
+            self._bwd_end = self._now()
+            self._finish_micro_step()
+        else:
+            self._bwd_end = time.perf_counter()
+
+    def _finish_micro_step(self):
+        if self._fwd_start is None:
+            self._reset_micro_step()
+            return
+        end_forward = self._bwd_start or self._bwd_end or time.perf_counter()
+        self._add("forward", end_forward - self._fwd_start)
+        if self._bwd_start is not None and self._bwd_end is not None:
+            self._add("backward", self._bwd_end - self._bwd_start)
+        for counters in (self._window, self._total):
+            counters["micro_steps"] += 1
+        self._last_end = self._bwd_end or end_forward
+        self._reset_micro_step()
+
+    def _add(self, key, seconds):
+        self._window[key] += seconds
+        self._total[key] += seconds
+
+    def _wrap_optimizer(self, optimizer):
+        original_step = optimizer.step
+
+        def timed_step(*args, **kwargs):
+            self._finish_micro_step()
+            start = self._now()
+            result = original_step(*args, **kwargs)
+            end = self._now()
+            self._add("optimizer", end - start)
+            self._last_end = end
+            return result
+
+        optimizer.step = timed_step
+        self._optimizer, self._original_step = optimizer, original_step
+
+    def _hook_modules(self, model):
+        """Model + lapisan base_model (PEFT / chunked loss memanggil base_model langsung)"""
+        modules, seen = [], set()
+        candidates = [model]
+        if hasattr(model, "get_base_model"):
+            candidates.append(model.get_base_model())
+        while candidates:
+            module = candidates.pop(0)
+            if not isinstance(module, torch.nn.Module) or id(module) in seen:
+                continue
+            seen.add(id(module))
+            modules.append(module)
+            candidates.append(getattr(module, "base_model", None))
+        return modules
+
+    # ── Trainer events ──────────────────────────────────────
+
+    def on_train_begin(self, args, state, control, model=None, optimizer=None, **kwargs):
+        self._window = self._empty_counters()
+        self._total = self._empty_counters()
+        self._last_end = None
+        self._reset_micro_step()
+        self._train_start = self._window_start = time.perf_counter()
+        self._window_step = state.global_step
+        self._start_step = state.global_step
+        self._windows = 0
+
+        params = [p for p in model.parameters() if p.requires_grad]
+        self._num_trainable = len(params)
+        self._num_params = sum(p.numel() for p in model.parameters())
+
+        for module in self._hook_modules(model):
+            self._handles.append(module.register_forward_pre_hook(self._forward_pre_hook, with_kwargs=True))
+            self._handles.append(module.register_forward_hook(self._forward_hook))
+        for p in params:
+            if hasattr(p, "register_post_accumulate_grad_hook"):
+                self._handles.append(p.register_post_accumulate_grad_hook(self._param_grad_hook))
+            else:
+                self._handles.append(p.register_hook(self._param_grad_hook))
+        if optimizer is not None:
+            self._wrap_optimizer(optimizer)
+
+        if self.peak_flops_source != "manual":
+            # Deteksi di sini: jumlah thread & bf16 autocast sudah diatur
+            self.peak_flops, self.peak_flops_source = detect_peak_flops(bf16=args.bf16)
+
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        if state.is_world_process_zero:
+            os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+            self._write({"event": "train_begin", "time": time.time(),
+                         "num_params": self._num_params,
+                         "trainable_tensors": self._num_trainable,
+                         "peak_flops": self.peak_flops,
+                         "peak_flops_source": self.peak_flops_source})
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        # Waktu eval bukan data-wait step berikutnya
+        self._last_end = None
+
+    def on_save(self, args, state, control, **kwargs):
+        self._last_end = None
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if not logs or "loss" not in logs:
+            return
+        now = time.perf_counter()
+        record = self._metrics(self._window, now - self._window_start,
+                               state.global_step - self._window_step)
+        record.update({"event": "window", "step": state.global_step, "epoch": state.epoch})
+        if state.is_world_process_zero:
+            self._write(record)
+        self._windows += 1
+        self._window = self._empty_counters()
+        self._window_start = now
+        self._window_step = state.global_step
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self._finish_micro_step()
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        if self._optimizer is not None:
+            self._optimizer.step = self._original_step
+            self._optimizer = None
+
+        summary = self._metrics(self._total, time.perf_counter() - self._train_start,
+                                state.global_step - self._start_step)
+        summary.update({"event": "summary", "step": state.global_step, "windows": self._windows})
+        if state.is_world_process_zero:
+            self._write(summary)
+            self.print_summary(summary)
+
+    # ── Metrics & output ────────────────────────────────────
+
+    def _metrics(self, c, elapsed, steps):
+        elapsed = max(elapsed, 1e-9)
+        timed = c["data_wait"] + c["forward"] + c["backward"] + c["optimizer"]
+        record = {
+            "elapsed_sec": elapsed,
+            "optimizer_steps": steps,
+            "step_time_sec": elapsed / steps if steps else None,
+            "tokens": c["tokens"],
+            "samples": c["samples"],
+            "tokens_per_sec": c["tokens"] / elapsed,
+            "samples_per_sec": c["samples"] / elapsed,
+            "padding_ratio": 1 - c["tokens"] / c["slots"] if c["slots"] else None,
+            "time_sec": {
+                "data_wait": c["data_wait"],
+                "forward": c["forward"],
+                "backward": c["backward"],
+                "optimizer": c["optimizer"],
+                "other": max(0.0, elapsed - timed),
+            },
+            "time_frac": {
+                key: value / elapsed
+                for key, value in [("data_wait", c["data_wait"]), ("forward", c["forward"]),
+                                   ("backward", c["backward"]), ("optimizer", c["optimizer"])]
+            },
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+        if torch.cuda.is_available():
+            record["cuda_peak_mb"] = torch.cuda.max_memory_allocated() / 2**20
+        record["mfu"] = (
+            6 * self._num_params * record["tokens_per_sec"] / self.peak_flops
+            if self.peak_flops else None
+        )
+        record["bound"] = (
+            "data" if record["time_frac"]["data_wait"] > self.data_bound_threshold else "compute"
+        )
+        return record
+
+    def _write(self, record):
+        with open(self.output_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+
+    def print_summary(self, summary):
+        t = summary["time_frac"]
+        print("\n⏱  Throughput summary:")
+        print(f"   Tokens/sec (non-pad): {summary['tokens_per_sec']:,.0f}   "
+              f"Samples/sec: {summary['samples_per_sec']:,.1f}")
+        if summary["padding_ratio"] is not None:
+            print(f"   Padding ratio: {summary['padding_ratio']*100:.1f}%")
+        print(f"   Time split: data {t['data_wait']*100:.0f}% | forward {t['forward']*100:.0f}% | "
+              f"backward {t['backward']*100:.0f}% | optimizer {t['optimizer']*100:.0f}%")
+        memory = f"   Peak RSS: {summary['peak_rss_mb']:,.0f} MB"
+        if "cuda_peak_mb" in summary:
+            memory += f"   CUDA peak: {summary['cuda_peak_mb']:,.0f} MB"
+        print(memory)
+        if summary["mfu"] is not None:
+            source = " (estimasi CPU)" if self.peak_flops_source == "cpu_estimate" else ""
+            print(f"   MFU: {summary['mfu']*100:.1f}%{source}")
+        else:
+            print("   MFU: n/a (peak FLOPS tidak diketahui, set THROUGHPUT_PEAK_TFLOPS)")
+        print(f"   Verdict: {summary['bound']}-bound  (log: {self.output_path})")
@@ -0,0 +1,206 @@
+"""
+Token Shards untuk Pretraining Corpus
+=====================================
+Simpan corpus yang sudah di-tokenize sebagai shard token datar
+(uint16/uint32) + offsets index, lalu baca lagi via memory-map.
+
+Layout folder shard:
+    index.json              -> metadata (dtype, tokenizer, daftar shard)
+    shard_00000.bin         -> token ids datar (tanpa padding)
+    shard_00000.offsets.npy -> int64 offset awal tiap dokumen (n_docs + 1)
+
+Dengan format ini training tidak perlu lagi json.load + tokenize ulang
+setiap run, dan RAM tetap datar walaupun corpus terus bertambah.
+
+Penggunaan:
+    from token_shards import write_token_shards, TokenShardDataset
+
+    write_token_shards(texts, tokenizer, "./dataset/shards/train")
+    dataset = TokenShardDataset("./dataset/shards/train")
+"""
+
+import os
+import json
+import bisect
+
+import numpy as np
+
+try:
+    import torch
+    from torch.utils.data import Dataset as TorchDataset
+    TORCH_AVAILABLE = True
+except ImportError:
+    TorchDataset = object
+    TORCH_AVAILABLE = False
+
+INDEX_FILE = "index.json"
+SHARD_FORMAT_VERSION = 1
+
+
+def choose_token_dtype(vocab_size):
+    """uint16 cukup untuk vocab < 65536, selain itu uint32"""
+    return np.uint16 if vocab_size <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def has_token_shards(shard_dir):
+    """Cek apakah folder berisi token shards yang valid"""
+    return os.path.exists(os.path.join(shard_dir, INDEX_FILE))
+
+
+def write_token_shards(texts, tokenizer, output_dir,
+                       max_length=512,
+                       shard_tokens=50_000_000,
+                       batch_size=1000):
+    """
+    Tokenize teks dan tulis ke token shards secara bertahap
+
+    Args:
+        texts: Iterable of strings (boleh generator)
+        tokenizer: HuggingFace tokenizer
+        output_dir: Folder output shard
+        max_length: Truncation per dokumen (sama dengan training)
+        shard_tokens: Jumlah token maksimal per shard file
+        batch_size: Jumlah teks per panggilan tokenizer
+
+    Returns:
+        Dict metadata yang juga disimpan di index.json
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    vocab_size = len(tokenizer)
+    dtype = choose_token_dtype(vocab_size)
+
+    shards = []
+    state = {"file": None, "offsets": None, "name": None}
+
+    def open_shard():
+        name = f"shard_{len(shards):05d}"
+        state["name"] = name
+        state["file"] = open(os.path.join(output_dir, f"{name}.bin"), "wb")
+        state["offsets"] = [0]
+
+    def close_shard():
+        if state["file"] is None:
+            return
+        state["file"].close()
+        offsets = np.asarray(state["offsets"], dtype=np.int64)
+        np.save(os.path.join(output_dir, f"{state['name']}.offsets.npy"), offsets)
+        shards.append({
+            "tokens": f"{state['name']}.bin",
+            "offsets": f"{state['name']}.offsets.npy",
+            "num_docs": len(offsets) - 1,
+            "num_tokens": int(offsets[-1]),
+        })
+        state["file"] = None
+
+    def flush(batch):
+        encoded = tokenizer(batch, truncation=True, max_length=max_length)
+        for ids in encoded["input_ids"]:
+            if not ids:
+                continue
+            if state["file"] is None or state["offsets"][-1] + len(ids) > shard_tokens:
+                close_shard()
+                open_shard()
+            state["file"].write(np.asarray(ids, dtype=dtype).tobytes())
+            state["offsets"].append(state["offsets"][-1] + len(ids))
+
+    batch = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    close_shard()
+
+    meta = {
+        "version": SHARD_FORMAT_VERSION,
+        "dtype": np.dtype(dtype).name,
+        "vocab_size": vocab_size,
+        "tokenizer": getattr(tokenizer, "name_or_path", ""),
+        "max_length": max_length,
+        "num_docs": sum(s["num_docs"] for s in shards),
+        "num_tokens": sum(s["num_tokens"] for s in shards),
+        "shards": shards,
+    }
+
+    # Tulis index terakhir supaya folder setengah jadi tidak terbaca valid
+    tmp_path = os.path.join(output_dir, INDEX_FILE + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, INDEX_FILE))
+
+    return meta
+
+
+def load_shard_index(shard_dir):
+    """Baca index.json dari folder shard"""
+    with open(os.path.join(shard_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class TokenShardDataset(TorchDataset):
+    """
+    Dataset training yang membaca token shards via memory-map
+
+    Tidak ada data corpus yang dimuat ke RAM saat init; hanya offsets
+    index (juga di-mmap). Setiap __getitem__ cuma menyalin token milik
+    satu dokumen.
+    """
+
+    def __init__(self, shard_dir, max_length=None):
+        if not TORCH_AVAILABLE:
+            raise ImportError("PyTorch diperlukan untuk TokenShardDataset")
+
+        self.shard_dir = shard_dir
+        self.meta = load_shard_index(shard_dir)
+        self.max_length = max_length or self.meta.get("max_length")
+        dtype = np.dtype(self.meta["dtype"])
+
+        self._tokens = []
+        self._offsets = []
+        self._doc_starts = [0]
+        for shard in self.meta["shards"]:
+            tokens_path = os.path.join(shard_dir, shard["tokens"])
+            if shard["num_tokens"] > 0:
+                tokens = np.memmap(tokens_path, dtype=dtype, mode="r")
+            else:
+                tokens = np.zeros(0, dtype=dtype)
+            offsets = np.load(os.path.join(shard_dir, shard["offsets"]), mmap_mode="r")
+            self._tokens.append(tokens)
+            self._offsets.append(offsets)
+            self._doc_starts.append(self._doc_starts[-1] + shard["num_docs"])
+
+    @property
+    def vocab_size(self):
+        return self.meta["vocab_size"]
+
+    @property
+    def num_tokens(self):
+        return self.meta["num_tokens"]
+
+    def __len__(self):
+        return self._doc_starts[-1]
+
+    def get_token_ids(self, idx):
+        """Ambil token ids dokumen ke-idx sebagai numpy view (tanpa copy)"""
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f"Index {idx} di luar range ({len(self)} dokumen)")
+
+        shard_idx = bisect.bisect_right(self._doc_starts, idx) - 1
+        local_idx = idx - self._doc_starts[shard_idx]
+        offsets = self._offsets[shard_idx]
+        start, end = int(offsets[local_idx]), int(offsets[local_idx + 1])
+        if self.max_length:
+            end = min(end, start + self.max_length)
+        return self._tokens[shard_idx][start:end]
+
+    def __getitem__(self, idx):
+        ids = torch.from_numpy(self.get_token_ids(idx).astype(np.int64))
+        return {
+            "input_ids": ids,
+            "attention_mask": torch.ones_like(ids),
+        }
@@ -3,10 +3,18 @@ Training Script untuk Tiny Indonesian LLM (13M params)
 ======================================================
 Dengan early stopping dan optimasi untuk menghindari overfitting
 Support PEFT (Parameter-Efficient Fine-Tuning) dan LoRA
+
+Multi-proses di server CPU (gloo, lihat distributed.py):
+    torchrun --standalone --nproc_per_node 4 train_tiny_llm.py
+
+Lanjutkan setelah pre-emption / crash (lihat preemption.py):
+    python train_tiny_llm.py --resume
 """
 
 import os
-os.environ["CUDA_VISIBLE_DEVICES"] = "0"
+# Di bawah torchrun (WORLD_SIZE di-set) device per rank diatur launcher
+if "WORLD_SIZE" not in os.environ:
+    os.environ["CUDA_VISIBLE_DEVICES"] = "0"
 
 import json
 import torch
@@ -20,10 +28,25 @@ from transformers import (
     TrainingArguments,
     DataCollatorForLanguageModeling,
     EarlyStoppingCallback,
+    default_data_collator,
 )
 from transformers.trainer_callback import TrainerCallback
 import math
 
+from model_config import MODEL_CONFIG
+from token_shards import TokenShardDataset, has_token_shards
+from packing import check_reset_position_ids, pack_dataset, print_packing_stats
+from length_batching import TokenBudgetMixin
+from chunked_loss import ChunkedLossMixin
+from dataset_cache import load_or_build
+from streaming_dataset import StreamingTextDataset, StreamingDataMixin, resume_batches_from_checkpoint
+from distributed import distributed_training_config, is_distributed, silence_non_main_ranks
+from cpu_perf import apply_cpu_perf_mode
+from throughput import ThroughputCallback
+from async_checkpoint import AsyncCheckpointMixin
+from async_eval import AsyncEvalCallback
+from preemption import PreemptionCallback, parse_resume_arg, resolve_resume_checkpoint, load_data_position
+
 # PEFT & LoRA imports
 try:
     from peft import (
@@ -42,21 +65,7 @@ except ImportError:
 # KONFIGURASI MODEL 13M
 # ============================================================
 
-MODEL_CONFIG = {
-    "vocab_size": 32000,
-    "n_positions": 512,
-    "n_embd": 384,        # Hidden size
-    "n_layer": 6,         # Layers
-    "n_head": 6,          # Attention heads
-    "n_inner": 1536,      # FFN hidden (4x n_embd)
-    "activation_function": "gelu_new",
-    "resid_pdrop": 0.05,
-    "embd_pdrop": 0.05,
-    "attn_pdrop": 0.05,
-    "layer_norm_epsilon": 1e-5,
-    "bos_token_id": 1,
-    "eos_token_id": 2,
-}
+# Arsitektur (n_embd, n_layer, ...) ada di model_config.py
 
 TRAINING_CONFIG = {
     "output_dir": "./tiny-llm-indo",
@@ -85,6 +94,89 @@ TRAINING_CONFIG = {
     "max_grad_norm": 1.0,
 }
 
+# ============================================================
+# TOKENIZER
+# ============================================================
+
+# Default: tokenizer cahya (~50k vocab). Tokenizer hasil train_tokenizer.py
+# (mis. "./tokenizer-indo-16k") jauh lebih kecil -> embedding & LM head kecil.
+# Samakan dengan CONFIG["tokenizer"] di prepare_dataset.py jika pakai token shards.
+TOKENIZER_PATH = "cahya/gpt2-small-indonesian-522M"
+
+# ============================================================
+# SEQUENCE PACKING
+# ============================================================
+
+USE_PACKING = True  # Gabung sample pendek (dipisah EOS) jadi blok penuh, tanpa padding
+
+PACKING_CONFIG = {
+    "block_size": 512,               # Sama dengan n_positions
+    "reset_position_ids": False,     # True = posisi reset per dokumen (hanya flash_attention_2)
+}
+
+# Cache hasil tokenize + packing JSON (Arrow, key = isi JSON + tokenizer + setting)
+USE_DATASET_CACHE = True
+
+# Log throughput per logging window (tokens/sec, data/forward/backward/optimizer,
+# memory, padding, MFU) -> JSONL. None = nonaktif
+THROUGHPUT_LOG = "./logs/throughput_tiny_llm.jsonl"
+THROUGHPUT_PEAK_TFLOPS = None  # Peak hardware untuk MFU; None = tabel GPU / estimasi CPU
+
+# Checkpoint non-blocking: step hanya menunggu snapshot ke memory CPU,
+# safetensors + optimizer ditulis & dirotasi di thread background
+ASYNC_CHECKPOINT = True
+
+# Eval di proses terpisah (async_eval.py): training tidak berhenti tiap
+# eval_steps; worker mengevaluasi setiap checkpoint-N yang muncul, hasilnya
+# dipakai untuk best model & early stopping. Subsample None = seluruh eval set
+ASYNC_EVAL = True
+
+ASYNC_EVAL_CONFIG = {
+    "subsample": 2000,          # Subsample acak tetap (seed)
+    "seed": 42,
+    "batch_size": 32,
+    "num_threads": 2,           # Thread worker (sisanya untuk training)
+    "device": "cpu",
+}
+
+# ============================================================
+# TOKEN-BUDGET BATCHING
+# ============================================================
+
+# Alternatif packing: batch dibatasi jumlah token (sample mirip panjang
+# dikelompokkan, padding dinamis). Hanya dipakai jika USE_PACKING = False.
+USE_TOKEN_BUDGET = False
+
+TOKEN_BUDGET_CONFIG = {
+    "max_tokens_per_batch": 32 * 512,  # Worst case = batch lama (per_device_train_batch_size x max_length)
+    "max_batch_size": 256,
+}
+
+# ============================================================
+# CPU PERFORMANCE MODE
+# ============================================================
+
+# Hanya berlaku tanpa GPU: bf16 autocast (jika CPU mendukung), torch.compile
+# per GPT-2 block, tuning thread, contiguity. Lihat cpu_perf.py dan
+# benchmark: python scripts/bench_cpu_mode.py
+CPU_PERF_MODE = True
+
+CPU_PERF_CONFIG = {
+    "bf16": "auto",             # "auto" / True / False
+    "compile": True,
+    "intra_op_threads": None,   # None = core tersedia / proses per node
+    "inter_op_threads": 1,
+}
+
+# ============================================================
+# CHUNKED LOSS
+# ============================================================
+
+# Hitung LM head + cross-entropy per chunk posisi, tanpa logits penuh
+# [batch, 512, vocab] (beberapa GB dengan vocab ~50k). Berlaku juga untuk eval.
+USE_CHUNKED_LOSS = True
+LOSS_CHUNK_SIZE = 1024  # Posisi per chunk -> peak logits = 1024 x vocab
+
 # ============================================================
 # LORA CONFIGURATION
 # ============================================================
@@ -147,6 +239,11 @@ class LossMonitorCallback(TrainerCallback):
                     print("⚠️  Large gap detected - possible overfitting!")
 
 
+class TinyLLMTrainer(AsyncCheckpointMixin, ChunkedLossMixin, TokenBudgetMixin, StreamingDataMixin, Trainer):
+    """Trainer dengan async checkpoint, chunked loss, token-budget batching dan streaming per rank (opsional)"""
+    pass
+
+
 # ============================================================
 # DATA LOADING & TOKENIZATION
 # ============================================================
@@ -158,14 +255,14 @@ def load_dataset_from_json(path):
     return Dataset.from_list(data)
 
 
-def tokenize_function(examples, tokenizer, max_length=512):
-    """Tokenize texts"""
+def tokenize_function(examples, tokenizer, max_length=512, padding="max_length"):
+    """Tokenize texts (padding=False untuk mode packing)"""
     return tokenizer(
         examples["text"],
         truncation=True,
         max_length=max_length,
-        padding="max_length",
-        return_special_tokens_mask=True,
+        padding=padding,
+        return_special_tokens_mask=bool(padding),
     )
 
 
@@ -186,7 +283,7 @@ def create_model_and_tokenizer(use_lora=False, from_pretrained=None):
     # Load tokenizer Indonesia
     try:
         tokenizer = AutoTokenizer.from_pretrained(
-            "cahya/gpt2-small-indonesian-522M",
+            TOKENIZER_PATH,
             trust_remote_code=True
         )
     except:
@@ -316,14 +413,35 @@ def load_lora_model(base_model_path, lora_adapter_path):
 # ============================================================
 # DATASET MODE: Pilih salah satu
 # ============================================================
-DATASET_MODE = "qa"  # "general" untuk teks biasa, "qa" untuk tanya jawab
+DATASET_MODE = "qa"  # "general" untuk teks biasa, "qa" untuk tanya jawab, "stream" untuk corpus besar
+
+# Token shards hasil prepare_dataset.py (mode "general"); dipakai jika ada
+SHARD_DIR = "./dataset/shards"
+
+# Mode "stream": shard JSONL(.gz/.zst) dibaca sebagai IterableDataset,
+# memory tetap berapa pun ukuran corpus (lihat streaming_dataset.py).
+# IterableDataset tidak punya panjang -> training dibatasi max_steps.
+STREAM_CONFIG = {
+    "train_path": "./dataset/stream/train",
+    "eval_path": "./dataset/stream/eval",
+    "shuffle_buffer": 10_000,              # Dokumen di buffer shuffle
+    "max_steps": 20_000,                   # Optimizer steps (ganti num_train_epochs)
+    "resume_from_checkpoint": None,        # Mis. "./tiny-llm-indo/checkpoint-2000"
+}
 
 
 # ============================================================
 # MAIN TRAINING
 # ============================================================
 
-def main():
+def main(resume=None):
+    """
+    Args:
+        resume: True = checkpoint valid terakhir di output_dir, path = checkpoint tertentu
+    """
+    if is_distributed():
+        silence_non_main_ranks()
+    
     print("=" * 60)
     print("🚀 TINY INDONESIAN LLM TRAINING")
     if USE_LORA and PEFT_AVAILABLE:
@@ -342,6 +460,22 @@ def main():
     
     # Create model and tokenizer (dengan LoRA jika diaktifkan)
     model, tokenizer = create_model_and_tokenizer(use_lora=USE_LORA)
+    if USE_PACKING:
+        check_reset_position_ids(model, PACKING_CONFIG["reset_position_ids"])
+    
+    # Training arguments (dibuat sebelum load dataset: di bawah torchrun ini
+    # juga menyiapkan process group gloo untuk main_process_first di bawah)
+    training_config = TRAINING_CONFIG
+    if DATASET_MODE == "stream":
+        # IterableDataset tidak punya panjang -> dibatasi max_steps
+        training_config = {**TRAINING_CONFIG, "max_steps": STREAM_CONFIG["max_steps"]}
+    if ASYNC_EVAL:
+        # Eval & load best model diambil alih AsyncEvalCallback
+        training_config = {**training_config, "eval_strategy": "no", "load_best_model_at_end": False}
+    training_config = distributed_training_config(training_config)
+    if CPU_PERF_MODE and device == "cpu":
+        model, training_config, _ = apply_cpu_perf_mode(model, training_config, CPU_PERF_CONFIG)
+    training_args = TrainingArguments(**training_config)
     
     # Load datasets (pilih berdasarkan mode)
     print("\n📂 Loading datasets...")
@@ -349,67 +483,182 @@ def main():
     if DATASET_MODE == "qa":
         train_path = "./dataset/train_qa.json"
         eval_path = "./dataset/eval_qa.json"
+    elif DATASET_MODE == "stream":
+        train_path = STREAM_CONFIG["train_path"]
+        eval_path = STREAM_CONFIG["eval_path"]
     else:
         train_path = "./dataset/train.json"
         eval_path = "./dataset/eval.json"
     
-    if not os.path.exists(train_path):
+    train_shards = os.path.join(SHARD_DIR, "train")
+    eval_shards = os.path.join(SHARD_DIR, "eval")
+    use_shards = (
+        DATASET_MODE == "general"
+        and has_token_shards(train_shards)
+        and has_token_shards(eval_shards)
+    )
+    
+    if not use_shards and not os.path.exists(train_path):
         print(f"❌ Dataset not found: {train_path}")
         if DATASET_MODE == "qa":
             print("   Run: python add_qa_data.py")
+        elif DATASET_MODE == "stream":
+            print("   Run: python streaming_dataset.py ./dataset/train.json ./dataset/stream/train")
         else:
             print("   Run: python prepare_dataset.py")
         return
     
-    train_dataset = load_dataset_from_json(train_path)
-    eval_dataset = load_dataset_from_json(eval_path)
-    
-    print(f"✓ Train: {len(train_dataset)} samples")
-    print(f"✓ Eval: {len(eval_dataset)} samples")
-    
-    # Tokenize
-    print("\n🔤 Tokenizing...")
-    
-    train_dataset = train_dataset.map(
-        lambda x: tokenize_function(x, tokenizer),
-        batched=True,
-        remove_columns=["text"],
-        desc="Tokenizing train"
-    )
-    
-    eval_dataset = eval_dataset.map(
-        lambda x: tokenize_function(x, tokenizer),
-        batched=True,
-        remove_columns=["text"],
-        desc="Tokenizing eval"
-    )
+    if use_shards:
+        # Pre-tokenized shards: mmap, tanpa json.load & tokenize ulang
+        print(f"⚡ Using token shards: {SHARD_DIR}")
+        train_dataset = TokenShardDataset(train_shards)
+        eval_dataset = TokenShardDataset(eval_shards)
+        if train_dataset.vocab_size != len(tokenizer):
+            print(f"⚠️  Shard vocab ({train_dataset.vocab_size}) != tokenizer "
+                  f"({len(tokenizer)}). Jalankan ulang prepare_dataset.py")
+        
+        print(f"✓ Train: {len(train_dataset)} samples ({train_dataset.num_tokens:,} tokens)")
+        print(f"✓ Eval: {len(eval_dataset)} samples")
+    elif DATASET_MODE == "stream":
+        # Out-of-core: tokenize (+ packing) di dataloader worker, tanpa json.load
+        block_size = PACKING_CONFIG["block_size"] if USE_PACKING else None
+        stream_kwargs = dict(
+            max_length=512,
+            block_size=block_size,
+            reset_position_ids=PACKING_CONFIG["reset_position_ids"],
+            seed=TRAINING_CONFIG["seed"],
+        )
+        train_dataset = StreamingTextDataset(
+            train_path, tokenizer, shuffle_buffer=STREAM_CONFIG["shuffle_buffer"], **stream_kwargs
+        )
+        eval_dataset = StreamingTextDataset(eval_path, tokenizer, shuffle_buffer=0, **stream_kwargs)
+        print(f"🌊 Streaming: {len(train_dataset.shards)} train shards, "
+              f"{len(eval_dataset.shards)} eval shards")
+    else:
+        # Tokenize (tanpa padding jika packing), lewat cache jika ada
+        padding = False if (USE_PACKING or USE_TOKEN_BUDGET) else "max_length"
+        cache_settings = {
+            "max_length": 512,
+            "padding": padding,
+            "packing": PACKING_CONFIG if USE_PACKING else None,
+        }
+        
+        def build(path, split):
+            dataset = load_dataset_from_json(path)
+            print(f"🔤 Tokenizing {split}: {len(dataset)} samples")
+            dataset = dataset.map(
+                lambda x: tokenize_function(x, tokenizer, padding=padding),
+                batched=True,
+                remove_columns=["text"],
+                desc=f"Tokenizing {split}"
+            )
+            if USE_PACKING:
+                dataset, packing_stats = pack_dataset(
+                    dataset, tokenizer, desc=f"Packing {split}", **PACKING_CONFIG
+                )
+                print_packing_stats(packing_stats)
+            return dataset
+        
+        # Rank 0 build & tulis cache, rank lain menunggu lalu load
+        with training_args.main_process_first(desc="tokenize dataset"):
+            train_dataset = load_or_build(
+                f"tiny_llm-{DATASET_MODE}-train", [train_path], tokenizer, cache_settings,
+                lambda: build(train_path, "train"), enabled=USE_DATASET_CACHE,
+            )
+            eval_dataset = load_or_build(
+                f"tiny_llm-{DATASET_MODE}-eval", [eval_path], tokenizer, cache_settings,
+                lambda: build(eval_path, "eval"), enabled=USE_DATASET_CACHE,
+            )
+        
+        print(f"✓ Train: {len(train_dataset)} {'blocks' if USE_PACKING else 'samples'}")
+        print(f"✓ Eval: {len(eval_dataset)} {'blocks' if USE_PACKING else 'samples'}")
     
-    # Data collator
-    data_collator = DataCollatorForLanguageModeling(
-        tokenizer=tokenizer,
-        mlm=False,  # Causal LM
-    )
+    # Data collator (blok packed sudah punya labels & panjang sama)
+    if USE_PACKING and not use_shards:
+        data_collator = default_data_collator
+    else:
+        data_collator = DataCollatorForLanguageModeling(
+            tokenizer=tokenizer,
+            mlm=False,  # Causal LM
+        )
     
-    # Training arguments
-    training_args = TrainingArguments(**TRAINING_CONFIG)
+    # Resume (--resume / STREAM_CONFIG["resume_from_checkpoint"])
+    if not resume and DATASET_MODE == "stream":
+        resume = STREAM_CONFIG["resume_from_checkpoint"]
+    resume_from_checkpoint = resolve_resume_checkpoint(resume, training_args.output_dir)
+    if resume_from_checkpoint and DATASET_MODE == "stream":
+        # Stream deterministik: lompat langsung ke offset dari sampler state,
+        # bukan iterasi ulang batch lama lewat Trainer
+        position = load_data_position(resume_from_checkpoint) or {}
+        if position and (
+                position["per_device_train_batch_size"] != training_args.per_device_train_batch_size
+                or position["world_size"] != max(1, training_args.world_size)):
+            print("⚠️  Batch size / jumlah proses berbeda dari checkpoint: urutan data tidak persis sama")
+        stream = position.get("stream")
+        if stream and len(stream) == max(1, training_args.world_size):
+            # Posisi sudah terpecah per rank: tanpa membaca ulang data
+            stream = stream[training_args.process_index]
+            train_dataset.set_resume_position(stream)
+            print(f"⏩ Resume stream: epoch data {stream['epoch']}, "
+                  f"{sum(stream['offsets']):,} examples terpakai di epoch ini")
+        else:
+            batches = position.get("batches_consumed") or resume_batches_from_checkpoint(
+                resume_from_checkpoint, training_args.gradient_accumulation_steps
+            )
+            train_dataset.set_resume_offset(
+                batches, training_args.per_device_train_batch_size,
+                num_workers=training_args.dataloader_num_workers,
+                gradient_accumulation_steps=training_args.gradient_accumulation_steps,
+            )
+            print(f"⏩ Resume stream: skip {batches:,} batches")
+        training_args.ignore_data_skip = True
     
     # Callbacks
-    callbacks = [
-        EarlyStoppingCallback(
+    callbacks = [LossMonitorCallback(patience=5)]
+    if ASYNC_EVAL:
+        callbacks.append(AsyncEvalCallback(
+            eval_dataset,
+            data_collator,
+            load_best_model_at_end=TRAINING_CONFIG["load_best_model_at_end"],
+            early_stopping_patience=5,
+            early_stopping_threshold=0.01,
+            loss_chunk_size=LOSS_CHUNK_SIZE if USE_CHUNKED_LOSS else None,
+            **ASYNC_EVAL_CONFIG,
+        ))
+    else:
+        callbacks.insert(0, EarlyStoppingCallback(
             early_stopping_patience=5,
             early_stopping_threshold=0.01
-        ),
-        LossMonitorCallback(patience=5)
-    ]
+        ))
+    if THROUGHPUT_LOG:
+        callbacks.append(ThroughputCallback(
+            THROUGHPUT_LOG,
+            peak_flops=THROUGHPUT_PEAK_TFLOPS * 1e12 if THROUGHPUT_PEAK_TFLOPS else None,
+        ))
+    preemption = PreemptionCallback()
+    callbacks.append(preemption)
+    
+    # Token-budget batching (packing lebih diutamakan jika keduanya aktif;
+    # butuh panjang semua sample, jadi tidak untuk stream)
+    use_token_budget = (
+        USE_TOKEN_BUDGET
+        and not (USE_PACKING and not use_shards)
+        and DATASET_MODE != "stream"
+    )
+    trainer_kwargs = dict(TOKEN_BUDGET_CONFIG) if use_token_budget else {}
+    if USE_CHUNKED_LOSS:
+        trainer_kwargs["loss_chunk_size"] = LOSS_CHUNK_SIZE
+    trainer_kwargs["async_checkpoint"] = ASYNC_CHECKPOINT
     
     # Trainer
-    trainer = Trainer(
+    trainer = TinyLLMTrainer(
         model=model,
         args=training_args,
         train_dataset=train_dataset,
         eval_dataset=eval_dataset,
         data_collator=data_collator,
         callbacks=callbacks,
+        **trainer_kwargs,
     )
     
     # Train!
@@ -417,7 +666,9 @@ def main():
     print("🏋️ STARTING TRAINING")
     print("=" * 60)
     
-    trainer.train()
+    trainer.train(resume_from_checkpoint=resume_from_checkpoint)
+    if preemption.preempted:
+        return  # Checkpoint sudah tersimpan; lanjutkan dengan --resume
     
     # Save final model
     print("\n💾 Saving final model...")
@@ -425,13 +676,15 @@ def main():
     
     # Save model
     trainer.save_model(final_path)
-    tokenizer.save_pretrained(final_path)
+    if trainer.is_world_process_zero():
+        tokenizer.save_pretrained(final_path)
     
     # Jika pakai LoRA, simpan juga config base model untuk loading nanti
     if USE_LORA and PEFT_AVAILABLE:
         # Save the base model config
         config = GPT2Config(**MODEL_CONFIG)
-        config.save_pretrained(final_path)
+        if trainer.is_world_process_zero():
+            config.save_pretrained(final_path)
         print(f"✓ LoRA adapter + config saved to: {final_path}")
     else:
         print(f"✓ Model saved to: {final_path}")
@@ -542,4 +795,4 @@ def finetune_with_lora(base_model_path, dataset_path, output_path):
 
 
 if __name__ == "__main__":
-    main()
+    main(resume=parse_resume_arg())
@@ -0,0 +1,252 @@
+"""
+Train Tokenizer BPE Indonesia
+=============================
+Latih byte-level BPE dari corpus kita sendiri (hasil prepare_dataset.py)
+dengan vocab kecil. Untuk model 13M, vocab ~50k dari cahya membuat
+embedding + LM head jadi parameter terbesar dan LM head jadi matmul
+termahal; vocab 8k-16k jauh lebih proporsional.
+
+Untuk setiap ukuran vocab dilaporkan:
+    - Kompresi: tokens/char di eval set (makin kecil makin hemat)
+    - Jumlah parameter model (MODEL_CONFIG dari model_config.py)
+    - Training throughput: tokens/sec & chars/sec (forward + backward)
+
+Penggunaan:
+    python train_tokenizer.py              # Sweep 8k / 16k / 32k
+    python train_tokenizer.py 16000        # Satu ukuran saja
+    python train_tokenizer.py --no-bench   # Tanpa benchmark throughput
+
+Lalu di train_tiny_llm.py:
+    TOKENIZER_PATH = "./tokenizer-indo-16k"
+(dan CONFIG["tokenizer"] di prepare_dataset.py untuk token shards)
+"""
+
+import os
+import sys
+import json
+import time
+
+import torch
+from tokenizers import ByteLevelBPETokenizer
+from transformers import (
+    AutoTokenizer,
+    GPT2Config,
+    GPT2LMHeadModel,
+    PreTrainedTokenizerFast,
+)
+
+from model_config import MODEL_CONFIG
+
+# ============================================================
+# KONFIGURASI
+# ============================================================
+
+CONFIG = {
+    "train_files": ["./dataset/train.json", "./dataset/train_qa.json"],
+    "eval_files": ["./dataset/eval.json", "./dataset/eval_qa.json"],
+    "output_prefix": "./tokenizer-indo",  # -> ./tokenizer-indo-16k
+    "vocab_sizes": [8000, 16000, 32000],
+    "min_frequency": 2,
+    # Urutan ini membuat bos=1, eos=2 (sama dengan MODEL_CONFIG)
+    "special_tokens": ["<pad>", "<s>", "</s>", "<unk>"],
+    "max_eval_texts": 2000,
+    "reference_tokenizer": "cahya/gpt2-small-indonesian-522M",
+    "bench_steps": 5,
+    "bench_batch_size": 8,
+    "bench_seq_len": 512,
+}
+
+# ============================================================
+# CORPUS
+# ============================================================
+
+def iter_texts(files, limit=None):
+    """Teks dari file JSON [{"text": ...}] yang ada"""
+    count = 0
+    for path in files:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for item in data:
+            text = item.get("text", "") if isinstance(item, dict) else str(item)
+            if text:
+                yield text
+                count += 1
+                if limit and count >= limit:
+                    return
+
+
+# ============================================================
+# TOKENIZER
+# ============================================================
+
+def train_bpe(vocab_size, output_dir):
+    """Latih byte-level BPE lalu simpan sebagai tokenizer HuggingFace"""
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(
+        iter_texts(CONFIG['train_files']),
+        vocab_size=vocab_size,
+        min_frequency=CONFIG['min_frequency'],
+        special_tokens=CONFIG['special_tokens'],
+        show_progress=True,
+    )
+
+    pad, bos, eos, unk = CONFIG['special_tokens']
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=bpe._tokenizer,
+        bos_token=bos,
+        eos_token=eos,
+        pad_token=pad,
+        unk_token=unk,
+        model_max_length=MODEL_CONFIG['n_positions'],
+    )
+    tokenizer.save_pretrained(output_dir)
+    return tokenizer
+
+
+def tokens_per_char(tokenizer, texts):
+    """Kompresi: total token / total karakter"""
+    total_tokens = total_chars = 0
+    for start in range(0, len(texts), 256):
+        batch = texts[start:start + 256]
+        encoded = tokenizer(batch, add_special_tokens=False)["input_ids"]
+        total_tokens += sum(len(ids) for ids in encoded)
+        total_chars += sum(len(t) for t in batch)
+    return total_tokens / max(1, total_chars)
+
+
+# ============================================================
+# MODEL SIZE & THROUGHPUT
+# ============================================================
+
+def build_model(vocab_size):
+    config = GPT2Config(**{**MODEL_CONFIG, "vocab_size": vocab_size})
+    return GPT2LMHeadModel(config)
+
+
+def count_params(model):
+    total = sum(p.numel() for p in model.parameters())
+    embedding = model.transformer.wte.weight.numel()
+    return total, embedding
+
+
+def benchmark_training(model, steps=5, batch_size=8, seq_len=512):
+    """Tokens/sec untuk forward + backward + optimizer step"""
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = model.to(device)
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    vocab_size = model.config.vocab_size
+    input_ids = torch.randint(0, vocab_size, (batch_size, seq_len), device=device)
+
+    def step():
+        loss = model(input_ids=input_ids, labels=input_ids).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad(set_to_none=True)
+
+    step()  # Warmup
+    if device == "cuda":
+        torch.cuda.synchronize()
+    start = time.time()
+    for _ in range(steps):
+        step()
+    if device == "cuda":
+        torch.cuda.synchronize()
+    elapsed = time.time() - start
+    return steps * batch_size * seq_len / elapsed
+
+
+def evaluate_tokenizer(name, tokenizer, eval_texts, bench=True):
+    """Kumpulkan semua metrik untuk satu tokenizer"""
+    vocab_size = len(tokenizer)
+    model = build_model(vocab_size)
+    total, embedding = count_params(model)
+    result = {
+        "name": name,
+        "vocab_size": vocab_size,
+        "tokens_per_char": tokens_per_char(tokenizer, eval_texts),
+        "total_params": total,
+        "embedding_params": embedding,
+    }
+    if bench:
+        tps = benchmark_training(
+            model,
+            steps=CONFIG['bench_steps'],
+            batch_size=CONFIG['bench_batch_size'],
+            seq_len=CONFIG['bench_seq_len'],
+        )
+        result["train_tokens_per_sec"] = tps
+        # Chars/sec = teks asli yang diproses per detik (adil antar vocab)
+        result["train_chars_per_sec"] = tps / result["tokens_per_char"]
+    del model
+    return result
+
+
+def print_results(results):
+    print("\n" + "=" * 78)
+    print(f"{'Tokenizer':<28} {'Vocab':>7} {'Tok/char':>9} {'Params':>9} "
+          f"{'Emb %':>6} {'Tok/s':>9} {'Char/s':>9}")
+    print("-" * 78)
+    for r in results:
+        tps = f"{r['train_tokens_per_sec']:,.0f}" if "train_tokens_per_sec" in r else "-"
+        cps = f"{r['train_chars_per_sec']:,.0f}" if "train_chars_per_sec" in r else "-"
+        print(f"{r['name'][:28]:<28} {r['vocab_size']:>7,} {r['tokens_per_char']:>9.3f} "
+              f"{r['total_params']/1e6:>8.1f}M {100*r['embedding_params']/r['total_params']:>5.0f}% "
+              f"{tps:>9} {cps:>9}")
+    print("=" * 78)
+
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main(vocab_sizes=None, bench=True):
+    print("=" * 60)
+    print("🔤 TRAIN INDONESIAN BPE TOKENIZER")
+    print("=" * 60)
+
+    if not any(os.path.exists(p) for p in CONFIG['train_files']):
+        print("❌ Corpus tidak ditemukan. Jalankan dulu: python prepare_dataset.py")
+        return []
+
+    eval_texts = list(iter_texts(CONFIG['eval_files'], limit=CONFIG['max_eval_texts']))
+    if not eval_texts:
+        eval_texts = list(iter_texts(CONFIG['train_files'], limit=CONFIG['max_eval_texts']))
+
+    results = []
+
+    # Baseline: tokenizer yang dipakai sekarang
+    try:
+        reference = AutoTokenizer.from_pretrained(CONFIG['reference_tokenizer'])
+        print(f"\n📏 Reference: {CONFIG['reference_tokenizer']}")
+        results.append(evaluate_tokenizer(CONFIG['reference_tokenizer'], reference,
+                                          eval_texts, bench=bench))
+    except Exception as e:
+        print(f"⚠ Reference tokenizer tidak tersedia: {e}")
+
+    for vocab_size in vocab_sizes or CONFIG['vocab_sizes']:
+        output_dir = f"{CONFIG['output_prefix']}-{vocab_size // 1000}k"
+        print(f"\n🔧 Training BPE vocab={vocab_size:,} -> {output_dir}")
+        start = time.time()
+        tokenizer = train_bpe(vocab_size, output_dir)
+        print(f"   ✓ Trained in {time.time() - start:.1f}s ({len(tokenizer):,} tokens)")
+        results.append(evaluate_tokenizer(output_dir, tokenizer, eval_texts, bench=bench))
+
+    print_results(results)
+
+    summary_path = f"{CONFIG['output_prefix']}-sweep.json"
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Summary: {summary_path}")
+    print("\n🎯 Next step: set TOKENIZER_PATH di train_tiny_llm.py "
+          "(dan CONFIG['tokenizer'] di prepare_dataset.py)")
+
+    return results
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    sizes = [int(a) for a in args] or None
+    main(vocab_sizes=sizes, bench="--no-bench" not in sys.argv)